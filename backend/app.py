@@ -36,10 +36,14 @@ from routes.services import services_bp
 from routes.medical_records import medical_records_bp
 from routes.species_breed_requests import species_breed_requests_bp
 from routes.nutrition import nutrition_bp
+from routes.uploads import uploads_bp
 
 # Import middleware
 from middleware.auth import auth_middleware
 from middleware.rate_limit import rate_limit_middleware
+from middleware.route_policy import compile_route_policies
+from config import REFERENCE_DATA_WARM_ON_STARTUP
+from utils.reference_data import warm_reference_data
 
 def create_app():
     """Create and configure Flask app"""
@@ -74,6 +78,7 @@ def create_app():
     app.register_blueprint(medical_records_bp, url_prefix='/api')
     app.register_blueprint(species_breed_requests_bp, url_prefix='/api/species-breed-requests')
     app.register_blueprint(nutrition_bp, url_prefix='/api')
+    app.register_blueprint(uploads_bp, url_prefix='/api/uploads')
 
     # Register middleware
     app.before_request(auth_middleware)
@@ -132,6 +137,13 @@ def create_app():
     def internal_error(e):
         return {'error': 'Internal Server Error', 'message': 'An error occurred'}, 500
 
+    # Classify every registered route once (public / rate-limit action) for the middleware
+    compile_route_policies(app)
+
+    # Load species, breeds, vaccines and service types before the first request
+    if REFERENCE_DATA_WARM_ON_STARTUP:
+        warm_reference_data()
+
     return app
 
 if __name__ == '__main__':
@@ -3,16 +3,42 @@ Configuration module for Animal Humano backend
 """
 
 import os
-from supabase import create_client, Client
+from utils.supabase_client import LazyClient, create_pooled_client
 
 # Supabase configuration
 SUPABASE_URL = os.getenv("SUPABASE_URL")
 SUPABASE_ANON_KEY = os.getenv("SUPABASE_ANON_KEY")
 SUPABASE_SERVICE_ROLE_KEY = os.getenv("SUPABASE_SERVICE_ROLE_KEY")
 
-# Create Supabase clients
-supabase: Client = create_client(SUPABASE_URL, SUPABASE_ANON_KEY)
-supabase_admin: Client = create_client(SUPABASE_URL, SUPABASE_SERVICE_ROLE_KEY)
+# HTTP pool for the Supabase clients (one pool per client, per worker process)
+SUPABASE_POOL_SIZE = int(os.getenv("SUPABASE_POOL_SIZE", 20))
+SUPABASE_POOL_KEEPALIVE = int(os.getenv("SUPABASE_POOL_KEEPALIVE", 10))
+SUPABASE_KEEPALIVE_EXPIRY = float(os.getenv("SUPABASE_KEEPALIVE_EXPIRY", 30))
+SUPABASE_CONNECT_TIMEOUT = float(os.getenv("SUPABASE_CONNECT_TIMEOUT", 5))
+SUPABASE_READ_TIMEOUT = float(os.getenv("SUPABASE_READ_TIMEOUT", 30))
+SUPABASE_READ_RETRIES = int(os.getenv("SUPABASE_READ_RETRIES", 2))  # GET/HEAD only
+SUPABASE_RETRY_BACKOFF = float(os.getenv("SUPABASE_RETRY_BACKOFF", 0.2))
+SUPABASE_HTTP2 = os.getenv("SUPABASE_HTTP2", "true").lower() == "true"
+QUERY_FANOUT_WORKERS = int(os.getenv("QUERY_FANOUT_WORKERS", 16))  # Threads for concurrent independent queries
+
+
+def _supabase_client_factory(name, key):
+    return lambda: create_pooled_client(
+        name, SUPABASE_URL, key,
+        pool_size=SUPABASE_POOL_SIZE,
+        keepalive=SUPABASE_POOL_KEEPALIVE,
+        keepalive_expiry=SUPABASE_KEEPALIVE_EXPIRY,
+        connect_timeout=SUPABASE_CONNECT_TIMEOUT,
+        read_timeout=SUPABASE_READ_TIMEOUT,
+        retries=SUPABASE_READ_RETRIES,
+        backoff=SUPABASE_RETRY_BACKOFF,
+        http2=SUPABASE_HTTP2
+    )
+
+
+# Create Supabase clients (built lazily on first use in each worker)
+supabase = LazyClient(_supabase_client_factory('supabase', SUPABASE_ANON_KEY))
+supabase_admin = LazyClient(_supabase_client_factory('supabase_admin', SUPABASE_SERVICE_ROLE_KEY))
 
 # Google Maps API
 MAPS_API_KEY = os.getenv("MAPS_API_KEY", "")
@@ -28,11 +54,69 @@ RATE_LIMITS = {
     'provider_rating': {'max': 1, 'window': '30days'}
 }
 
+# Rate limiter engine: 'memory' (per worker), 'redis' (shared) or 'db' (check_rate_limit RPC per request).
+# 'memory' only handles windows up to a day; 7days / 30days limits always go to the database.
+RATE_LIMIT_BACKEND = os.getenv("RATE_LIMIT_BACKEND", "memory")
+RATE_LIMIT_ALGORITHM = os.getenv("RATE_LIMIT_ALGORITHM", "sliding_log")  # or 'token_bucket'
+RATE_LIMIT_FLUSH_SECONDS = int(os.getenv("RATE_LIMIT_FLUSH_SECONDS", 60))  # 0 disables rate_limits auditing
+
 # JWT configuration
 JWT_SECRET = os.getenv("FLASK_SECRET_KEY", "dev-secret-key")
 JWT_ALGORITHM = "HS256"
 JWT_EXPIRATION_HOURS = 24
 
+# Supabase token verification
+# 'remote' asks Supabase Auth on every request, 'local' validates the JWT in-process
+# (signature, exp, aud). Local mode does not see sessions revoked before token expiry.
+AUTH_VERIFY_MODE = os.getenv("AUTH_VERIFY_MODE", "remote")
+SUPABASE_JWT_SECRET = os.getenv("SUPABASE_JWT_SECRET")  # Legacy HS256 projects
+SUPABASE_JWT_AUDIENCE = os.getenv("SUPABASE_JWT_AUDIENCE", "authenticated")
+SUPABASE_JWKS_URL = os.getenv("SUPABASE_JWKS_URL", f"{SUPABASE_URL}/auth/v1/.well-known/jwks.json")
+SUPABASE_JWKS_ALGORITHMS = os.getenv("SUPABASE_JWKS_ALGORITHMS", "ES256,RS256").split(',')  # Signing key algorithms
+JWKS_REFRESH_SECONDS = int(os.getenv("JWKS_REFRESH_SECONDS", 600))
+# Verified-token cache, local mode only: a revoked session stays accepted for up to
+# AUTH_TOKEN_CACHE_TTL seconds (remote mode never caches, so revocation is immediate)
+AUTH_TOKEN_CACHE_SIZE = int(os.getenv("AUTH_TOKEN_CACHE_SIZE", 2048))
+AUTH_TOKEN_CACHE_TTL = int(os.getenv("AUTH_TOKEN_CACHE_TTL", 300))
+
+# Shared caches: 'memory' (per worker) or 'redis' (any Redis-compatible server)
+CACHE_BACKEND = os.getenv("CACHE_BACKEND", "memory")
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+
+# Role cache used by require_admin / require_provider
+ROLE_CACHE_SIZE = int(os.getenv("ROLE_CACHE_SIZE", 4096))
+ROLE_CACHE_TTL = int(os.getenv("ROLE_CACHE_TTL", 60))
+
+# Batched lookups (utils/lookups.py), e.g. owner names in provider dashboards
+LOOKUP_CHUNK_SIZE = int(os.getenv("LOOKUP_CHUNK_SIZE", 100))  # ids per `in_` query
+LOOKUP_CACHE_SIZE = int(os.getenv("LOOKUP_CACHE_SIZE", 10000))
+LOOKUP_CACHE_TTL = int(os.getenv("LOOKUP_CACHE_TTL", 30))
+
+# Real-time chat events (SSE): 'memory' (per worker) or 'redis' (relayed to every worker).
+# An open stream holds its worker for up to SSE_MAX_SECONDS: serve the app with
+# gunicorn -k gevent (or eventlet), or route /stream to a separate pool of such workers;
+# sync workers would be exhausted by a handful of open chats.
+PUBSUB_BACKEND = os.getenv("PUBSUB_BACKEND", "memory")
+SSE_QUEUE_SIZE = int(os.getenv("SSE_QUEUE_SIZE", 100))  # Pending events per connection before it is dropped
+SSE_MAX_CONNECTIONS = int(os.getenv("SSE_MAX_CONNECTIONS", 1000))  # Per worker
+SSE_HEARTBEAT_SECONDS = int(os.getenv("SSE_HEARTBEAT_SECONDS", 15))
+SSE_MAX_SECONDS = int(os.getenv("SSE_MAX_SECONDS", 300))  # Clients reconnect after this
+SSE_TICKET_TTL = int(os.getenv("SSE_TICKET_TTL", 60))  # Seconds to open a stream with a ticket (EventSource)
+
+# Geohash prefilter for nearby searches (utils/geo.py, db/migrations/geohash_cells.sql)
+GEOHASH_PRECISION = 8  # Stored cell size (~38m x 19m); must match the migration
+GEO_COVER_MAX_CELLS = int(os.getenv("GEO_COVER_MAX_CELLS", 16))
+
+# Reference data snapshot (utils/reference_data.py): species, breeds, vaccines, service types
+REFERENCE_DATA_TTL = int(os.getenv("REFERENCE_DATA_TTL", 3600))  # Reload even without a version bump (edits made outside the BFF)
+REFERENCE_DATA_VERSION_CHECK = int(os.getenv("REFERENCE_DATA_VERSION_CHECK", 5))  # Seconds between checks of the shared version
+REFERENCE_DATA_MAX_AGE = int(os.getenv("REFERENCE_DATA_MAX_AGE", 300))  # Cache-Control max-age sent to clients
+REFERENCE_DATA_WARM_ON_STARTUP = os.getenv("REFERENCE_DATA_WARM_ON_STARTUP", "True") == "True"
+
+# Admin reports (utils/reports.py): results cached per report type and parameters
+ADMIN_REPORT_CACHE_SIZE = int(os.getenv("ADMIN_REPORT_CACHE_SIZE", 256))
+ADMIN_REPORT_CACHE_TTL = int(os.getenv("ADMIN_REPORT_CACHE_TTL", 60))
+
 # Pagination defaults
 DEFAULT_PAGE_SIZE = 20
 MAX_PAGE_SIZE = 100
@@ -46,6 +130,17 @@ WALK_AUTOCLOSE_HOURS = 10
 # File upload limits
 MAX_FILE_SIZE_MB = 10
 ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'pdf'}
+# Bytes read from the client / sent to Storage at a time by streaming uploads
+UPLOAD_CHUNK_SIZE = int(os.getenv("UPLOAD_CHUNK_SIZE", 256 * 1024))
+# Seconds a direct-to-storage upload can take before it must be finalized
+UPLOAD_URL_TTL = int(os.getenv("UPLOAD_URL_TTL", 600))
+
+# Image variants generated in the background for pet / lost-pet photos (utils/images.py)
+IMAGE_VARIANT_WORKERS = int(os.getenv("IMAGE_VARIANT_WORKERS", 2))  # Processes (and threads) per worker; 0 disables
+IMAGE_VARIANT_FORMAT = os.getenv("IMAGE_VARIANT_FORMAT", "webp")  # or 'jpeg'
+IMAGE_VARIANT_QUALITY = int(os.getenv("IMAGE_VARIANT_QUALITY", 80))
+IMAGE_THUMB_SIZE = int(os.getenv("IMAGE_THUMB_SIZE", 320))  # Longest side, pixels
+IMAGE_MEDIUM_SIZE = int(os.getenv("IMAGE_MEDIUM_SIZE", 1080))
 
 # Supported languages (PRD Section 18)
 SUPPORTED_LANGUAGES = ['es', 'en', 'pt']
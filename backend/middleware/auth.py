@@ -5,12 +5,34 @@ Validates JWT tokens from Supabase Auth
 
 from flask import request, g
 from functools import wraps
-from config import supabase
+from types import SimpleNamespace
+from config import (
+    supabase, AUTH_VERIFY_MODE, SUPABASE_JWT_SECRET, SUPABASE_JWT_AUDIENCE,
+    SUPABASE_JWKS_URL, SUPABASE_JWKS_ALGORITHMS, JWKS_REFRESH_SECONDS, AUTH_TOKEN_CACHE_SIZE, AUTH_TOKEN_CACHE_TTL,
+    ROLE_CACHE_SIZE, ROLE_CACHE_TTL, JWT_SECRET, SSE_TICKET_TTL
+)
+from utils.cache import make_cache
+import hashlib
+import jwt
 import sys
+import time
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Locally verified tokens, keyed by SHA-256 of the raw token and capped at the token's exp
+_token_cache = make_cache('auth_tokens', maxsize=AUTH_TOKEN_CACHE_SIZE, ttl=AUTH_TOKEN_CACHE_TTL, shared=False)
+
+# is_admin / is_provider / provider_id per user, invalidated on profile/provider writes
+_role_cache = make_cache('user_roles', maxsize=ROLE_CACHE_SIZE, ttl=ROLE_CACHE_TTL)
+
+# Audience of the tickets issued by issue_stream_ticket()
+_STREAM_TICKET_AUDIENCE = 'stream'
+
+# Signing keys for asymmetric Supabase projects (refetched every JWKS_REFRESH_SECONDS
+# and whenever a token carries an unknown kid)
+_jwks_client = jwt.PyJWKClient(SUPABASE_JWKS_URL, cache_jwk_set=True, lifespan=JWKS_REFRESH_SECONDS)
+
 # Public endpoints that don't require authentication
 PUBLIC_ENDPOINTS = [
     '/health',
@@ -35,8 +57,9 @@ def is_public_endpoint(path, method='GET'):
         # Exact match or path starts with endpoint followed by / or ?
         # BUT: /api/providers should only match the list endpoint, not /api/providers/me/*
         if endpoint == '/api/providers':
-            # Only allow exact match or query params, NOT subpaths like /me/services
-            if path == endpoint or path.startswith(endpoint + '?'):
+            # Only allow exact match or query params, NOT subpaths like /me/services,
+            # and only for search (POST creates a provider profile and needs auth)
+            if method == 'GET' and (path == endpoint or path.startswith(endpoint + '?')):
                 return True
         elif path == endpoint or path.startswith(endpoint + '/') or path.startswith(endpoint + '?'):
             return True
@@ -49,20 +72,136 @@ def is_public_endpoint(path, method='GET'):
 
     return False
 
+def verify_token_remote(token):
+    """Verify token with Supabase Auth (one HTTP round-trip)"""
+    user = supabase.auth.get_user(token)
+    if not user or not user.user:
+        return None
+    return user.user
+
+def verify_token_local(token):
+    """
+    Verify Supabase JWT in-process: signature, expiry and audience.
+    Returns None when no signing key is configured for the token's algorithm,
+    so the caller can fall back to remote verification. The accepted algorithms
+    are fixed per key type; the unverified header only picks the branch.
+    """
+    alg = jwt.get_unverified_header(token).get('alg')
+
+    if alg == 'HS256':
+        if not SUPABASE_JWT_SECRET:
+            return None
+        key, algorithms = SUPABASE_JWT_SECRET, ['HS256']
+    elif alg in SUPABASE_JWKS_ALGORITHMS:
+        key, algorithms = _jwks_client.get_signing_key_from_jwt(token).key, SUPABASE_JWKS_ALGORITHMS
+    else:
+        raise jwt.InvalidAlgorithmError(f'Token algorithm not allowed: {alg}')
+
+    claims = jwt.decode(
+        token,
+        key,
+        algorithms=algorithms,
+        audience=SUPABASE_JWT_AUDIENCE,
+        options={'require': ['exp', 'sub']}
+    )
+
+    return SimpleNamespace(
+        id=claims['sub'],
+        email=claims.get('email'),
+        phone=claims.get('phone'),
+        role=claims.get('role'),
+        aud=claims.get('aud'),
+        app_metadata=claims.get('app_metadata', {}),
+        user_metadata=claims.get('user_metadata', {})
+    )
+
+def verify_token(token):
+    """
+    Resolve the user for a token. Only local mode uses the token cache:
+    remote mode asks Supabase every time so revoked sessions are rejected at once.
+    """
+    if AUTH_VERIFY_MODE != 'local':
+        return verify_token_remote(token)
+
+    cache_key = hashlib.sha256(token.encode()).hexdigest()
+    user = _token_cache.get(cache_key)
+    if user is not None:
+        return user
+
+    user = verify_token_local(token)
+    if user is None:
+        user = verify_token_remote(token)
+    if user is None:
+        return None
+
+    # Never keep a user cached past the token's own expiry
+    exp = jwt.decode(token, options={'verify_signature': False}).get('exp')
+    _token_cache.set(cache_key, user, expires_at=exp)
+    return user
+
+def issue_stream_ticket(user_id, endpoint, **view_args):
+    """
+    Short-lived ticket authenticating a GET of one endpoint (with these view args)
+    via ?ticket=, for clients that cannot send an Authorization header
+    (browser EventSource). Returns (ticket, expires_at).
+    """
+    expires_at = int(time.time()) + SSE_TICKET_TTL
+    ticket = jwt.encode(
+        {
+            'sub': str(user_id), 'endpoint': endpoint, 'args': view_args,
+            'aud': _STREAM_TICKET_AUDIENCE, 'exp': expires_at
+        },
+        JWT_SECRET,
+        algorithm='HS256'
+    )
+    return ticket, expires_at
+
+def verify_stream_ticket(ticket, endpoint, view_args):
+    """User of a ticket issued for endpoint/view_args, None if it is invalid, expired or for another URL"""
+    try:
+        claims = jwt.decode(ticket, JWT_SECRET, algorithms=['HS256'], audience=_STREAM_TICKET_AUDIENCE)
+    except jwt.InvalidTokenError:
+        return None
+    if claims.get('endpoint') != endpoint or claims.get('args') != view_args:
+        return None
+    return SimpleNamespace(id=claims['sub'])
+
+def invalidate_token(token):
+    """Drop a token from the verification cache (e.g. on logout)"""
+    _token_cache.delete(hashlib.sha256(token.encode()).hexdigest())
+
 def auth_middleware():
     """Validate authentication token before each request"""
     # Skip auth for OPTIONS requests (CORS preflight)
     if request.method == 'OPTIONS':
         return None
 
-    # Skip auth for public endpoints
-    if is_public_endpoint(request.path, request.method):
+    # Skip auth for public endpoints (policy precomputed per URL rule, see route_policy.py;
+    # unmatched paths fall back to the prefix lists)
+    policy = getattr(request.url_rule, 'route_policy', None)
+    if policy is not None:
+        is_public = request.method in policy.public_methods
+    else:
+        is_public = is_public_endpoint(request.path, request.method)
+
+    if is_public:
         logger.info(f"Public endpoint accessed: {request.method} {request.path}")
         return None
 
     # Get token from Authorization header
     auth_header = request.headers.get('Authorization')
 
+    # EventSource cannot send headers: streams authenticate with a ticket bound to their URL
+    if not auth_header and request.method == 'GET' and request.args.get('ticket'):
+        user = verify_stream_ticket(request.args['ticket'], request.endpoint, request.view_args)
+        if not user:
+            logger.error(f"Auth failed for {request.path}: Invalid stream ticket")
+            return {'error': 'Invalid or expired ticket'}, 401
+        g.user = user
+        g.user_id = user.id
+        g.token = None
+        return None
+
     if not auth_header:
         logger.error(f"Auth failed for {request.path}: No authorization header")
         return {'error': 'No authorization header'}, 401
@@ -72,17 +211,17 @@ def auth_middleware():
         token = auth_header.split(' ')[1] if ' ' in auth_header else auth_header
         logger.info(f"Validating token for {request.path}: {token[:20]}...")
 
-        # Verify token with Supabase
-        user = supabase.auth.get_user(token)
-        logger.info(f"User authenticated: {user.user.id if user and user.user else 'NO USER'}")
+        # Verify token (locally or with Supabase, see AUTH_VERIFY_MODE)
+        user = verify_token(token)
+        logger.info(f"User authenticated: {user.id if user else 'NO USER'}")
 
-        if not user or not user.user:
+        if not user:
             logger.error(f"Auth failed: Invalid token")
             return {'error': 'Invalid token'}, 401
 
         # Store user in request context
-        g.user = user.user
-        g.user_id = user.user.id
+        g.user = user
+        g.user_id = user.id
         g.token = token
 
         logger.info(f"Auth successful for user {g.user_id}")
@@ -101,6 +240,47 @@ def require_auth(f):
         return f(*args, **kwargs)
     return decorated_function
 
+def get_user_roles(user_id):
+    """
+    Resolve is_admin, is_provider and provider_id for a user.
+    Cached across requests (ROLE_CACHE_TTL) and memoized on g for the current request.
+    """
+    if getattr(g, 'roles', None) is not None and g.get('roles_user_id') == user_id:
+        return g.roles
+
+    key = str(user_id)
+    roles = _role_cache.get(key)
+
+    if roles is None:
+        profile = supabase.table('profiles')\
+            .select('is_admin, is_provider')\
+            .eq('id', key)\
+            .execute()
+
+        profile_data = profile.data[0] if profile.data else {}
+        roles = {
+            'is_admin': bool(profile_data.get('is_admin')),
+            'is_provider': bool(profile_data.get('is_provider')),
+            'provider_id': None
+        }
+
+        if roles['is_provider']:
+            provider = supabase.table('providers').select('id').eq('profile_id', key).execute()
+            if provider.data:
+                roles['provider_id'] = provider.data[0]['id']
+
+        _role_cache.set(key, roles)
+
+    g.roles = roles
+    g.roles_user_id = user_id
+    return roles
+
+def invalidate_user_roles(user_id):
+    """Drop cached roles for a user (call after writes to profiles/providers)"""
+    _role_cache.delete(str(user_id))
+    if g and g.get('roles_user_id') == user_id:
+        g.roles = None
+
 def require_admin(f):
     """Decorator to require admin privileges"""
     @wraps(f)
@@ -109,10 +289,9 @@ def require_admin(f):
             return {'error': 'Authentication required'}, 401
 
         # Check if user is admin
-        from config import supabase
-        profile = supabase.table('profiles').select('is_admin').eq('id', g.user_id).single().execute()
+        roles = get_user_roles(g.user_id)
 
-        if not profile.data or not profile.data.get('is_admin'):
+        if not roles['is_admin']:
             return {'error': 'Admin privileges required'}, 403
 
         return f(*args, **kwargs)
@@ -126,19 +305,15 @@ def require_provider(f):
             return {'error': 'Authentication required'}, 401
 
         # Check if user is provider
-        from config import supabase
-        profile = supabase.table('profiles').select('is_provider').eq('id', g.user_id).single().execute()
+        roles = get_user_roles(g.user_id)
 
-        if not profile.data or not profile.data.get('is_provider'):
+        if not roles['is_provider']:
             return {'error': 'Provider role required'}, 403
 
-        # Get provider ID
-        provider = supabase.table('providers').select('id').eq('profile_id', g.user_id).execute()
-
-        if not provider.data or len(provider.data) == 0:
+        if not roles['provider_id']:
             return {'error': 'Provider profile not found'}, 404
 
-        g.provider_id = provider.data[0]['id']
+        g.provider_id = roles['provider_id']
 
         return f(*args, **kwargs)
     return decorated_function
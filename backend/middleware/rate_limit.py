@@ -4,7 +4,13 @@ Anti-spam protection
 """
 
 from flask import request, g
-from config import supabase, RATE_LIMITS
+from config import supabase, RATE_LIMITS, RATE_LIMIT_BACKEND
+from utils.rate_limiter import create_rate_limiter
+
+# In-process / shared-store limiter; None keeps the legacy check_rate_limit RPC.
+# Windows the limiter does not handle (longer than a day in memory) also use the RPC,
+# which records them in rate_limits itself.
+rate_limiter = create_rate_limiter() if RATE_LIMIT_BACKEND != 'db' else None
 
 def rate_limit_middleware():
     """Check rate limits before processing request"""
@@ -12,8 +18,12 @@ def rate_limit_middleware():
     if request.method == 'GET' or not hasattr(g, 'user_id'):
         return None
 
-    # Determine action type based on endpoint
-    action_type = get_action_type(request.path, request.method)
+    # Determine action type based on endpoint (precomputed per URL rule when matched)
+    policy = getattr(request.url_rule, 'route_policy', None)
+    if policy is not None:
+        action_type = policy.action_types.get(request.method)
+    else:
+        action_type = get_action_type(request.path, request.method)
 
     if not action_type:
         return None
@@ -24,16 +34,20 @@ def rate_limit_middleware():
         return None
 
     try:
-        # Check rate limit using database function
-        result = supabase.rpc('check_rate_limit', {
-            'p_profile_id': str(g.user_id),
-            'p_action_type': action_type,
-            'p_max_count': limit_config['max'],
-            'p_window_interval': get_interval(limit_config['window'])
-        }).execute()
+        if rate_limiter and rate_limiter.handles(limit_config['window']):
+            allowed = rate_limiter.hit(g.user_id, action_type, limit_config['max'], limit_config['window'])
+        else:
+            # Check rate limit using database function
+            result = supabase.rpc('check_rate_limit', {
+                'p_profile_id': str(g.user_id),
+                'p_action_type': action_type,
+                'p_max_count': limit_config['max'],
+                'p_window_interval': get_interval(limit_config['window'])
+            }).execute()
+            allowed = result.data is not False
 
         # If rate limit exceeded, return 429
-        if result.data is False:
+        if not allowed:
             return {
                 'error': 'Rate limit exceeded',
                 'message': f"Maximum {limit_config['max']} {action_type}s per {limit_config['window']}"
@@ -0,0 +1,36 @@
+"""
+Route policy table
+Classifies every registered URL rule once at app creation (public methods,
+rate-limit action per method) so the auth and rate-limit middleware resolve
+a request's policy from request.url_rule instead of scanning the path.
+"""
+
+from collections import namedtuple
+
+from middleware.auth import is_public_endpoint
+from middleware.rate_limit import get_action_type
+
+RoutePolicy = namedtuple('RoutePolicy', ['public_methods', 'action_types'])
+
+
+def classify_rule(rule):
+    """Build the RoutePolicy for a single werkzeug Rule"""
+    # Classify the canonical path (no trailing slash), which is what clients send
+    # and what the prefix lists in PUBLIC_ENDPOINTS / PUBLIC_GET_ONLY describe
+    path = rule.rule.rstrip('/') or '/'
+    methods = rule.methods or set()
+
+    public_methods = frozenset(m for m in methods if is_public_endpoint(path, m))
+    action_types = {}
+    for method in methods:
+        action_type = get_action_type(path, method)
+        if action_type:
+            action_types[method] = action_type
+
+    return RoutePolicy(public_methods, action_types)
+
+
+def compile_route_policies(app):
+    """Attach a RoutePolicy to every rule in app.url_map (call after registering routes)"""
+    for rule in app.url_map.iter_rules():
+        rule.route_policy = classify_rule(rule)
@@ -3,8 +3,14 @@ Admin routes (PRD Section 15)
 """
 
 from flask import Blueprint, request, g
-from config import supabase
-from middleware.auth import require_admin
+from config import supabase, supabase_admin, MAX_PAGE_SIZE
+from middleware.auth import require_admin, invalidate_user_roles
+from utils.lookups import invalidate_lookup
+from utils.cache import get_cache_stats
+from utils.supabase_client import get_pool_stats
+from utils.reference_data import get_reference_data_stats, invalidate_reference_data
+from utils.pagination import paginate, get_count_mode
+from utils.reports import REPORTS, run_report
 from datetime import datetime, timedelta
 
 admin_bp = Blueprint('admin', __name__)
@@ -27,82 +33,14 @@ def get_metrics():
         if not start_date:
             start_date = (datetime.now() - timedelta(days=30)).isoformat()
 
-        metrics = {}
-
-        # New users per month
-        user_query = supabase.table('profiles')\
-            .select('id', count='exact')\
-            .gte('created_at', start_date)\
-            .lte('created_at', end_date)
-
-        if country:
-            user_query = user_query.eq('country', country)
-
-        metrics['new_users'] = user_query.execute().count
-
-        # Total users
-        total_users_query = supabase.table('profiles')\
-            .select('id', count='exact')\
-            .eq('is_deleted', False)
-
-        if country:
-            total_users_query = total_users_query.eq('country', country)
-
-        metrics['total_users'] = total_users_query.execute().count
-
-        # Pets registered
-        pets_query = supabase.table('pets')\
-            .select('id', count='exact')\
-            .eq('is_deleted', False)
-
-        if country:
-            # Join with profiles to filter by country
-            pets_query = pets_query.select('*, profiles!owner_id(country)')\
-                .eq('profiles.country', country)
-
-        metrics['total_pets'] = pets_query.execute().count
-
-        # Conversations initiated
-        conv_query = supabase.table('conversations')\
-            .select('id', count='exact')\
-            .gte('created_at', start_date)\
-            .lte('created_at', end_date)
-
-        metrics['new_conversations'] = conv_query.execute().count
-
-        # Appointments scheduled
-        appt_query = supabase.table('appointments')\
-            .select('id', count='exact')\
-            .gte('created_at', start_date)\
-            .lte('created_at', end_date)
-
-        metrics['new_appointments'] = appt_query.execute().count
-
-        # Active providers
-        prov_query = supabase.table('providers')\
-            .select('id', count='exact')\
-            .eq('active', True)
-
-        if country:
-            prov_query = prov_query.select('*, profiles!profile_id(country)')\
-                .eq('profiles.country', country)
-
-        metrics['active_providers'] = prov_query.execute().count
-
-        # Lost pet reports
-        lost_query = supabase.table('lost_pet_reports')\
-            .select('id', count='exact')\
-            .eq('found', False)
-
-        metrics['active_lost_pets'] = lost_query.execute().count
-
-        # Total walks
-        walks_query = supabase.table('walks')\
-            .select('id', count='exact')\
-            .gte('created_at', start_date)\
-            .lte('created_at', end_date)
-
-        metrics['total_walks'] = walks_query.execute().count
+        # One call: closed days come from the daily rollup, totals from trigger-maintained
+        # counters, the partial edges of the range are counted live
+        # (db/migrations/admin_metrics_rollup.sql)
+        metrics = supabase_admin.rpc('get_admin_metrics', {
+            'p_start': start_date,
+            'p_end': end_date,
+            'p_country': country
+        }).execute().data
 
         return {
             'metrics': metrics,
@@ -122,13 +60,13 @@ def get_users():
     """Get all users (admin only)"""
     page = int(request.args.get('page', 1))
     page_size = int(request.args.get('page_size', 50))
-    offset = (page - 1) * page_size
+    cursor = request.args.get('cursor')
     country = request.args.get('country')
     is_provider = request.args.get('is_provider')
 
     try:
         query = supabase.table('profiles')\
-            .select('*', count='exact')\
+            .select('*', count=get_count_mode())\
             .eq('is_deleted', False)
 
         if country:
@@ -137,23 +75,12 @@ def get_users():
         if is_provider is not None:
             query = query.eq('is_provider', is_provider == 'true')
 
-        # Get total count
-        count_result = query.execute()
-        total = count_result.count
-
-        # Get paginated results
-        result = query.order('created_at', desc=True)\
-            .range(offset, offset + page_size - 1)\
-            .execute()
+        # Get paginated results (total comes back with the page)
+        result, pagination = paginate(query, page, page_size, cursor)
 
         return {
-            'data': result.data,
-            'pagination': {
-                'page': page,
-                'page_size': page_size,
-                'total': total,
-                'pages': (total + page_size - 1) // page_size
-            }
+            'data': result,
+            'pagination': pagination
         }, 200
 
     except Exception as e:
@@ -173,11 +100,41 @@ def update_user(user_id):
 
     try:
         result = supabase.table('profiles').update(update_data).eq('id', user_id).execute()
+        invalidate_user_roles(user_id)
+        invalidate_lookup('profiles', user_id)
         return result.data[0], 200
 
     except Exception as e:
         return {'error': 'Update failed', 'message': str(e)}, 400
 
+@admin_bp.route('/cache-stats', methods=['GET'])
+@require_admin
+def get_cache_stats_route():
+    """Hit/miss counters for the BFF caches (admin only)"""
+    return {'data': get_cache_stats()}, 200
+
+@admin_bp.route('/pool-stats', methods=['GET'])
+@require_admin
+def get_pool_stats_route():
+    """Supabase HTTP connection pool counters for this worker (admin only)"""
+    return {'data': get_pool_stats()}, 200
+
+@admin_bp.route('/reference-data', methods=['GET'])
+@require_admin
+def get_reference_data_stats_route():
+    """Reference data snapshot version, age and sizes for this worker (admin only)"""
+    return {'data': get_reference_data_stats()}, 200
+
+@admin_bp.route('/reference-data/refresh', methods=['POST'])
+@require_admin
+def refresh_reference_data():
+    """Reload species, breeds, vaccines and service types in every worker (admin only)"""
+    try:
+        invalidate_reference_data()
+        return {'message': 'Reference data refresh scheduled'}, 200
+    except Exception as e:
+        return {'error': 'Refresh failed', 'message': str(e)}, 400
+
 @admin_bp.route('/reports', methods=['GET'])
 @require_admin
 def get_reports():
@@ -192,48 +149,13 @@ def get_reports():
             # Overall summary
             return get_metrics()
 
-        elif report_type == 'providers':
-            # Provider statistics
-            providers = supabase.table('providers')\
-                .select('*, profiles(full_name, country), _count:provider_ratings(count)')\
-                .eq('active', True)\
-                .order('rating', desc=True)\
-                .execute()
-
-            return {'data': providers.data}, 200
-
-        elif report_type == 'popular_breeds':
-            # Most popular breeds
-            pets = supabase.table('pets')\
-                .select('breed_id, breeds(name, species(name))', count='exact')\
-                .eq('is_deleted', False)\
-                .execute()
-
-            # Group by breed (this should be done in the query, but we'll do it here for simplicity)
-            breed_counts = {}
-            for pet in pets.data:
-                breed_name = pet['breeds']['name']
-                species_name = pet['breeds']['species']['name']
-                key = f"{species_name} - {breed_name}"
-                breed_counts[key] = breed_counts.get(key, 0) + 1
-
-            sorted_breeds = sorted(breed_counts.items(), key=lambda x: x[1], reverse=True)[:20]
-
-            return {
-                'data': [{'breed': k, 'count': v} for k, v in sorted_breeds]
-            }, 200
-
-        elif report_type == 'vaccinations':
-            # Vaccination statistics
-            vaccinations = supabase.table('pet_vaccinations')\
-                .select('vaccine_id, vaccines(name, species(name))', count='exact')\
-                .execute()
-
-            return {'total_vaccinations': vaccinations.count}, 200
-
-        else:
+        if report_type not in REPORTS:
             return {'error': f'Unknown report type: {report_type}'}, 400
 
+        # Aggregated in the database, cached briefly per type and parameters
+        limit = min(request.args.get('limit', 20, type=int), MAX_PAGE_SIZE)
+        return run_report(report_type, limit, request.args.get('country')), 200
+
     except Exception as e:
         return {'error': 'Failed to generate report', 'message': str(e)}, 400
 
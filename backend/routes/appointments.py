@@ -5,6 +5,7 @@ Appointments routes (PRD Section 10)
 from flask import Blueprint, request, g
 from config import supabase
 from middleware.auth import require_auth
+from utils.pagination import paginate, get_count_mode
 from datetime import datetime
 
 appointments_bp = Blueprint('appointments', __name__)
@@ -18,34 +19,23 @@ def get_appointments():
     """
     page = int(request.args.get('page', 1))
     page_size = int(request.args.get('page_size', 20))
-    offset = (page - 1) * page_size
+    cursor = request.args.get('cursor')
     status = request.args.get('status')
 
     try:
         query = supabase.table('appointments')\
-            .select('*, providers(*, profiles(full_name)), pets(name)', count='exact')\
+            .select('*, providers(*, profiles(full_name)), pets(name)', count=get_count_mode())\
             .eq('user_id', g.user_id)
 
         if status:
             query = query.eq('status', status)
 
-        # Get total count
-        count_result = query.execute()
-        total = count_result.count
-
-        # Get paginated results
-        result = query.order('scheduled_at', desc=False)\
-            .range(offset, offset + page_size - 1)\
-            .execute()
+        # Get paginated results (total comes back with the page)
+        result, pagination = paginate(query, page, page_size, cursor, sort_column='scheduled_at', desc=False)
 
         return {
-            'data': result.data,
-            'pagination': {
-                'page': page,
-                'page_size': page_size,
-                'total': total,
-                'pages': (total + page_size - 1) // page_size
-            }
+            'data': result,
+            'pagination': pagination
         }, 200
 
     except Exception as e:
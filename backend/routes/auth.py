@@ -4,7 +4,8 @@ Authentication routes (PRD Section 4)
 
 from flask import Blueprint, request, jsonify
 from config import supabase
-from middleware.auth import require_auth
+from middleware.auth import require_auth, invalidate_token, invalidate_user_roles
+from utils.lookups import invalidate_lookup
 
 auth_bp = Blueprint('auth', __name__)
 
@@ -108,7 +109,10 @@ def login():
 @require_auth
 def logout():
     """Logout user"""
+    from flask import g
+
     try:
+        invalidate_token(g.token)
         supabase.auth.sign_out()
         return {'message': 'Logout successful'}, 200
     except Exception as e:
@@ -146,6 +150,8 @@ def update_profile():
 
     try:
         profile = supabase.table('profiles').update(update_data).eq('id', g.user_id).execute()
+        invalidate_user_roles(g.user_id)
+        invalidate_lookup('profiles', g.user_id)
         return profile.data[0], 200
     except Exception as e:
         return {'error': 'Update failed', 'message': str(e)}, 400
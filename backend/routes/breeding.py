@@ -5,6 +5,7 @@ Breeding routes (PRD Section 9 - Cruces)
 from flask import Blueprint, request, g
 from config import supabase
 from middleware.auth import require_auth
+from utils.pagination import paginate, get_count_mode
 
 breeding_bp = Blueprint('breeding', __name__)
 
@@ -22,11 +23,11 @@ def search_breeding():
     sex = request.args.get('sex')
     page = int(request.args.get('page', 1))
     page_size = int(request.args.get('page_size', 20))
-    offset = (page - 1) * page_size
+    cursor = request.args.get('cursor')
 
     try:
         query = supabase.table('breeding_public')\
-            .select('*', count='exact')
+            .select('*', count=get_count_mode())
 
         if species_id:
             query = query.eq('species_id', species_id)
@@ -43,23 +44,14 @@ def search_breeding():
         # Exclude own pets
         query = query.neq('owner_id', g.user_id)
 
-        # Get total count
-        count_result = query.execute()
-        total = count_result.count
-
-        # Get paginated results
-        result = query.order('age_years', desc=False)\
-            .range(offset, offset + page_size - 1)\
-            .execute()
+        # Get paginated results (total comes back with the page)
+        result, pagination = paginate(
+            query, page, page_size, cursor, sort_column='age_years', desc=False, id_column='pet_id'
+        )
 
         return {
-            'data': result.data,
-            'pagination': {
-                'page': page,
-                'page_size': page_size,
-                'total': total,
-                'pages': (total + page_size - 1) // page_size
-            }
+            'data': result,
+            'pagination': pagination
         }, 200
 
     except Exception as e:
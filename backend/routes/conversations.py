@@ -2,15 +2,26 @@
 Conversations and Messages routes (PRD Section 13)
 """
 
-from flask import Blueprint, request, g
-from config import supabase
-from middleware.auth import require_auth
+from flask import Blueprint, Response, request, g
+from config import supabase, MAX_PAGE_SIZE, SSE_HEARTBEAT_SECONDS, SSE_MAX_SECONDS
+from middleware.auth import require_auth, issue_stream_ticket
+from utils.pubsub import message_bus, OVERFLOW, TooManySubscribers
+from utils.pagination import paginate, encode_cursor, decode_cursor
+import json
 import logging
+import time
 
 logger = logging.getLogger(__name__)
 
 conversations_bp = Blueprint('conversations', __name__)
 
+def _publish(conversation_id, event_type, data):
+    """Push an event to streaming clients; best effort, the write it reports already happened"""
+    try:
+        message_bus.publish(f"conversation:{conversation_id}", event_type, data)
+    except Exception as e:
+        logger.error(f"[CONVERSATIONS/STREAM] Publish failed for {conversation_id}: {str(e)}")
+
 @conversations_bp.route('/', methods=['GET'])
 @require_auth
 def get_conversations():
@@ -18,48 +29,27 @@ def get_conversations():
     Get user's conversations
     PRD Section 13: Sidebar con lista de chats
     """
-    try:
-        # Get conversations where user is participant
-        participants = supabase.table('conversation_participants')\
-            .select('conversation_id')\
-            .eq('profile_id', g.user_id)\
-            .eq('hidden', False)\
-            .execute()
+    # Optional keyset pagination: ?limit=N&cursor=<next_cursor of the previous page>
+    limit = request.args.get('limit', type=int)
+    cursor = request.args.get('cursor')
 
-        if not participants.data:
-            return {'data': []}, 200
-
-        conversation_ids = [p['conversation_id'] for p in participants.data]
-
-        # Get conversations with last message
-        conversations = supabase.table('conversations')\
-            .select('*, participants:conversation_participants(profile_id, profiles(full_name, photo_url))')\
-            .in_('id', conversation_ids)\
-            .order('updated_at', desc=True)\
-            .execute()
-
-        # Get last message for each conversation
-        for conv in conversations.data:
-            last_message = supabase.table('messages')\
-                .select('*')\
-                .eq('conversation_id', conv['id'])\
-                .order('created_at', desc=True)\
-                .limit(1)\
-                .execute()
-
-            conv['last_message'] = last_message.data[0] if last_message.data else None
+    try:
+        params = {'p_profile_id': str(g.user_id)}
+        if limit:
+            params['p_limit'] = min(limit, MAX_PAGE_SIZE)
+        if cursor:
+            params['p_before_updated_at'], params['p_before_id'] = decode_cursor(cursor, 'updated_at')
 
-            # Count unread messages
-            unread = supabase.table('messages')\
-                .select('id', count='exact')\
-                .eq('conversation_id', conv['id'])\
-                .eq('is_read', False)\
-                .neq('sender_id', g.user_id)\
-                .execute()
+        # Conversations with participants, last message and unread count in one call
+        # (db/migrations/conversation_inbox.sql)
+        conversations = supabase.rpc('get_inbox', params).execute()
 
-            conv['unread_count'] = unread.count
+        next_cursor = None
+        if limit and len(conversations.data) == params['p_limit']:
+            last = conversations.data[-1]
+            next_cursor = encode_cursor('updated_at', last['updated_at'], last['id'])
 
-        return {'data': conversations.data}, 200
+        return {'data': conversations.data, 'next_cursor': next_cursor}, 200
 
     except Exception as e:
         return {'error': 'Failed to get conversations', 'message': str(e)}, 400
@@ -159,7 +149,7 @@ def get_messages(conversation_id):
     """Get messages from conversation"""
     page = int(request.args.get('page', 1))
     page_size = int(request.args.get('page_size', 50))
-    offset = (page - 1) * page_size
+    cursor = request.args.get('cursor')  # next_cursor pages towards older messages
 
     try:
         # Verify user is participant
@@ -176,20 +166,22 @@ def get_messages(conversation_id):
         # Get messages
         messages = supabase.table('messages')\
             .select('*, sender:profiles(full_name, photo_url)')\
-            .eq('conversation_id', conversation_id)\
-            .order('created_at', desc=True)\
-            .range(offset, offset + page_size - 1)\
-            .execute()
+            .eq('conversation_id', conversation_id)
+
+        messages, pagination = paginate(messages, page, page_size, cursor)
 
-        # Mark messages as read
-        supabase.table('messages')\
+        # Mark messages as read (idx_messages_unread); a read receipt only when something changed
+        read = supabase.table('messages')\
             .update({'is_read': True})\
             .eq('conversation_id', conversation_id)\
             .neq('sender_id', g.user_id)\
             .eq('is_read', False)\
             .execute()
 
-        return {'data': list(reversed(messages.data))}, 200
+        if read.data:
+            _publish(conversation_id, 'read', {'reader_id': str(g.user_id)})
+
+        return {'data': list(reversed(messages)), 'pagination': pagination}, 200
 
     except Exception as e:
         return {'error': 'Failed to get messages', 'message': str(e)}, 400
@@ -228,6 +220,9 @@ def send_message(conversation_id):
 
         message = supabase.table('messages').insert(message_data).execute()
 
+        # Push to clients streaming this conversation
+        _publish(conversation_id, 'message', message.data[0])
+
         # TODO: Send push notification to other participants
 
         return message.data[0], 201
@@ -235,6 +230,86 @@ def send_message(conversation_id):
     except Exception as e:
         return {'error': 'Failed to send message', 'message': str(e)}, 400
 
+@conversations_bp.route('/<conversation_id>/stream-ticket', methods=['POST'])
+@require_auth
+def create_stream_ticket(conversation_id):
+    """
+    Ticket to open GET /<id>/stream?ticket=... from a browser EventSource, which
+    cannot send the Authorization header. Valid for SSE_TICKET_TTL seconds and
+    only for this conversation's stream; request a new one on every reconnect.
+    """
+    try:
+        # Verify user is participant
+        participant = supabase.table('conversation_participants')\
+            .select('hidden')\
+            .eq('conversation_id', conversation_id)\
+            .eq('profile_id', g.user_id)\
+            .single()\
+            .execute()
+
+        if not participant.data or participant.data['hidden']:
+            return {'error': 'Not a participant'}, 403
+
+        ticket, expires_at = issue_stream_ticket(
+            g.user_id, 'conversations.stream_conversation', conversation_id=conversation_id
+        )
+        return {'data': {'ticket': ticket, 'expires_at': expires_at}}, 200
+
+    except Exception as e:
+        return {'error': 'Failed to create stream ticket', 'message': str(e)}, 400
+
+@conversations_bp.route('/<conversation_id>/stream', methods=['GET'])
+@require_auth
+def stream_conversation(conversation_id):
+    """
+    Server-sent events for a conversation: 'message' (new message) and 'read'
+    (read receipt). Replaces polling GET /<id>/messages. Authenticate with the
+    Authorization header (fetch-based readers) or ?ticket= from POST
+    /<id>/stream-ticket (EventSource). The stream ends after SSE_MAX_SECONDS,
+    or with an 'overflow' event if the client falls behind; clients then
+    reconnect and refetch messages.
+    Holds a worker for the whole stream: needs gevent/eventlet workers (see PUBSUB_BACKEND in config.py).
+    """
+    try:
+        # Verify user is participant
+        participant = supabase.table('conversation_participants')\
+            .select('hidden')\
+            .eq('conversation_id', conversation_id)\
+            .eq('profile_id', g.user_id)\
+            .single()\
+            .execute()
+
+        if not participant.data or participant.data['hidden']:
+            return {'error': 'Not a participant'}, 403
+
+        subscription = message_bus.subscribe(f"conversation:{conversation_id}")
+
+    except TooManySubscribers:
+        return {'error': 'Too many open streams, retry later'}, 503
+    except Exception as e:
+        return {'error': 'Failed to open stream', 'message': str(e)}, 400
+
+    def generate():
+        deadline = time.monotonic() + SSE_MAX_SECONDS
+        try:
+            yield 'retry: 3000\n\n'
+            while time.monotonic() < deadline:
+                event = subscription.get(timeout=SSE_HEARTBEAT_SECONDS)
+                if event is None:
+                    yield ': keep-alive\n\n'
+                elif event is OVERFLOW:
+                    yield 'event: overflow\ndata: {}\n\n'
+                    return
+                else:
+                    yield f"event: {event['type']}\ndata: {json.dumps(event['data'], default=str)}\n\n"
+        finally:
+            subscription.close()
+
+    return Response(generate(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
+
 @conversations_bp.route('/<conversation_id>', methods=['DELETE'])
 @require_auth
 def hide_conversation(conversation_id):
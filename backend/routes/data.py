@@ -1,23 +1,26 @@
 """
 Public data routes for species, breeds, and vaccines
-These are read-only reference data endpoints
+These are read-only reference data endpoints, served from the in-memory
+snapshot in utils/reference_data.py (ETag / 304 aware)
 """
 
 from flask import Blueprint
-from config import supabase
+from utils.reference_data import reference_response
 
 data_bp = Blueprint('data', __name__)
 
+VACCINE_COLUMNS = ('id', 'name', 'description', 'required', 'interval_days', 'contagious_to_humans')
+
+
+def _columns(row, columns):
+    return {column: row.get(column) for column in columns}
+
+
 @data_bp.route('/species', methods=['GET'])
 def get_species():
     """Get all species"""
     try:
-        result = supabase.table('species')\
-            .select('id, name, code')\
-            .order('name')\
-            .execute()
-
-        return {'data': result.data}, 200
+        return reference_response('species', lambda snapshot: {'data': snapshot.datasets['species']})
     except Exception as e:
         return {'error': str(e)}, 500
 
@@ -25,12 +28,7 @@ def get_species():
 def get_breeds():
     """Get all breeds with species info"""
     try:
-        result = supabase.table('breeds')\
-            .select('id, name, code, species_id, species:species_id(name, code)')\
-            .order('name')\
-            .execute()
-
-        return {'data': result.data}, 200
+        return reference_response('breeds', lambda snapshot: {'data': snapshot.datasets['breeds']})
     except Exception as e:
         return {'error': str(e)}, 500
 
@@ -38,13 +36,9 @@ def get_breeds():
 def get_breeds_by_species(species_id):
     """Get breeds for a specific species"""
     try:
-        result = supabase.table('breeds')\
-            .select('id, name, code')\
-            .eq('species_id', species_id)\
-            .order('name')\
-            .execute()
-
-        return {'data': result.data}, 200
+        return reference_response(f'breeds:{species_id}', lambda snapshot: {'data': [
+            _columns(breed, ('id', 'name', 'code')) for breed in snapshot.breeds_by_species.get(species_id, ())
+        ]})
     except Exception as e:
         return {'error': str(e)}, 500
 
@@ -52,25 +46,18 @@ def get_breeds_by_species(species_id):
 def get_vaccines():
     """Get all vaccines with species info"""
     try:
-        result = supabase.table('vaccines')\
-            .select('id, name, description, required, interval_days, contagious_to_humans, species_id, species:species_id(name, code)')\
-            .order('name')\
-            .execute()
-
-        return {'data': result.data}, 200
+        return reference_response('vaccines', lambda snapshot: {'data': [
+            _columns(vaccine, VACCINE_COLUMNS + ('species_id', 'species')) for vaccine in snapshot.datasets['vaccines']
+        ]})
     except Exception as e:
         return {'error': str(e)}, 500
 
 @data_bp.route('/vaccines/by-species/<species_id>', methods=['GET'])
 def get_vaccines_by_species(species_id):
-    """Get vaccines for a specific species"""
+    """Get vaccines for a specific species (required first)"""
     try:
-        result = supabase.table('vaccines')\
-            .select('id, name, description, required, interval_days, contagious_to_humans')\
-            .eq('species_id', species_id)\
-            .order('required.desc, name')\
-            .execute()
-
-        return {'data': result.data}, 200
+        return reference_response(f'vaccines:{species_id}', lambda snapshot: {'data': [
+            _columns(vaccine, VACCINE_COLUMNS) for vaccine in snapshot.vaccines_by_species.get(species_id, ())
+        ]})
     except Exception as e:
         return {'error': str(e)}, 500
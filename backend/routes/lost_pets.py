@@ -3,28 +3,50 @@ Lost Pets routes (PRD Section 11)
 """
 
 from flask import Blueprint, request, g
+from postgrest.exceptions import APIError
 from config import supabase, supabase_admin
 from middleware.auth import require_auth
-import math
+from utils.concurrency import execute_all
+from utils.geo import cell_cover
+from utils.images import thumbnail_url, generate_lost_pet_image_variants
+from utils.lookups import attach_children
+from utils.pagination import paginate, get_count_mode
+from utils.uploads import StorageTarget, UploadedFile, IMAGE_EXTENSIONS
+import logging
+import uuid
+
+logger = logging.getLogger(__name__)
 
 lost_pets_bp = Blueprint('lost_pets', __name__)
 
-def calculate_distance(lat1, lon1, lat2, lon2):
-    """
-    Calculate distance between two points using Haversine formula
-    Returns distance in kilometers
-    """
-    R = 6371  # Earth's radius in kilometers
 
-    lat1_rad = math.radians(lat1)
-    lat2_rad = math.radians(lat2)
-    delta_lat = math.radians(lat2 - lat1)
-    delta_lon = math.radians(lon2 - lon1)
+def _attempt(call):
+    """call wrapped to return (result, None), or (None, error message) if it raises"""
+    def attempt():
+        try:
+            return call(), None
+        except Exception as e:
+            return None, str(e)
+    return attempt
 
-    a = math.sin(delta_lat / 2) ** 2 + math.cos(lat1_rad) * math.cos(lat2_rad) * math.sin(delta_lon / 2) ** 2
-    c = 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
 
-    return R * c
+def _attach_images(reports):
+    """
+    Set report['images'] to its image urls and report['thumbnails'] to their
+    thumbnails (original until generated) for every report on the page;
+    pet['photo_thumb_url'] likewise for the reported pet
+    """
+    attach_children(reports, 'lost_pet_images', 'report_id', 'report_id, image_url, variants', 'images')
+    for report in reports:
+        images = report['images']
+        report['images'] = [img['image_url'] for img in images]
+        report['thumbnails'] = [thumbnail_url(img['image_url'], img.get('variants')) for img in images]
+        if report.get('pet'):
+            report['pet']['photo_thumb_url'] = thumbnail_url(
+                report['pet'].get('photo_url'), report['pet'].get('photo_variants')
+            )
+    return reports
+
 
 @lost_pets_bp.route('/', methods=['GET'])
 def search_lost_pets():
@@ -32,6 +54,7 @@ def search_lost_pets():
     Search lost pets (public endpoint)
     PRD Section 11: Mascotas perdidas
     Supports filtering by location if latitude, longitude, and radius_km are provided
+    (newest first, or nearest first with sort=distance)
     """
     species_id = request.args.get('species_id')
     breed_id = request.args.get('breed_id')
@@ -43,43 +66,27 @@ def search_lost_pets():
     offset = (page - 1) * page_size
 
     try:
-        # If location parameters provided, filter by distance in Python
+        # If location parameters provided, search by radius in the database
+        # (GiST-indexed earth_box prefilter, db/migrations/lost_pets_geo_search.sql)
         if latitude is not None and longitude is not None and radius_km is not None:
-            # Get all reports with location data
-            query = supabase.table('lost_pet_reports')\
-                .select('*, species(name), breeds(name), pet:pets(name, dnia, photo_url, species:species_id(name), breed:breed_id(name))')\
-                .eq('found', False)\
-                .not_.is_('latitude', 'null')\
-                .not_.is_('longitude', 'null')
-
-            if species_id:
-                query = query.eq('species_id', species_id)
-
-            all_reports = query.execute().data
-
-            # Filter by distance
-            filtered_reports = []
-            for report in all_reports:
-                if report['latitude'] and report['longitude']:
-                    distance = calculate_distance(latitude, longitude, report['latitude'], report['longitude'])
-                    if distance <= radius_km:
-                        report['distance_km'] = round(distance, 2)
-                        filtered_reports.append(report)
-
-            # Sort by created_at (newest first)
-            filtered_reports.sort(key=lambda x: x.get('created_at', ''), reverse=True)
-
-            # Apply pagination
-            total = len(filtered_reports)
-            paginated_reports = filtered_reports[offset:offset + page_size]
-
-            # Get images for each report
+            result = supabase.rpc('search_lost_pets_nearby', {
+                'p_latitude': latitude,
+                'p_longitude': longitude,
+                'p_radius_km': radius_km,
+                'p_species_id': species_id,
+                'p_breed_id': breed_id,
+                'p_order': 'distance' if request.args.get('sort') == 'distance' else 'recent',
+                'p_limit': page_size,
+                'p_offset': offset
+            }).execute()
+
+            paginated_reports = result.data
+            total = paginated_reports[0]['total_count'] if paginated_reports else 0
             for report in paginated_reports:
-                images = supabase.table('lost_pet_images')\
-                    .select('image_url')\
-                    .eq('report_id', report['id'])\
-                    .execute()
-                report['images'] = [img['image_url'] for img in images.data]
+                report.pop('total_count', None)
+
+            # Get images for the whole page in one query
+            _attach_images(paginated_reports)
 
             return {
                 'data': {
@@ -87,13 +94,14 @@ def search_lost_pets():
                     'page': page,
                     'page_size': page_size,
                     'count': total,
-                    'total_pages': (total + page_size - 1) // page_size if total > 0 else 0
+                    'total_pages': (total + page_size - 1) // page_size if total > 0 else 0,
+                    'has_more': offset + len(paginated_reports) < total
                 }
             }, 200
 
         # Otherwise, use regular query without location filtering
         query = supabase.table('lost_pet_reports')\
-            .select('*, species(name), breeds(name), pet:pets(name, dnia, photo_url, species:species_id(name), breed:breed_id(name))', count='exact')\
+            .select('*, species(name), breeds(name), pet:pets(name, dnia, photo_url, photo_variants, species:species_id(name), breed:breed_id(name))', count=get_count_mode())\
             .eq('found', False)
 
         if species_id:
@@ -102,30 +110,21 @@ def search_lost_pets():
         if breed_id:
             query = query.eq('breed_id', breed_id)
 
-        # Get total count
-        count_result = query.execute()
-        total = count_result.count
+        # Get paginated results (total comes back with the page)
+        reports, pagination = paginate(query, page, page_size, request.args.get('cursor'))
 
-        # Get paginated results with images
-        reports = query.order('created_at', desc=True)\
-            .range(offset, offset + page_size - 1)\
-            .execute()
-
-        # Get images for each report
-        for report in reports.data:
-            images = supabase.table('lost_pet_images')\
-                .select('image_url')\
-                .eq('report_id', report['id'])\
-                .execute()
-            report['images'] = [img['image_url'] for img in images.data]
+        # Get images for the whole page in one query
+        _attach_images(reports)
 
         return {
             'data': {
-                'data': reports.data,
+                'data': reports,
                 'page': page,
                 'page_size': page_size,
-                'count': total,
-                'total_pages': (total + page_size - 1) // page_size
+                'count': pagination.get('total'),
+                'total_pages': pagination.get('pages'),
+                'has_more': pagination['has_more'],
+                'next_cursor': pagination['next_cursor']
             }
         }, 200
 
@@ -151,7 +150,8 @@ def get_nearby_lost_pets():
             'p_latitude': latitude,
             'p_longitude': longitude,
             'p_radius_km': radius_km,
-            'p_species_id': species_id
+            'p_species_id': species_id,
+            'p_cells': cell_cover(latitude, longitude, radius_km)
         }).execute()
 
         return {'data': result.data}, 200
@@ -167,18 +167,14 @@ def create_lost_pet_report():
     PRD Section 11: Dos opciones - reportar propia perdida o encontrada
     Max 5 reports per day (enforced by rate limiting)
     """
-    print(f"[CREATE REPORT] Content-Type: {request.content_type}")
-    print(f"[CREATE REPORT] Is JSON: {request.is_json}")
-    print(f"[CREATE REPORT] Has files: {bool(request.files)}")
+    logger.debug(f"[CREATE REPORT] Content-Type: {request.content_type}, files: {len(request.files)}")
 
     # Handle both JSON and FormData
     if request.is_json:
         data = request.json
-        print(f"[CREATE REPORT] JSON data: {data}")
     else:
         # FormData - convert to dict
         data = request.form.to_dict()
-        print(f"[CREATE REPORT] Form data: {data}")
         # Convert numeric strings to numbers
         if 'latitude' in data:
             data['latitude'] = float(data['latitude'])
@@ -193,106 +189,64 @@ def create_lost_pet_report():
     if data['report_type'] not in ['lost', 'found']:
         return {'error': 'Report type must be "lost" or "found"'}, 400
 
-    try:
-        report_data = {
-            'reporter_id': str(g.user_id),
-            'report_type': data['report_type'],
-            'description': data['description'],
-            'pet_id': data.get('pet_id'),
-            'species_id': data.get('species_id'),
-            'breed_id': data.get('breed_id'),
-            'contact_phone': data.get('contact_phone'),
-            'last_seen_at': data.get('last_seen_at'),
-            'latitude': data.get('latitude'),
-            'longitude': data.get('longitude'),
-            'found': False
-        }
-
-        # If pet_id provided, verify ownership and check for duplicates
-        if report_data['pet_id']:
-            pet = supabase.table('pets')\
-                .select('owner_id')\
-                .eq('id', report_data['pet_id'])\
-                .single()\
-                .execute()
-
-            if pet.data['owner_id'] != g.user_id:
-                return {'error': 'Not your pet'}, 403
+    # Chosen here so the images can be uploaded before the report is written
+    report_id = str(uuid.uuid4())
+    files = request.files.getlist('images') if request.files else []
+    target = StorageTarget('pet-images', f'lost-pets/{report_id}/', IMAGE_EXTENSIONS, 'jpg')
 
-            # Check if pet already has an active lost report
-            existing_report = supabase.table('lost_pet_reports')\
-                .select('id')\
-                .eq('pet_id', report_data['pet_id'])\
-                .eq('found', False)\
-                .execute()
-
-            if existing_report.data and len(existing_report.data) > 0:
-                return {'error': 'Esta mascota ya tiene un reporte activo de pérdida'}, 400
-
-        report = supabase.table('lost_pet_reports').insert(report_data).execute()
-        report_id = report.data[0]['id']
-
-        # If reporting own pet as lost, copy pet images to lost pet images
-        if report_data['pet_id'] and report_data['report_type'] == 'lost':
-            try:
-                pet_images = supabase.table('pet_images')\
-                    .select('image_url')\
-                    .eq('pet_id', report_data['pet_id'])\
-                    .execute()
-
-                if pet_images.data and len(pet_images.data) > 0:
-                    for pet_image in pet_images.data:
-                        supabase_admin.table('lost_pet_images').insert({
-                            'report_id': report_id,
-                            'image_url': pet_image['image_url']
-                        }).execute()
-                    print(f"Copied {len(pet_images.data)} images from pet {report_data['pet_id']} to report {report_id}")
-                else:
-                    print(f"Warning: Pet {report_data['pet_id']} has no images to copy")
-            except Exception as e:
-                print(f"Error copying pet images: {str(e)}")
-                # Don't fail the whole request if image copying fails
-
-        # Handle file uploads from FormData
-        if request.files:
-            files = request.files.getlist('images')
-            print(f"[CREATE REPORT] Found {len(files)} files to upload")
-            for file in files:
-                print(f"[CREATE REPORT] Uploading file: {file.filename}, type: {file.content_type}")
-                # Upload to Supabase Storage using admin client
-                file_path = f"lost-pets/{report_id}/{file.filename}"
-                file_bytes = file.read()
-
-                upload_result = supabase_admin.storage.from_('pet-images').upload(
-                    file_path,
-                    file_bytes,
-                    {'content-type': file.content_type}
-                )
-                print(f"[CREATE REPORT] Upload result: {upload_result}")
-
-                # Get public URL
-                public_url = supabase_admin.storage.from_('pet-images').get_public_url(file_path)
-                print(f"[CREATE REPORT] Public URL: {public_url}")
-
-                # Save to database (use admin client to bypass RLS)
-                supabase_admin.table('lost_pet_images').insert({
-                    'report_id': report_id,
-                    'image_url': public_url
-                }).execute()
-                print(f"[CREATE REPORT] Saved image to database")
-
-        # Handle images from JSON (if provided as URLs)
-        elif 'images' in data and data['images']:
-            for image_url in data['images']:
-                supabase_admin.table('lost_pet_images').insert({
-                    'report_id': report_id,
-                    'image_url': image_url
-                }).execute()
+    try:
+        # Uploads run concurrently; each one reports its own failure
+        results = execute_all(*[_attempt(lambda file=file: target.store(UploadedFile(file))) for file in files])
+
+        uploaded = []
+        image_errors = []
+        for file, (stored, error) in zip(files, results):
+            if error:
+                logger.warning(f"[CREATE REPORT] Error uploading {file.filename}: {error}")
+                image_errors.append({'file_name': file.filename, 'error': error})
+            else:
+                uploaded.append(stored.url)
+
+        # Ownership check, duplicate detection, the insert and every image row (plus the
+        # pet's own images when reporting it lost) in one transaction
+        # (db/migrations/create_lost_pet_report.sql)
+        try:
+            report = supabase_admin.rpc('create_lost_pet_report', {
+                'p_id': report_id,
+                'p_reporter_id': str(g.user_id),
+                'p_report_type': data['report_type'],
+                'p_description': data['description'],
+                'p_pet_id': data.get('pet_id') or None,
+                'p_species_id': data.get('species_id') or None,
+                'p_breed_id': data.get('breed_id') or None,
+                'p_contact_phone': data.get('contact_phone'),
+                'p_last_seen_at': data.get('last_seen_at') or None,
+                'p_latitude': data.get('latitude'),
+                'p_longitude': data.get('longitude'),
+                'p_image_urls': uploaded if files else data.get('images') or []
+            }).execute().data
+        except Exception:
+            # The report was not created: its files have nothing to belong to
+            target.remove([stored for stored, _ in results if stored])
+            raise
+
+        for image_url in uploaded:
+            generate_lost_pet_image_variants(report_id, image_url)
+
+        report['image_errors'] = image_errors
 
         # TODO: Notify nearby users if they have notifications enabled
 
-        return {'data': report.data[0]}, 201
+        return {'data': report}, 201
 
+    except APIError as e:
+        if e.code == '42501':
+            return {'error': 'Not your pet'}, 403
+        if e.code == 'P0002':
+            return {'error': 'Pet not found'}, 404
+        if e.code == 'P0001':
+            return {'error': e.message}, 409  # Active report already exists
+        return {'error': 'Failed to create report', 'message': e.message}, 400
     except Exception as e:
         return {'error': 'Failed to create report', 'message': str(e)}, 400
 
@@ -301,18 +255,13 @@ def get_lost_pet_report(report_id):
     """Get lost pet report details (public)"""
     try:
         report = supabase.table('lost_pet_reports')\
-            .select('*, species(name), breeds(name), pet:pets(name, dnia, photo_url), reporter:profiles(full_name)')\
+            .select('*, species(name), breeds(name), pet:pets(name, dnia, photo_url), reporter:profiles(full_name), images:lost_pet_images(image_url)')\
             .eq('id', report_id)\
             .single()\
             .execute()
 
-        # Get images
-        images = supabase.table('lost_pet_images')\
-            .select('image_url')\
-            .eq('report_id', report_id)\
-            .execute()
-
-        report.data['images'] = [img['image_url'] for img in images.data]
+        # Images come embedded; flatten to a list of urls
+        report.data['images'] = [img['image_url'] for img in report.data.get('images') or []]
 
         return report.data, 200
 
@@ -1,9 +1,9 @@
 from flask import Blueprint, request, jsonify, g
 from config import supabase, supabase_admin
 from middleware.auth import require_auth
+from utils.lookups import get_profile_names
+from utils.uploads import StorageTarget, Base64File, UploadRejected, is_multipart, stream_form
 from datetime import datetime
-import base64
-import uuid
 
 medical_records_bp = Blueprint('medical_records', __name__)
 
@@ -21,30 +21,16 @@ def get_pet_medical_records(pet_id):
 
         # Map record_date to date for frontend compatibility and add created_by_name
         records = result.data
+
+        # Creator names in one batched lookup (created_by = auth.uid = profiles.id)
+        creator_names = get_profile_names(record.get('created_by') for record in records)
+
         for record in records:
             if 'record_date' in record:
                 record['date'] = record['record_date']
 
-            # Get user's full name if created_by exists
-            if 'created_by' in record and record['created_by']:
-                try:
-                    # Get profile using the auth user ID (created_by = auth.uid = profiles.id)
-                    profile_result = supabase.table('profiles')\
-                        .select('full_name')\
-                        .eq('id', record['created_by'])\
-                        .single()\
-                        .execute()
-
-                    if profile_result.data:
-                        full_name = profile_result.data.get('full_name', '').strip()
-                        record['created_by_name'] = full_name if full_name else 'Veterinario'
-                    else:
-                        record['created_by_name'] = 'Veterinario'
-                except Exception as profile_error:
-                    print(f'[MEDICAL_RECORDS] Error getting profile info: {str(profile_error)}')
-                    record['created_by_name'] = 'Veterinario'
-            else:
-                record['created_by_name'] = 'Veterinario'
+            full_name = (creator_names.get(str(record.get('created_by'))) or '').strip()
+            record['created_by_name'] = full_name if full_name else 'Veterinario'
 
         return jsonify(records), 200
     except Exception as e:
@@ -57,9 +43,17 @@ def get_pet_medical_records(pet_id):
 @medical_records_bp.route('/pets/<pet_id>/medical-records', methods=['POST'])
 @require_auth
 def create_medical_record(pet_id):
-    """Create a new medical record for a pet"""
+    """
+    Create a new medical record for a pet
+    Accepts JSON (attachment_data in base64) or multipart/form-data with an 'attachment' file part
+    """
+    target = medical_record_attachment_target(pet_id)
+    files = {}
     try:
-        data = request.get_json()
+        if is_multipart():
+            data, files = stream_form(lambda name, fields: target if name == 'attachment' else None)
+        else:
+            data = request.get_json()
         print(f'[MEDICAL_RECORDS] === POST REQUEST RECEIVED ===')
         print(f'[MEDICAL_RECORDS] pet_id: {pet_id}')
         print(f'[MEDICAL_RECORDS] user_id from g: {g.user_id}')
@@ -69,6 +63,7 @@ def create_medical_record(pet_id):
         # Validate required fields
         if not data.get('title') or not data.get('description'):
             print(f'[MEDICAL_RECORDS] Validation failed: title={data.get("title")}, description={data.get("description")}')
+            target.remove(files.values())
             return jsonify({
                 'success': False,
                 'error': 'title and description are required'
@@ -84,7 +79,12 @@ def create_medical_record(pet_id):
         }
 
         # Handle file attachment if present
-        if data.get('attachment_data') and data.get('attachment_name'):
+        if 'attachment' in files:
+            medical_record_data['attachments'] = [{
+                'url': files['attachment'].url,
+                'name': files['attachment'].name
+            }]
+        elif data.get('attachment_data') and data.get('attachment_name'):
             try:
                 # Upload file to Supabase Storage
                 attachment_url = upload_medical_record_attachment(
@@ -114,7 +114,13 @@ def create_medical_record(pet_id):
             'success': True,
             'data': result.data[0] if result.data else None
         }), 201
+    except UploadRejected as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), e.status_code
     except Exception as e:
+        target.remove(files.values())
         print(f'[MEDICAL_RECORDS] Error creating medical record: {str(e)}')
         return jsonify({
             'success': False,
@@ -220,47 +226,18 @@ def delete_medical_record(pet_id, record_id):
             'error': str(e)
         }), 500
 
+def medical_record_attachment_target(pet_id):
+    """Attachments are stored at medical-records/{pet_id}/{uuid}.{ext}"""
+    return StorageTarget('medical-records', f'{pet_id}/')
+
 def upload_medical_record_attachment(pet_id, base64_data, file_name):
-    """Upload a medical record attachment to Supabase Storage"""
+    """Upload a base64 medical record attachment (JSON clients) to Supabase Storage"""
     try:
-        print(f'[MEDICAL_RECORDS] Starting upload for pet {pet_id}, file: {file_name}')
-
-        # Extract base64 data (remove data:image/png;base64, prefix if present)
-        if ',' in base64_data:
-            base64_data = base64_data.split(',')[1]
-
-        # Decode base64 to binary
-        file_binary = base64.b64decode(base64_data)
-        print(f'[MEDICAL_RECORDS] Decoded file size: {len(file_binary)} bytes')
-
-        # Generate unique filename
-        file_extension = file_name.split('.')[-1] if '.' in file_name else 'jpg'
-        unique_filename = f"{pet_id}/{uuid.uuid4()}.{file_extension}"
-        print(f'[MEDICAL_RECORDS] Unique filename: {unique_filename}')
-
-        # Upload to Supabase Storage using admin client (bypasses RLS)
-        result = supabase_admin.storage.from_('medical-records').upload(
-            unique_filename,
-            file_binary,
-            {
-                'content-type': f'image/{file_extension}' if file_extension in ['jpg', 'jpeg', 'png'] else 'application/pdf',
-                'upsert': 'false'
-            }
-        )
-        print(f'[MEDICAL_RECORDS] Upload result: {result}')
-
-        # Get public URL and clean it (remove trailing query parameters)
-        public_url = supabase_admin.storage.from_('medical-records').get_public_url(unique_filename)
-        # Remove any trailing '?' or query parameters that might cause issues
-        if public_url.endswith('?'):
-            public_url = public_url[:-1]
-        print(f'[MEDICAL_RECORDS] Public URL: {public_url}')
-
-        return public_url
+        stored = medical_record_attachment_target(pet_id).store(Base64File(base64_data, file_name))
+        print(f'[MEDICAL_RECORDS] Uploaded {stored.path} ({stored.size} bytes): {stored.url}')
+        return stored.url
     except Exception as e:
         print(f'[MEDICAL_RECORDS] Error in upload_medical_record_attachment: {str(e)}')
-        import traceback
-        traceback.print_exc()
         raise e
 
 def extract_file_path_from_url(url):
@@ -5,6 +5,7 @@ Notifications routes (PRD Section 14)
 from flask import Blueprint, request, g
 from config import supabase
 from middleware.auth import require_auth
+from utils.pagination import paginate, get_count_mode
 
 notifications_bp = Blueprint('notifications', __name__)
 
@@ -14,34 +15,23 @@ def get_notifications():
     """Get user's notifications"""
     page = int(request.args.get('page', 1))
     page_size = int(request.args.get('page_size', 20))
-    offset = (page - 1) * page_size
+    cursor = request.args.get('cursor')
     unread_only = request.args.get('unread_only', 'false') == 'true'
 
     try:
         query = supabase.table('notifications')\
-            .select('*', count='exact')\
+            .select('*', count=get_count_mode())\
             .eq('profile_id', g.user_id)
 
         if unread_only:
             query = query.eq('is_read', False)
 
-        # Get total count
-        count_result = query.execute()
-        total = count_result.count
-
-        # Get paginated results
-        result = query.order('created_at', desc=True)\
-            .range(offset, offset + page_size - 1)\
-            .execute()
+        # Get paginated results (total comes back with the page)
+        result, pagination = paginate(query, page, page_size, cursor)
 
         return {
-            'data': result.data,
-            'pagination': {
-                'page': page,
-                'page_size': page_size,
-                'total': total,
-                'pages': (total + page_size - 1) // page_size
-            }
+            'data': result,
+            'pagination': pagination
         }, 200
 
     except Exception as e:
@@ -3,9 +3,14 @@ Pets routes (PRD Section 6)
 """
 
 from flask import Blueprint, request, g
-from config import supabase, supabase_admin
+from config import supabase, supabase_admin, ALLOWED_EXTENSIONS
 from middleware.auth import require_auth
-import base64
+from utils.images import thumbnail_url, generate_pet_photo_variants
+from utils.pagination import paginate, get_count_mode
+from utils.uploads import (
+    StorageTarget, Base64File, UploadRejected, IMAGE_EXTENSIONS,
+    is_multipart, stream_form, request_body_file, remove_stored
+)
 import uuid
 from datetime import datetime
 
@@ -21,35 +26,22 @@ def get_my_pets():
     """
     page = int(request.args.get('page', 1))
     page_size = min(int(request.args.get('page_size', 9)), 9)
-    offset = (page - 1) * page_size
+    cursor = request.args.get('cursor')
 
     try:
-        # Get total count
-        count_result = supabase.table('pets')\
-            .select('id', count='exact')\
-            .eq('owner_id', g.user_id)\
-            .eq('is_deleted', False)\
-            .execute()
-
-        total = count_result.count
-
-        # Get pets with species and breed info
+        # Get pets with species and breed info (total comes back with the page)
         pets = supabase.table('pets')\
-            .select('*, species:species_id(name), breed:breed_id(name)')\
+            .select('*, species:species_id(name), breed:breed_id(name)', count=get_count_mode())\
             .eq('owner_id', g.user_id)\
-            .eq('is_deleted', False)\
-            .order('created_at', desc=True)\
-            .range(offset, offset + page_size - 1)\
-            .execute()
+            .eq('is_deleted', False)
+
+        pets, pagination = paginate(pets, page, page_size, cursor)
+        for pet in pets:
+            pet['photo_thumb_url'] = thumbnail_url(pet.get('photo_url'), pet.get('photo_variants'))
 
         return {
-            'data': pets.data,
-            'pagination': {
-                'page': page,
-                'page_size': page_size,
-                'total': total,
-                'pages': (total + page_size - 1) // page_size
-            }
+            'data': pets,
+            'pagination': pagination
         }, 200
 
     except Exception as e:
@@ -83,41 +75,81 @@ def get_pet(pet_id):
     except Exception as e:
         return {'error': 'Pet not found', 'message': str(e)}, 404
 
+def _as_bool(value):
+    """Booleans arrive as JSON values or as multipart text fields"""
+    return value if isinstance(value, bool) else str(value).lower() in ('true', '1', 'on')
+
+def _pet_file_targets(pet_id, client=None):
+    """Form part / JSON prefix -> where that pet file is stored"""
+    return {
+        'photo': StorageTarget('pet-photos', f'pets/{pet_id}-', IMAGE_EXTENSIONS, 'jpg', client),
+        'papers': StorageTarget('pet-documents', f'pets/{pet_id}-', ALLOWED_EXTENSIONS, 'pdf', client)
+    }
+
+def _read_pet_form(targets):
+    """
+    (data, files) for create/update: multipart requests stream the 'photo' and
+    'papers' parts to Storage while the body is read; JSON bodies are returned
+    as-is (their base64 files are stored by _store_base64_files)
+    """
+    if is_multipart():
+        return stream_form(lambda name, fields: targets.get(name))
+    return request.json, {}
+
+def _store_base64_files(data, targets):
+    """Legacy JSON clients: photo_data / papers_data as base64, failures are logged and skipped"""
+    files = {}
+    for name, target in targets.items():
+        if data.get(f'{name}_data'):
+            try:
+                files[name] = target.store(Base64File(data[f'{name}_data'], data.get(f'{name}_name', '')))
+            except Exception as e:
+                print(f"Error uploading {name}: {e}")
+    return files
+
 @pets_bp.route('/', methods=['POST'])
 @require_auth
 def create_pet():
     """
     Create new pet
     PRD Section 6: DNIA auto-generated via trigger
+    Accepts JSON or multipart/form-data (fields + 'photo' / 'papers' file parts)
     """
-    data = request.json
+    # The id is chosen here so files can be stored while the request is read
+    pet_id = str(uuid.uuid4())
+    targets = _pet_file_targets(pet_id)
+
+    try:
+        data, files = _read_pet_form(targets)
+    except UploadRejected as e:
+        return {'error': 'Upload rejected', 'message': str(e)}, e.status_code
 
     # Validate required fields
     required_fields = ['name', 'birth_date', 'species_id', 'breed_id', 'sex']
     for field in required_fields:
         if field not in data:
+            remove_stored(files.values(), targets.values())
             return {'error': f'Missing required field: {field}'}, 400
 
     # Validate sex
     if data['sex'] not in ['M', 'F']:
+        remove_stored(files.values(), targets.values())
         return {'error': 'Sex must be M or F'}, 400
 
     try:
-        # Debug: print what data we receive
-        print(f"DEBUG: Received data keys: {data.keys()}")
-        print(f"DEBUG: Has photo_data: {'photo_data' in data}")
-        print(f"DEBUG: Has papers_data: {'papers_data' in data}")
+        if not is_multipart():
+            files = _store_base64_files(data, targets)
 
-        # First create the pet to get the ID
         pet_data = {
+            'id': pet_id,
             'owner_id': str(g.user_id),
             'name': data['name'],
             'birth_date': data['birth_date'],
             'species_id': data['species_id'],
             'breed_id': data['breed_id'],
             'sex': data['sex'],
-            'crossable': data.get('crossable', False),
-            'has_pedigree': data.get('has_pedigree', False)
+            'crossable': _as_bool(data.get('crossable', False)),
+            'has_pedigree': _as_bool(data.get('has_pedigree', False))
         }
 
         # Add custom species/breed names if provided
@@ -126,63 +158,20 @@ def create_pet():
         if data.get('other_breed_name'):
             pet_data['other_breed_name'] = data['other_breed_name']
 
-        pet = supabase.table('pets').insert(pet_data).execute()
-        pet_id = pet.data[0]['id']
-
-        # Handle photo upload if provided
-        photo_url = None
-        if data.get('photo_data'):
-            try:
-                file_bytes = base64.b64decode(data['photo_data'].split(',')[1] if ',' in data['photo_data'] else data['photo_data'])
-                file_ext = data.get('photo_name', 'photo.jpg').split('.')[-1] if '.' in data.get('photo_name', '') else 'jpg'
-                storage_path = f"pets/{pet_id}-{uuid.uuid4()}.{file_ext}"
-
-                # Use admin client to bypass RLS
-                supabase_admin.storage.from_('pet-photos').upload(
-                    storage_path,
-                    file_bytes,
-                    {'content-type': f'image/{file_ext}'}
-                )
-
-                photo_url = supabase_admin.storage.from_('pet-photos').get_public_url(storage_path)
-            except Exception as e:
-                print(f"Error uploading photo: {e}")
-
-        # Handle documents upload if provided
-        papers_url = None
-        if data.get('papers_data'):
-            try:
-                file_bytes = base64.b64decode(data['papers_data'].split(',')[1] if ',' in data['papers_data'] else data['papers_data'])
-                file_ext = data.get('papers_name', 'document.pdf').split('.')[-1] if '.' in data.get('papers_name', '') else 'pdf'
-                storage_path = f"pets/{pet_id}-{uuid.uuid4()}.{file_ext}"
-                content_type = 'application/pdf' if file_ext == 'pdf' else f'image/{file_ext}'
-
-                # Use admin client to bypass RLS
-                supabase_admin.storage.from_('pet-documents').upload(
-                    storage_path,
-                    file_bytes,
-                    {'content-type': content_type}
-                )
-
-                papers_url = supabase_admin.storage.from_('pet-documents').get_public_url(storage_path)
-            except Exception as e:
-                print(f"Error uploading papers: {e}")
-
-        # Update pet with URLs if we have them
-        if photo_url or papers_url:
-            update_data = {}
-            if photo_url:
-                update_data['photo_url'] = photo_url
-            if papers_url:
-                update_data['papers_url'] = papers_url
+        # Stored files go in with the row
+        for name, stored in files.items():
+            pet_data[f'{name}_url'] = stored.url
 
-            supabase.table('pets').update(update_data).eq('id', pet_id).execute()
-            pet.data[0].update(update_data)
+        pet = supabase.table('pets').insert(pet_data).execute()
+        # Only photos stored here get variants, never a client-supplied photo_url
+        if 'photo' in files:
+            generate_pet_photo_variants(pet_id, files['photo'].url)
 
         # DNIA is auto-generated by trigger
         return {'data': pet.data[0]}, 201
 
     except Exception as e:
+        remove_stored(files.values(), targets.values())
         return {'error': 'Failed to create pet', 'message': str(e)}, 400
 
 @pets_bp.route('/<pet_id>', methods=['PUT'])
@@ -191,17 +180,18 @@ def update_pet(pet_id):
     """
     Update pet
     PRD: Species and breed are IMMUTABLE (enforced by trigger)
+    Accepts JSON or multipart/form-data (fields + 'photo' / 'papers' file parts)
     """
-    data = request.json
-
     # Fields that can be updated
     allowed_fields = [
         'name', 'photo_url', 'papers_url',
         'crossable', 'has_pedigree'
     ]
+    targets = _pet_file_targets(pet_id)
+    files = {}
 
     try:
-        # Verify ownership
+        # Verify ownership (before reading any file)
         pet_check = supabase.table('pets')\
             .select('owner_id')\
             .eq('id', pet_id)\
@@ -211,60 +201,34 @@ def update_pet(pet_id):
         if pet_check.data['owner_id'] != g.user_id:
             return {'error': 'Not your pet'}, 403
 
+        data, files = _read_pet_form(targets)
+        if not is_multipart():
+            files = _store_base64_files(data, targets)
+
         # Build update_data - include boolean fields explicitly
         update_data = {}
         for k, v in data.items():
             if k in allowed_fields:
                 # Handle boolean fields explicitly (False is a valid value)
                 if k in ['crossable', 'has_pedigree']:
-                    update_data[k] = v
+                    update_data[k] = _as_bool(v)
                 elif v:  # Only include non-boolean fields if they have a truthy value
                     update_data[k] = v
 
-        # Handle photo upload if provided
-        if data.get('photo_data'):
-            try:
-                file_bytes = base64.b64decode(data['photo_data'].split(',')[1] if ',' in data['photo_data'] else data['photo_data'])
-                file_ext = data.get('photo_name', 'photo.jpg').split('.')[-1] if '.' in data.get('photo_name', '') else 'jpg'
-                storage_path = f"pets/{pet_id}-{uuid.uuid4()}.{file_ext}"
-
-                # Use admin client to bypass RLS
-                supabase_admin.storage.from_('pet-photos').upload(
-                    storage_path,
-                    file_bytes,
-                    {'content-type': f'image/{file_ext}'}
-                )
-
-                photo_url = supabase_admin.storage.from_('pet-photos').get_public_url(storage_path)
-                update_data['photo_url'] = photo_url
-            except Exception as e:
-                print(f"Error uploading photo: {e}")
-
-        # Handle documents upload if provided
-        if data.get('papers_data'):
-            try:
-                file_bytes = base64.b64decode(data['papers_data'].split(',')[1] if ',' in data['papers_data'] else data['papers_data'])
-                file_ext = data.get('papers_name', 'document.pdf').split('.')[-1] if '.' in data.get('papers_name', '') else 'pdf'
-                storage_path = f"pets/{pet_id}-{uuid.uuid4()}.{file_ext}"
-                content_type = 'application/pdf' if file_ext == 'pdf' else f'image/{file_ext}'
-
-                # Use admin client to bypass RLS
-                supabase_admin.storage.from_('pet-documents').upload(
-                    storage_path,
-                    file_bytes,
-                    {'content-type': content_type}
-                )
-
-                papers_url = supabase_admin.storage.from_('pet-documents').get_public_url(storage_path)
-                update_data['papers_url'] = papers_url
-            except Exception as e:
-                print(f"Error uploading papers: {e}")
+        for name, stored in files.items():
+            update_data[f'{name}_url'] = stored.url
 
         if not update_data:
             return {'error': 'No valid fields to update'}, 400
 
+        # Variants of the previous photo no longer apply
+        if 'photo_url' in update_data:
+            update_data['photo_variants'] = None
+
         # Update the pet
         supabase.table('pets').update(update_data).eq('id', pet_id).execute()
+        if 'photo' in files:
+            generate_pet_photo_variants(pet_id, files['photo'].url)
 
         # Fetch the updated pet with relations
         pet = supabase.table('pets')\
@@ -275,41 +239,62 @@ def update_pet(pet_id):
 
         return {'data': pet.data}, 200
 
+    except UploadRejected as e:
+        return {'error': 'Upload rejected', 'message': str(e)}, e.status_code
     except Exception as e:
+        remove_stored(files.values(), targets.values())
         return {'error': 'Update failed', 'message': str(e)}, 400
 
-@pets_bp.route('/upload-photo', methods=['POST'])
-@require_auth
-def upload_photo():
-    """Upload pet photo to Supabase Storage"""
-    try:
+def _upload_pet_file(bucket, extensions, default_name, client):
+    """
+    Store one pet file and return its public URL. The file comes as:
+    - multipart/form-data: 'pet_id' field followed by a 'file' part
+    - raw body with the file's Content-Type: ?pet_id=...&file_name=...
+    - JSON: pet_id, file_data (base64), file_name (legacy)
+    """
+    default_ext = default_name.rsplit('.', 1)[-1]
+
+    def target(pet_id):
+        return StorageTarget(bucket, f'pets/{pet_id}-', extensions, default_ext, client)
+
+    if is_multipart():
+        def resolve(name, fields):
+            pet_id = request.args.get('pet_id') or fields.get('pet_id')
+            if name != 'file':
+                return None
+            if not pet_id:
+                raise UploadRejected('Missing pet_id (send it before the file)')
+            return target(pet_id)
+
+        _, files = stream_form(resolve)
+        if 'file' not in files:
+            return {'error': 'Missing pet_id or file'}, 400
+        stored = files['file']
+
+    elif request.is_json:
         data = request.json
         pet_id = data.get('pet_id')
         file_data = data.get('file_data')  # base64 encoded
-        file_name = data.get('file_name', 'photo.jpg')
-
         if not pet_id or not file_data:
             return {'error': 'Missing pet_id or file_data'}, 400
+        stored = target(pet_id).store(Base64File(file_data, data.get('file_name', default_name)))
 
-        # Decode base64
-        file_bytes = base64.b64decode(file_data.split(',')[1] if ',' in file_data else file_data)
-
-        # Generate unique filename
-        file_ext = file_name.split('.')[-1] if '.' in file_name else 'jpg'
-        storage_path = f"pets/{pet_id}-{uuid.uuid4()}.{file_ext}"
+    else:
+        pet_id = request.args.get('pet_id')
+        if not pet_id:
+            return {'error': 'Missing pet_id'}, 400
+        stored = target(pet_id).store(request_body_file(default_name))
 
-        # Upload to Supabase Storage
-        result = supabase.storage.from_('pet-photos').upload(
-            storage_path,
-            file_bytes,
-            {'content-type': f'image/{file_ext}'}
-        )
-
-        # Get public URL
-        url = supabase.storage.from_('pet-photos').get_public_url(storage_path)
-
-        return {'data': {'url': url}}, 200
+    return {'data': {'url': stored.url}}, 200
 
+@pets_bp.route('/upload-photo', methods=['POST'])
+@require_auth
+def upload_photo():
+    """Upload pet photo to Supabase Storage"""
+    try:
+        return _upload_pet_file('pet-photos', IMAGE_EXTENSIONS, 'photo.jpg', supabase)
+    except UploadRejected as e:
+        return {'error': 'Upload rejected', 'message': str(e)}, e.status_code
     except Exception as e:
         return {'error': 'Upload failed', 'message': str(e)}, 400
 
@@ -318,36 +303,9 @@ def upload_photo():
 def upload_documents():
     """Upload pet documents to Supabase Storage"""
     try:
-        data = request.json
-        pet_id = data.get('pet_id')
-        file_data = data.get('file_data')  # base64 encoded
-        file_name = data.get('file_name', 'document.pdf')
-
-        if not pet_id or not file_data:
-            return {'error': 'Missing pet_id or file_data'}, 400
-
-        # Decode base64
-        file_bytes = base64.b64decode(file_data.split(',')[1] if ',' in file_data else file_data)
-
-        # Generate unique filename
-        file_ext = file_name.split('.')[-1] if '.' in file_name else 'pdf'
-        storage_path = f"pets/{pet_id}-{uuid.uuid4()}.{file_ext}"
-
-        # Determine content type
-        content_type = 'application/pdf' if file_ext == 'pdf' else f'image/{file_ext}'
-
-        # Upload to Supabase Storage
-        result = supabase.storage.from_('pet-documents').upload(
-            storage_path,
-            file_bytes,
-            {'content-type': content_type}
-        )
-
-        # Get public URL
-        url = supabase.storage.from_('pet-documents').get_public_url(storage_path)
-
-        return {'data': {'url': url}}, 200
-
+        return _upload_pet_file('pet-documents', ALLOWED_EXTENSIONS, 'document.pdf', supabase)
+    except UploadRejected as e:
+        return {'error': 'Upload rejected', 'message': str(e)}, e.status_code
     except Exception as e:
         return {'error': 'Upload failed', 'message': str(e)}, 400
 
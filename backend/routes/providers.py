@@ -3,25 +3,39 @@ Providers routes (PRD Section 8)
 """
 
 from flask import Blueprint, request, g
-from config import supabase, supabase_admin, DEFAULT_PAGE_SIZE, SUPABASE_URL, SUPABASE_ANON_KEY
-from middleware.auth import require_auth, require_provider
-from supabase import create_client
+from config import supabase, supabase_admin, DEFAULT_PAGE_SIZE
+from middleware.auth import require_auth, require_provider, invalidate_user_roles
+from utils.geo import cell_cover
+from utils.lookups import get_profile_names
+from utils.pagination import paginate, get_count_mode
+from utils.reference_data import reference_response
 
 providers_bp = Blueprint('providers', __name__)
 
+
+def _attach_owner_names(records):
+    """Add owner_name to each record's embedded pet (records selected with pets(id, name, owner_id))"""
+    owner_ids = {record['pets']['owner_id'] for record in records if record.get('pets') and record['pets'].get('owner_id')}
+    owners_map = get_profile_names(owner_ids)
+
+    for record in records:
+        pet_data = record.get('pets')
+        if pet_data:
+            pet_data['owner_name'] = owners_map.get(str(pet_data.get('owner_id'))) or 'Desconocido'
+    return records
+
+
 @providers_bp.route('/service-types', methods=['GET'])
 def get_service_types():
     """Get all available service types (public endpoint)"""
     try:
         category = request.args.get('category')  # Optional filter by category
 
-        query = supabase.table('service_types').select('*').order('category').order('name')
+        def build(snapshot):
+            rows = [row for row in snapshot.datasets['service_types'] if not category or row.get('category') == category]
+            return {'data': rows}
 
-        if category:
-            query = query.eq('category', category)
-
-        result = query.execute()
-        return {'data': result.data}, 200
+        return reference_response(f'service_types:{category or ""}', build)
 
     except Exception as e:
         return {'error': 'Failed to get service types', 'message': str(e)}, 400
@@ -83,11 +97,11 @@ def search_providers():
     city = request.args.get('city')
     page = int(request.args.get('page', 1))
     page_size = min(int(request.args.get('page_size', DEFAULT_PAGE_SIZE)), 100)
-    offset = (page - 1) * page_size
+    cursor = request.args.get('cursor')
 
     try:
         query = supabase.table('providers')\
-            .select('*, profiles!inner(full_name, city, country)', count='exact')\
+            .select('*, profiles!inner(full_name, city, country)', count=get_count_mode())\
             .eq('active', True)
 
         if service_type:
@@ -96,23 +110,12 @@ def search_providers():
         if city:
             query = query.eq('profiles.city', city)
 
-        # Get total count
-        count_result = query.execute()
-        total = count_result.count
-
-        # Get paginated results
-        result = query.order('rating', desc=True)\
-            .range(offset, offset + page_size - 1)\
-            .execute()
+        # Get paginated results (total comes back with the page)
+        result, pagination = paginate(query, page, page_size, cursor, sort_column='rating')
 
         return {
-            'data': result.data,
-            'pagination': {
-                'page': page,
-                'page_size': page_size,
-                'total': total,
-                'pages': (total + page_size - 1) // page_size
-            }
+            'data': result,
+            'pagination': pagination
         }, 200
 
     except Exception as e:
@@ -137,7 +140,8 @@ def get_nearby_providers():
             'p_latitude': latitude,
             'p_longitude': longitude,
             'p_radius_km': radius_km,
-            'p_service_type': service_type
+            'p_service_type': service_type,
+            'p_cells': cell_cover(latitude, longitude, radius_km)
         }).execute()
 
         return {'data': result.data}, 200
@@ -205,6 +209,7 @@ def create_provider():
         }
 
         provider = supabase.table('providers').insert(provider_data).execute()
+        invalidate_user_roles(g.user_id)
         return provider.data[0], 201
 
     except Exception as e:
@@ -331,14 +336,8 @@ def add_availability(provider_id):
 def get_my_services():
     """Get current provider's services with service type details"""
     try:
-        # Get provider ID from user
-        provider = supabase.table('providers')\
-            .select('id')\
-            .eq('profile_id', g.user_id)\
-            .single()\
-            .execute()
-
-        provider_id = provider.data['id']
+        # Provider ID resolved (and cached) by require_provider
+        provider_id = g.provider_id
 
         # Get all services for this provider with service type details
         # Use admin client to bypass RLS and show both active and inactive services
@@ -367,14 +366,8 @@ def add_my_service():
             return {'error': f'Missing required field: {field}'}, 400
 
     try:
-        # Get provider ID from user
-        provider = supabase.table('providers')\
-            .select('id')\
-            .eq('profile_id', g.user_id)\
-            .single()\
-            .execute()
-
-        provider_id = provider.data['id']
+        # Provider ID resolved (and cached) by require_provider
+        provider_id = g.provider_id
 
         service_data = {
             'provider_id': provider_id,
@@ -412,14 +405,8 @@ def update_my_service(service_id):
     data = request.json
 
     try:
-        # Get provider ID and verify ownership
-        provider = supabase.table('providers')\
-            .select('id')\
-            .eq('profile_id', g.user_id)\
-            .single()\
-            .execute()
-
-        provider_id = provider.data['id']
+        # Provider ID resolved (and cached) by require_provider
+        provider_id = g.provider_id
 
         # Verify service belongs to provider using admin client to bypass RLS
         service = supabase_admin.table('provider_services')\
@@ -459,14 +446,8 @@ def update_my_service(service_id):
 def delete_my_service(service_id):
     """Delete a service"""
     try:
-        # Get provider ID and verify ownership
-        provider = supabase.table('providers')\
-            .select('id')\
-            .eq('profile_id', g.user_id)\
-            .single()\
-            .execute()
-
-        provider_id = provider.data['id']
+        # Provider ID resolved (and cached) by require_provider
+        provider_id = g.provider_id
 
         # Verify service belongs to provider using admin client to bypass RLS
         service = supabase_admin.table('provider_services')\
@@ -600,38 +581,8 @@ def get_my_vaccinations():
 
         print(f'[PROVIDERS] Found {len(result.data)} vaccinations')
 
-        # Get unique owner IDs to fetch their names
-        owner_ids = set()
-        for vacc in result.data:
-            pet_data = vacc.get('pets', {})
-            if pet_data and pet_data.get('owner_id'):
-                owner_ids.add(pet_data['owner_id'])
-
-        # Fetch owner names - query each owner individually to avoid Supabase .in_() issues
-        owners_map = {}
-        for owner_id in owner_ids:
-            try:
-                owner_result = supabase.table('profiles')\
-                    .select('id, full_name')\
-                    .eq('id', owner_id)\
-                    .single()\
-                    .execute()
-
-                if owner_result.data:
-                    owners_map[owner_id] = owner_result.data.get('full_name', 'Desconocido')
-            except Exception as e:
-                print(f'[PROVIDERS] Error fetching owner {owner_id}: {str(e)}')
-                owners_map[owner_id] = 'Desconocido'
-
-        # Transform data to include owner name at the pet level
-        vaccinations = []
-        for vacc in result.data:
-            pet_data = vacc.get('pets', {})
-            if pet_data:
-                owner_id = pet_data.get('owner_id')
-                pet_data['owner_name'] = owners_map.get(owner_id, 'Desconocido')
-                vacc['pets'] = pet_data
-            vaccinations.append(vacc)
+        # Owner names in one batched lookup
+        vaccinations = _attach_owner_names(result.data)
 
         return {'data': vaccinations}, 200
 
@@ -657,17 +608,8 @@ def create_boarding():
         print(f'[PROVIDERS/BOARDINGS] Provider: {provider_profile_id}')
         print(f'[PROVIDERS/BOARDINGS] Dates: {data["start_date"]} to {data["end_date"]} ({data["days"]} days)')
 
-        # Get provider_id from providers table
-        provider_result = supabase.table('providers')\
-            .select('id')\
-            .eq('profile_id', provider_profile_id)\
-            .single()\
-            .execute()
-
-        if not provider_result.data:
-            return {'error': 'Provider not found'}, 404
-
-        provider_id = provider_result.data['id']
+        # Provider ID resolved (and cached) by require_provider
+        provider_id = g.provider_id
 
         # Create boarding record
         boarding_data = {
@@ -703,17 +645,8 @@ def get_my_boardings():
 
         print(f'[PROVIDERS/BOARDINGS] Getting boardings for provider: {provider_profile_id}')
 
-        # Get provider_id
-        provider_result = supabase.table('providers')\
-            .select('id')\
-            .eq('profile_id', provider_profile_id)\
-            .single()\
-            .execute()
-
-        if not provider_result.data:
-            return {'error': 'Provider not found'}, 404
-
-        provider_id = provider_result.data['id']
+        # Provider ID resolved (and cached) by require_provider
+        provider_id = g.provider_id
 
         # Get all boardings for this provider with pet and owner information
         # Use supabase_admin to bypass RLS for reading
@@ -725,38 +658,8 @@ def get_my_boardings():
 
         print(f'[PROVIDERS/BOARDINGS] Found {len(result.data)} boardings')
 
-        # Get unique owner IDs to fetch their names
-        owner_ids = set()
-        for boarding in result.data:
-            pet_data = boarding.get('pets', {})
-            if pet_data and pet_data.get('owner_id'):
-                owner_ids.add(pet_data['owner_id'])
-
-        # Fetch owner names
-        owners_map = {}
-        for owner_id in owner_ids:
-            try:
-                owner_result = supabase.table('profiles')\
-                    .select('id, full_name')\
-                    .eq('id', owner_id)\
-                    .single()\
-                    .execute()
-
-                if owner_result.data:
-                    owners_map[owner_id] = owner_result.data.get('full_name', 'Desconocido')
-            except Exception as e:
-                print(f'[PROVIDERS/BOARDINGS] Error fetching owner {owner_id}: {str(e)}')
-                owners_map[owner_id] = 'Desconocido'
-
-        # Transform data to include owner name at the pet level
-        boardings = []
-        for boarding in result.data:
-            pet_data = boarding.get('pets', {})
-            if pet_data:
-                owner_id = pet_data.get('owner_id')
-                pet_data['owner_name'] = owners_map.get(owner_id, 'Desconocido')
-                boarding['pets'] = pet_data
-            boardings.append(boarding)
+        # Owner names in one batched lookup
+        boardings = _attach_owner_names(result.data)
 
         return {'data': boardings}, 200
 
@@ -845,17 +748,8 @@ def create_simple_service():
 
         table_name = SIMPLE_SERVICE_TABLES[service_category]
 
-        # Get provider_id from providers table
-        provider_result = supabase.table('providers')\
-            .select('id')\
-            .eq('profile_id', provider_profile_id)\
-            .single()\
-            .execute()
-
-        if not provider_result.data:
-            return {'error': 'Provider not found'}, 404
-
-        provider_id = provider_result.data['id']
+        # Provider ID resolved (and cached) by require_provider
+        provider_id = g.provider_id
 
         # Verify pet exists
         pet = supabase.table('pets')\
@@ -906,17 +800,8 @@ def get_my_simple_services(service_category):
 
         table_name = SIMPLE_SERVICE_TABLES[service_category]
 
-        # Get provider_id from providers table
-        provider_result = supabase.table('providers')\
-            .select('id')\
-            .eq('profile_id', provider_profile_id)\
-            .single()\
-            .execute()
-
-        if not provider_result.data:
-            return {'error': 'Provider not found'}, 404
-
-        provider_id = provider_result.data['id']
+        # Provider ID resolved (and cached) by require_provider
+        provider_id = g.provider_id
 
         # Get all records for this provider with pet and owner information
         # Use supabase_admin to bypass RLS for reading
@@ -928,38 +813,8 @@ def get_my_simple_services(service_category):
 
         print(f'[PROVIDERS/SIMPLE-SERVICE] Found {len(result.data)} {service_category} records')
 
-        # Get unique owner IDs to fetch their names
-        owner_ids = set()
-        for record in result.data:
-            pet_data = record.get('pets', {})
-            if pet_data and pet_data.get('owner_id'):
-                owner_ids.add(pet_data['owner_id'])
-
-        # Fetch owner names
-        owners_map = {}
-        for owner_id in owner_ids:
-            try:
-                owner_result = supabase.table('profiles')\
-                    .select('id, full_name')\
-                    .eq('id', owner_id)\
-                    .single()\
-                    .execute()
-
-                if owner_result.data:
-                    owners_map[owner_id] = owner_result.data.get('full_name', 'Desconocido')
-            except Exception as e:
-                print(f'[PROVIDERS/SIMPLE-SERVICE] Error fetching owner {owner_id}: {str(e)}')
-                owners_map[owner_id] = 'Desconocido'
-
-        # Transform data to include owner name at the pet level
-        records = []
-        for record in result.data:
-            pet_data = record.get('pets', {})
-            if pet_data:
-                owner_id = pet_data.get('owner_id')
-                pet_data['owner_name'] = owners_map.get(owner_id, 'Desconocido')
-                record['pets'] = pet_data
-            records.append(record)
+        # Owner names in one batched lookup
+        records = _attach_owner_names(result.data)
 
         return {'data': records}, 200
 
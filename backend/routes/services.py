@@ -1,8 +1,9 @@
 from flask import Blueprint, g, request
 from middleware.auth import require_auth
 from config import supabase, supabase_admin
+from utils.concurrency import execute_all
+from utils.reference_data import reference_response
 from datetime import datetime, timedelta
-import math
 
 services_bp = Blueprint('services', __name__)
 
@@ -12,38 +13,16 @@ def get_service_types():
     try:
         category = request.args.get('category')  # Optional filter by category
 
-        query = supabase.table('service_types').select('*').order('category').order('name')
+        def build(snapshot):
+            rows = [row for row in snapshot.datasets['service_types'] if not category or row.get('category') == category]
+            return rows
 
-        if category:
-            query = query.eq('category', category)
-
-        result = query.execute()
-        return result.data, 200
+        return reference_response(f'service_types:{category or ""}', build)
 
     except Exception as e:
         print(f'[SERVICE-TYPES] Error: {str(e)}')
         return {'error': 'Failed to get service types', 'message': str(e)}, 400
 
-def calculate_distance(lat1, lon1, lat2, lon2):
-    """
-    Calculate distance between two coordinates using Haversine formula
-    Returns distance in kilometers
-    """
-    if not all([lat1, lon1, lat2, lon2]):
-        return None
-
-    # Convert to radians
-    lat1, lon1, lat2, lon2 = map(math.radians, [lat1, lon1, lat2, lon2])
-
-    # Haversine formula
-    dlat = lat2 - lat1
-    dlon = lon2 - lon1
-    a = math.sin(dlat/2)**2 + math.cos(lat1) * math.cos(lat2) * math.sin(dlon/2)**2
-    c = 2 * math.asin(math.sqrt(a))
-    r = 6371  # Radius of earth in kilometers
-
-    return c * r
-
 @services_bp.route('/search', methods=['GET'])
 @require_auth
 def search_services():
@@ -56,6 +35,7 @@ def search_services():
       - q: search query for business name or description
       - lat: user latitude for distance calculation
       - lon: user longitude for distance calculation
+      - limit / page: optional pagination (results are sorted by distance)
     """
     try:
         # Get query parameters (can be multiple)
@@ -66,80 +46,34 @@ def search_services():
         user_lat = request.args.get('lat', type=float)
         user_lon = request.args.get('lon', type=float)
 
-        print(f'[SERVICES/SEARCH] Searching with filters:')
-        print(f'  categories: {categories}')
-        print(f'  service_type_ids: {service_type_ids}')
-        print(f'  max_distance: {max_distance}')
-        print(f'  search_query: {search_query}')
-        print(f'  user_coords: ({user_lat}, {user_lon})')
-
-        # Build query - get provider info with profile data
-        query = supabase_admin.table('provider_services')\
-            .select('*, service_type:service_types(*), providers(id, address, latitude, longitude, rating, rating_count, profiles(full_name, city, phone, email))')\
-            .eq('active', True)
-
-        # Filter by service type IDs (if only one, use direct filter)
-        if len(service_type_ids) == 1:
-            query = query.eq('service_type_id', service_type_ids[0])
-        elif len(service_type_ids) > 1:
-            query = query.in_('service_type_id', service_type_ids)
-
-        # Execute query
-        result = query.execute()
-
-        print(f'[SERVICES/SEARCH] Found {len(result.data)} services from database')
-
-        # Process results
-        services = []
-        for service in result.data:
-            # Filter by categories (done in Python since Supabase filter doesn't work with aliases)
-            if len(categories) > 0:
-                service_category = service.get('service_type', {}).get('category')
-                if service_category not in categories:
-                    continue
-            # Flatten provider data structure
-            provider = service.get('providers', {})
-            profile = provider.get('profiles', {})
-
-            # Merge profile data into provider for easier access in frontend
-            if profile:
-                provider['business_name'] = profile.get('full_name')
-                provider['city'] = profile.get('city')
-                provider['phone'] = profile.get('phone')
-                provider['email'] = profile.get('email')
-
-            # Filter by search query
-            if search_query:
-                business_name = (provider.get('business_name') or '').lower()
-                description = (service.get('description') or '').lower()
-
-                if search_query not in business_name and search_query not in description:
-                    continue
-
-            # Calculate distance if coordinates provided
-            if user_lat and user_lon:
-                provider_lat = provider.get('latitude')
-                provider_lon = provider.get('longitude')
-
-                if provider_lat and provider_lon:
-                    distance = calculate_distance(user_lat, user_lon, provider_lat, provider_lon)
-                    provider['distance'] = round(distance, 1)
-
-                    # Filter by max distance
-                    if distance > max_distance:
-                        continue
-                else:
-                    # No coordinates for provider, skip if distance filter is active
-                    provider['distance'] = None
-
-            services.append(service)
-
-        # Sort by distance if available
-        services.sort(key=lambda x: x.get('providers', {}).get('distance') or float('inf'))
-
-        print(f'[SERVICES/SEARCH] Returning {len(services)} services after filtering')
-
-        return {'services': services, 'count': len(services)}, 200
+        # Optional pagination: ?limit=N&page=P (default returns every match)
+        limit = request.args.get('limit', type=int)
+        page = request.args.get('page', 1, type=int)
+
+        # Filters, distance and ordering run in the database
+        # (GiST-indexed radius prefilter, db/migrations/provider_services_search.sql)
+        has_coords = bool(user_lat and user_lon)
+        result = supabase_admin.rpc('search_provider_services', {
+            'p_latitude': user_lat if has_coords else None,
+            'p_longitude': user_lon if has_coords else None,
+            'p_max_distance_km': max_distance,
+            'p_categories': categories or None,
+            'p_service_type_ids': service_type_ids or None,
+            'p_query': search_query or None,
+            'p_limit': limit,
+            'p_offset': (page - 1) * limit if limit else 0
+        }).execute()
+
+        services = result.data
+        total = services[0]['total_count'] if services else 0
+        for service in services:
+            service.pop('total_count', None)
+
+        response = {'services': services, 'count': total}
+        if limit:
+            response['has_more'] = (page - 1) * limit + len(services) < total
+
+        return response, 200
 
     except Exception as e:
         print(f'[SERVICES/SEARCH] Error: {str(e)}')
@@ -160,25 +94,36 @@ def get_provider_details(provider_id):
         user_id = g.user_id
         print(f'[SERVICES/PROVIDER-DETAILS] Getting details for provider {provider_id} requested by user {user_id}')
 
-        # Get provider details with profile
-        provider_result = supabase_admin.table('providers')\
+        # Provider, the user's conversations and the user's last rating are
+        # independent lookups: run them concurrently
+        provider_query = supabase_admin.table('providers')\
             .select('*, profiles(full_name, email, phone, city)')\
             .eq('id', provider_id)\
-            .single()\
-            .execute()
+            .single()
+
+        # Check if user has ever contacted this provider
+        # First get all conversations where the user is a participant
+        user_conversations_query = supabase_admin.table('conversation_participants')\
+            .select('conversation_id')\
+            .eq('profile_id', user_id)
+
+        # Last rating from this user to this provider (only used if contacted)
+        rating_query = supabase_admin.table('provider_ratings')\
+            .select('created_at')\
+            .eq('user_id', user_id)\
+            .eq('provider_id', provider_id)\
+            .order('created_at', desc=True)\
+            .limit(1)
+
+        provider_result, user_conversations, rating_result = execute_all(
+            provider_query, user_conversations_query, rating_query
+        )
 
         if not provider_result.data:
             return {'error': 'Provider not found'}, 404
 
         provider = provider_result.data
 
-        # Check if user has ever contacted this provider
-        # First get all conversations where the user is a participant
-        user_conversations = supabase_admin.table('conversation_participants')\
-            .select('conversation_id')\
-            .eq('profile_id', user_id)\
-            .execute()
-
         user_conv_ids = [conv['conversation_id'] for conv in user_conversations.data]
 
         has_contacted = False
@@ -197,15 +142,6 @@ def get_provider_details(provider_id):
         last_rating_date = None
 
         if has_contacted:
-            # Check last rating from this user to this provider
-            rating_result = supabase_admin.table('provider_ratings')\
-                .select('created_at')\
-                .eq('user_id', user_id)\
-                .eq('provider_id', provider_id)\
-                .order('created_at', desc=True)\
-                .limit(1)\
-                .execute()
-
             if len(rating_result.data) == 0:
                 # Never rated, can rate
                 can_rate = True
@@ -0,0 +1,165 @@
+"""
+Direct-to-storage uploads
+Two phases, so slow uploads never hold a BFF worker:
+1. POST /sign: the BFF checks access to the record and returns a signed upload URL
+   (PUT the file there with the returned content_type) plus a ticket
+2. POST /finalize: the BFF verifies the stored object (size, type, signature) and
+   attaches its URL to the record
+"""
+
+from flask import Blueprint, request, g
+from config import supabase_admin, ALLOWED_EXTENSIONS
+from middleware.auth import require_auth
+from utils.images import generate_pet_photo_variants, generate_lost_pet_image_variants
+from utils.uploads import StorageTarget, UploadRejected, IMAGE_EXTENSIONS, read_upload_ticket
+
+uploads_bp = Blueprint('uploads', __name__)
+
+
+def _first(query, what):
+    rows = query.limit(1).execute().data
+    if not rows:
+        raise UploadRejected(f'{what} not found', 404)
+    return rows[0]
+
+
+def _owned_pet(pet_id):
+    pet = _first(supabase_admin.table('pets').select('owner_id').eq('id', pet_id), 'Pet')
+    if pet['owner_id'] != g.user_id:
+        raise UploadRejected('Not your pet', 403)
+
+
+def _pet_photo_target(pet_id):
+    _owned_pet(pet_id)
+    return StorageTarget('pet-photos', f'pets/{pet_id}-', IMAGE_EXTENSIONS, 'jpg')
+
+
+def _pet_papers_target(pet_id):
+    _owned_pet(pet_id)
+    return StorageTarget('pet-documents', f'pets/{pet_id}-', ALLOWED_EXTENSIONS, 'pdf')
+
+
+def _medical_record_target(record_id):
+    """Creator of the record or owner of the pet"""
+    record = _first(
+        supabase_admin.table('medical_records').select('pet_id, created_by, pet:pet_id(owner_id)').eq('id', record_id),
+        'Medical record'
+    )
+    if g.user_id not in (record['created_by'], (record.get('pet') or {}).get('owner_id')):
+        raise UploadRejected('Not authorized', 403)
+    return StorageTarget('medical-records', f"{record['pet_id']}/")
+
+
+def _lost_pet_image_target(report_id):
+    """Reporter or pet owner"""
+    report = _first(
+        supabase_admin.table('lost_pet_reports').select('reporter_id, pet:pet_id(owner_id)').eq('id', report_id),
+        'Report'
+    )
+    if g.user_id not in (report['reporter_id'], (report.get('pet') or {}).get('owner_id')):
+        raise UploadRejected('Not authorized', 403)
+    return StorageTarget('pet-images', f'lost-pets/{report_id}/', IMAGE_EXTENSIONS, 'jpg')
+
+
+# Attach functions are idempotent: a ticket stays valid for UPLOAD_URL_TTL, so
+# /finalize may be called again for a file that is already attached
+
+def _set_pet_photo(pet_id, stored):
+    current = _first(supabase_admin.table('pets').select('*').eq('id', pet_id), 'Pet')
+    if current.get('photo_url') == stored.url:
+        return current
+
+    pet = supabase_admin.table('pets')\
+        .update({'photo_url': stored.url, 'photo_variants': None})\
+        .eq('id', pet_id)\
+        .execute().data[0]
+    generate_pet_photo_variants(pet_id, stored.url)
+    return pet
+
+
+def _set_pet_papers(pet_id, stored):
+    return supabase_admin.table('pets').update({'papers_url': stored.url}).eq('id', pet_id).execute().data[0]
+
+
+def _add_medical_record_attachment(record_id, stored):
+    # Appended in one statement, skipped if already there (db/migrations/upload_attachments.sql)
+    rows = supabase_admin.rpc('append_medical_record_attachment', {
+        'p_record_id': record_id,
+        'p_attachment': {'url': stored.url, 'name': stored.name}
+    }).execute().data
+    if not rows:
+        raise UploadRejected('Medical record not found', 404)
+    return rows[0]
+
+
+def _add_lost_pet_image(report_id, stored):
+    existing = supabase_admin.table('lost_pet_images')\
+        .select('*')\
+        .eq('report_id', report_id)\
+        .eq('image_url', stored.url)\
+        .limit(1)\
+        .execute().data
+    if existing:
+        return existing[0]
+
+    image = supabase_admin.table('lost_pet_images').insert({
+        'report_id': report_id,
+        'image_url': stored.url
+    }).execute().data[0]
+    generate_lost_pet_image_variants(report_id, stored.url)
+    return image
+
+
+# Upload kind -> (target(record_id) checking access, attach(record_id, stored) returning the updated row)
+UPLOAD_KINDS = {
+    'pet_photo': (_pet_photo_target, _set_pet_photo),
+    'pet_papers': (_pet_papers_target, _set_pet_papers),
+    'medical_record': (_medical_record_target, _add_medical_record_attachment),
+    'lost_pet_image': (_lost_pet_image_target, _add_lost_pet_image),
+}
+
+
+@uploads_bp.route('/sign', methods=['POST'])
+@require_auth
+def sign_upload():
+    """
+    Signed upload URL for one file
+    Body: kind (pet_photo | pet_papers | medical_record | lost_pet_image),
+    record_id (pet / medical record / lost pet report id), file_name
+    """
+    data = request.json or {}
+    kind = data.get('kind')
+    record_id = data.get('record_id')
+
+    if kind not in UPLOAD_KINDS:
+        return {'error': 'Invalid kind', 'message': f"kind must be one of: {', '.join(UPLOAD_KINDS)}"}, 400
+    if not record_id or not data.get('file_name'):
+        return {'error': 'Missing record_id or file_name'}, 400
+
+    try:
+        target = UPLOAD_KINDS[kind][0](record_id)
+        signed = target.sign(data['file_name'], {'sub': str(g.user_id), 'kind': kind, 'record_id': record_id})
+        return {'data': signed}, 200
+    except UploadRejected as e:
+        return {'error': 'Upload rejected', 'message': str(e)}, e.status_code
+    except Exception as e:
+        return {'error': 'Failed to sign upload', 'message': str(e)}, 400
+
+
+@uploads_bp.route('/finalize', methods=['POST'])
+@require_auth
+def finalize_upload():
+    """Verify a file uploaded through /sign and attach it to its record (body: ticket)"""
+    data = request.json or {}
+
+    try:
+        claims = read_upload_ticket(data.get('ticket'), g.user_id)
+        target, attach = UPLOAD_KINDS[claims['kind']]
+        record_id = claims['record_id']
+
+        stored = target(record_id).verify(claims['path'], claims['name'])
+        return {'data': {'url': stored.url, 'size': stored.size, 'record': attach(record_id, stored)}}, 200
+    except UploadRejected as e:
+        return {'error': 'Upload rejected', 'message': str(e)}, e.status_code
+    except Exception as e:
+        return {'error': 'Failed to finalize upload', 'message': str(e)}, 400
@@ -1,7 +1,8 @@
 from flask import Blueprint, request, jsonify, g
-from config import supabase, supabase_admin
+from config import supabase, supabase_admin, MAX_PAGE_SIZE
 from middleware.auth import require_auth
-from datetime import datetime
+from utils.reference_data import get_snapshot, reference_response
+from datetime import date, datetime, timedelta
 
 vaccines_bp = Blueprint('vaccines', __name__)
 
@@ -82,22 +83,96 @@ def get_vaccines():
     try:
         species_id = request.args.get('species_id')
 
-        query = supabase.table('vaccines').select('*')
+        # Required first, then by name (reference data snapshot, no DB call)
+        def build(snapshot):
+            vaccines = snapshot.vaccines_by_species.get(species_id, ()) if species_id else snapshot.vaccines_required_first
+            return {
+                'success': True,
+                'data': [{key: value for key, value in vaccine.items() if key != 'species'} for vaccine in vaccines]
+            }
+
+        return reference_response(f'vaccine_catalog:{species_id or ""}', build)
+    except Exception as e:
+        print(f'[VACCINES] Error getting vaccines: {str(e)}')
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
 
-        if species_id:
-            query = query.eq('species_id', species_id)
+def _due_on(vaccination, interval_days):
+    """Next due date of a dose: next_due_on if recorded, else applied_on + interval_days"""
+    if vaccination.get('next_due_on'):
+        return date.fromisoformat(vaccination['next_due_on'])
+    if interval_days and vaccination.get('applied_on'):
+        return date.fromisoformat(vaccination['applied_on']) + timedelta(days=interval_days)
+    return None
+
+
+def _pending_summary(pet, snapshot, today):
+    """
+    Required vaccine status for a pet selected with pet_vaccinations(vaccine_id, applied_on, next_due_on).
+    A required vaccine is pending if never applied, overdue if its latest dose is past due.
+    """
+    required_ids = set(snapshot.required_vaccine_ids_by_species.get(pet.get('species_id'), ()))
+
+    # Latest dose of each required vaccine
+    latest = {}
+    for vaccination in pet.get('pet_vaccinations') or []:
+        vaccine_id = vaccination['vaccine_id']
+        if vaccine_id in required_ids and (
+            vaccine_id not in latest or vaccination['applied_on'] > latest[vaccine_id]['applied_on']
+        ):
+            latest[vaccine_id] = vaccination
+
+    overdue_ids = set()
+    for vaccine_id, vaccination in latest.items():
+        due_on = _due_on(vaccination, snapshot.vaccines_by_id[vaccine_id].get('interval_days'))
+        if due_on and due_on < today:
+            overdue_ids.add(vaccine_id)
+
+    pending_ids = required_ids - latest.keys()
+    return {
+        'pending_count': len(pending_ids),
+        'total_required': len(required_ids),
+        'applied_count': len(latest),
+        'overdue_count': len(overdue_ids),
+        'pending_vaccine_ids': sorted(pending_ids),
+        'overdue_vaccine_ids': sorted(overdue_ids)
+    }
+
+@vaccines_bp.route('/pets/pending-vaccines', methods=['GET'])
+@require_auth
+def get_pending_vaccines_batch():
+    """
+    Pending / overdue required vaccines for the current user's pets, in one query
+    ?pet_ids=a,b,c limits it to those pets (max MAX_PAGE_SIZE); without it, every pet of the user
+    """
+    pet_ids = [pet_id for pet_id in request.args.get('pet_ids', '').split(',') if pet_id]
+    if len(pet_ids) > MAX_PAGE_SIZE:
+        return jsonify({
+            'success': False,
+            'error': f'At most {MAX_PAGE_SIZE} pet_ids per request'
+        }), 400
 
-        # Order by required first, then by name
-        result = query.order('required', desc=True)\
-            .order('name')\
-            .execute()
+    try:
+        query = supabase.table('pets')\
+            .select('id, species_id, pet_vaccinations(vaccine_id, applied_on, next_due_on)')\
+            .eq('owner_id', g.user_id)\
+            .eq('is_deleted', False)
+
+        if pet_ids:
+            query = query.in_('id', pet_ids)
+
+        pets = query.execute().data
+        snapshot = get_snapshot()
+        today = date.today()
 
         return jsonify({
             'success': True,
-            'data': result.data
+            'data': {pet['id']: _pending_summary(pet, snapshot, today) for pet in pets}
         }), 200
     except Exception as e:
-        print(f'[VACCINES] Error getting vaccines: {str(e)}')
+        print(f'[VACCINES] Error calculating pending vaccines: {str(e)}')
         return jsonify({
             'success': False,
             'error': str(e)
@@ -105,11 +180,11 @@ def get_vaccines():
 
 @vaccines_bp.route('/pets/<pet_id>/pending-vaccines', methods=['GET'])
 def get_pending_vaccines(pet_id):
-    """Get count of pending required vaccines for a pet"""
+    """Get count of pending (and overdue) required vaccines for a pet"""
     try:
-        # First, get the pet's species
+        # Pet's species and vaccinations in one query
         pet_result = supabase.table('pets')\
-            .select('species_id')\
+            .select('species_id, pet_vaccinations(vaccine_id, applied_on, next_due_on)')\
             .eq('id', pet_id)\
             .single()\
             .execute()
@@ -120,36 +195,9 @@ def get_pending_vaccines(pet_id):
                 'error': 'Pet not found'
             }), 404
 
-        species_id = pet_result.data['species_id']
-
-        # Get all required vaccines for this species
-        vaccines_result = supabase.table('vaccines')\
-            .select('id')\
-            .eq('species_id', species_id)\
-            .eq('required', True)\
-            .execute()
-
-        required_vaccine_ids = [v['id'] for v in vaccines_result.data]
-
-        # Get vaccines already applied to this pet
-        applied_result = supabase.table('pet_vaccinations')\
-            .select('vaccine_id')\
-            .eq('pet_id', pet_id)\
-            .in_('vaccine_id', required_vaccine_ids)\
-            .execute()
-
-        applied_vaccine_ids = [v['vaccine_id'] for v in applied_result.data]
-
-        # Calculate pending count
-        pending_count = len([vid for vid in required_vaccine_ids if vid not in applied_vaccine_ids])
-
         return jsonify({
             'success': True,
-            'data': {
-                'pending_count': pending_count,
-                'total_required': len(required_vaccine_ids),
-                'applied_count': len(applied_vaccine_ids)
-            }
+            'data': _pending_summary(pet_result.data, get_snapshot(), date.today())
         }), 200
     except Exception as e:
         print(f'[VACCINES] Error calculating pending vaccines: {str(e)}')
@@ -5,6 +5,7 @@ Walks routes (PRD Section 12)
 from flask import Blueprint, request, g
 from config import supabase_admin
 from middleware.auth import require_auth, require_provider
+from utils.pagination import paginate, get_count_mode
 
 walks_bp = Blueprint('walks', __name__)
 
@@ -17,7 +18,7 @@ def get_walks():
     """
     page = int(request.args.get('page', 1))
     page_size = min(int(request.args.get('page_size', 20)), 20)
-    offset = (page - 1) * page_size
+    cursor = request.args.get('cursor')
 
     try:
         # Check if user is a walker
@@ -32,19 +33,9 @@ def get_walks():
             # User is a walker - show their walks
             walker_id = walker_provider.data[0]['id']
 
-            count_result = supabase_admin.table('walks')\
-                .select('id', count='exact')\
-                .eq('walker_id', walker_id)\
-                .execute()
-
-            total = count_result.count
-
             walks = supabase_admin.table('walks')\
-                .select('*, pets(name, photo_url, dnia, owner:profiles(full_name))')\
-                .eq('walker_id', walker_id)\
-                .order('created_at', desc=True)\
-                .range(offset, offset + page_size - 1)\
-                .execute()
+                .select('*, pets(name, photo_url, dnia, owner:profiles(full_name))', count=get_count_mode())\
+                .eq('walker_id', walker_id)
 
         else:
             # User is a pet owner - show their pets' walks
@@ -59,28 +50,16 @@ def get_walks():
             if not pet_ids:
                 return {'data': [], 'pagination': {'page': 1, 'page_size': page_size, 'total': 0, 'pages': 0}}, 200
 
-            count_result = supabase_admin.table('walks')\
-                .select('id', count='exact')\
-                .in_('pet_id', pet_ids)\
-                .execute()
-
-            total = count_result.count
-
             walks = supabase_admin.table('walks')\
-                .select('*, pets(name, photo_url, dnia), walker:providers(*, profile:profiles(full_name))')\
-                .in_('pet_id', pet_ids)\
-                .order('created_at', desc=True)\
-                .range(offset, offset + page_size - 1)\
-                .execute()
+                .select('*, pets(name, photo_url, dnia), walker:providers(*, profile:profiles(full_name))', count=get_count_mode())\
+                .in_('pet_id', pet_ids)
+
+        # Total comes back with the page
+        walks, pagination = paginate(walks, page, page_size, cursor)
 
         return {
-            'data': walks.data,
-            'pagination': {
-                'page': page,
-                'page_size': page_size,
-                'total': total,
-                'pages': (total + page_size - 1) // page_size
-            }
+            'data': walks,
+            'pagination': pagination
         }, 200
 
     except Exception as e:
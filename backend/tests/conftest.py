@@ -0,0 +1,41 @@
+"""
+Shared fixtures for the backend tests (run from backend/: python -m pytest)
+"""
+
+import os
+import sys
+import time
+
+import jwt
+import pytest
+
+# Configuration is read at import time: point it at a dead local port before any app module loads
+os.environ.setdefault('SUPABASE_URL', 'http://127.0.0.1:9')
+os.environ.setdefault('SUPABASE_ANON_KEY', 'test-anon-key')
+os.environ.setdefault('SUPABASE_SERVICE_ROLE_KEY', 'test-service-key')
+os.environ.setdefault('SUPABASE_JWT_SECRET', 'test-jwt-secret')
+os.environ.setdefault('AUTH_VERIFY_MODE', 'local')
+os.environ.setdefault('REFERENCE_DATA_WARM_ON_STARTUP', 'False')
+os.environ.setdefault('IMAGE_VARIANT_WORKERS', '0')
+os.environ.setdefault('RATE_LIMIT_FLUSH_SECONDS', '0')
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture
+def app():
+    from app import create_app
+
+    app = create_app()
+    app.config['TESTING'] = True
+    return app
+
+
+@pytest.fixture
+def auth_headers():
+    token = jwt.encode(
+        {'sub': 'user-1', 'aud': 'authenticated', 'role': 'authenticated', 'exp': int(time.time()) + 600},
+        os.environ['SUPABASE_JWT_SECRET'],
+        algorithm='HS256'
+    )
+    return {'Authorization': f'Bearer {token}'}
@@ -0,0 +1,65 @@
+"""
+Test doubles for the Supabase client
+Routes and utils get a FakeSupabase that records every query and answers
+from canned data, so tests never reach Supabase.
+"""
+
+from types import SimpleNamespace
+
+
+class FakeQuery:
+    """Chainable stand-in for a postgrest query builder; records every call"""
+
+    def __init__(self, client, kind, name, params=None):
+        self.client = client
+        self.kind = kind
+        self.name = name
+        self.params = params
+        self.calls = []
+
+    def __getattr__(self, method):
+        if method == 'not_':
+            return self
+
+        def record(*args, **kwargs):
+            self.calls.append((method, args, kwargs))
+            return self
+        return record
+
+    def called(self, method):
+        """Arguments of every call to method on this query"""
+        return [args for name, args, _ in self.calls if name == method]
+
+    def execute(self):
+        self.client.executed.append(self)
+        answer = self.client.responses.get(self.name, [])
+        if callable(answer):
+            answer = answer(self)
+        if isinstance(answer, Exception):
+            raise answer
+        return SimpleNamespace(data=answer, count=self.client.counts.get(self.name))
+
+
+class FakeSupabase:
+    """
+    Client double: responses maps table / RPC name to data, an exception or a
+    callable(query); counts maps a name to the count returned with its data
+    """
+
+    def __init__(self, responses=None, counts=None):
+        self.responses = responses or {}
+        self.counts = counts or {}
+        self.executed = []
+
+    def table(self, name):
+        return FakeQuery(self, 'table', name)
+
+    def from_(self, name):
+        return self.table(name)
+
+    def rpc(self, name, params=None):
+        return FakeQuery(self, 'rpc', name, params)
+
+    def queries(self, name):
+        """Executed queries against a table or RPC"""
+        return [query for query in self.executed if query.name == name]
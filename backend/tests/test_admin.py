@@ -0,0 +1,139 @@
+"""routes.admin: dashboard metrics and reports"""
+
+import os
+import re
+
+import pytest
+
+import middleware.auth as auth
+import routes.admin as admin
+import utils.reports as utils_reports
+from config import MAX_PAGE_SIZE
+from tests.fakes import FakeSupabase
+
+MIGRATIONS = os.path.join(os.path.dirname(__file__), '..', '..', 'db', 'migrations')
+
+# Keys of the response built from the eight count queries that get_admin_metrics replaced
+LEGACY_METRIC_KEYS = {
+    'new_users', 'total_users', 'total_pets', 'new_conversations',
+    'new_appointments', 'active_providers', 'active_lost_pets', 'total_walks'
+}
+
+
+@pytest.fixture
+def admin_user(monkeypatch):
+    monkeypatch.setattr(auth, 'supabase', FakeSupabase({'profiles': [{'is_admin': True, 'is_provider': False}]}))
+    auth._role_cache.clear()
+    yield
+    auth._role_cache.clear()
+
+
+@pytest.fixture
+def fake(monkeypatch):
+    fake = FakeSupabase()
+    monkeypatch.setattr(admin, 'supabase', fake)
+    monkeypatch.setattr(admin, 'supabase_admin', fake)
+    return fake
+
+
+def _get_admin_metrics_keys():
+    with open(os.path.join(MIGRATIONS, 'admin_metrics_rollup.sql'), encoding='utf-8') as f:
+        sql = f.read()
+    function = sql[sql.index('FUNCTION public.get_admin_metrics('):]
+    body = function[function.index('RETURN jsonb_build_object('):]
+    body = body[:body.index(');')]
+    return set(re.findall(r"^\s*'(\w+)',", body, re.MULTILINE))
+
+
+def test_get_admin_metrics_returns_the_legacy_keys():
+    assert _get_admin_metrics_keys() == LEGACY_METRIC_KEYS | {'refreshed_through'}
+
+
+def test_metrics_is_one_rpc(client, auth_headers, admin_user, fake):
+    metrics = dict.fromkeys(LEGACY_METRIC_KEYS, 3)
+    fake.responses = {'get_admin_metrics': dict(metrics, refreshed_through='2026-10-16')}
+
+    response = client.get('/api/admin/metrics?country=PE&start_date=2026-09-01&end_date=2026-10-01',
+                          headers=auth_headers)
+
+    assert response.status_code == 200
+    assert [query.name for query in fake.executed] == ['get_admin_metrics']
+    assert fake.executed[0].params == {'p_start': '2026-09-01', 'p_end': '2026-10-01', 'p_country': 'PE'}
+    assert LEGACY_METRIC_KEYS <= set(response.json['metrics'])
+    assert response.json['filters'] == {'country': 'PE', 'start_date': '2026-09-01', 'end_date': '2026-10-01'}
+
+
+def test_metrics_requires_admin(client, auth_headers, monkeypatch, fake):
+    monkeypatch.setattr(auth, 'supabase', FakeSupabase({'profiles': [{'is_admin': False, 'is_provider': False}]}))
+    auth._role_cache.clear()
+
+    response = client.get('/api/admin/metrics', headers=auth_headers)
+
+    auth._role_cache.clear()
+    assert response.status_code == 403
+    assert fake.executed == []
+
+
+@pytest.fixture
+def reports(monkeypatch):
+    fake = FakeSupabase({
+        'report_popular_breeds': [
+            {'species_name': 'Perro', 'breed_name': 'Beagle', 'breed_id': 'b-1', 'pet_count': 40,
+             'refreshed_at': '2026-10-17T10:00:00+00:00'},
+            {'species_name': 'Gato', 'breed_name': 'Siamés', 'breed_id': 'b-2', 'pet_count': 12,
+             'refreshed_at': '2026-10-17T10:15:00+00:00'}
+        ],
+        'report_vaccinations': {'total_vaccinations': 9, 'data': [{'vaccine': 'Rabia', 'count': 9}]},
+        'report_top_providers': [{'id': 'p-1', 'rating': 4.9, 'rating_count': 31}]
+    })
+    monkeypatch.setattr(utils_reports, 'supabase_admin', fake)
+    utils_reports._cache.clear()
+    yield fake
+    utils_reports._cache.clear()
+
+
+def test_popular_breeds_keeps_breed_and_count(client, auth_headers, admin_user, reports):
+    response = client.get('/api/admin/reports?type=popular_breeds&limit=5&country=PE', headers=auth_headers)
+
+    assert response.status_code == 200
+    assert response.json['data'][0] == {'breed': 'Perro - Beagle', 'breed_id': 'b-1', 'count': 40}
+    assert response.json['refreshed_at'] == '2026-10-17T10:15:00+00:00'
+    assert reports.executed[0].params == {'p_limit': 5, 'p_country': 'PE'}
+
+
+@pytest.mark.parametrize('report_type, rpc', [
+    ('popular_breeds', 'report_popular_breeds'),
+    ('vaccinations', 'report_vaccinations'),
+    ('providers', 'report_top_providers')
+])
+def test_report_is_one_rpc_then_cached(client, auth_headers, admin_user, reports, report_type, rpc):
+    for _ in range(3):
+        response = client.get(f'/api/admin/reports?type={report_type}', headers=auth_headers)
+        assert response.status_code == 200
+
+    assert [query.name for query in reports.executed] == [rpc]
+    assert reports.executed[0].params == {'p_limit': 20, 'p_country': None}
+
+
+def test_report_cache_is_keyed_by_parameters(client, auth_headers, admin_user, reports):
+    for query in ('limit=5', 'limit=10', 'limit=5&country=PE', 'limit=5'):
+        client.get(f'/api/admin/reports?type=providers&{query}', headers=auth_headers)
+
+    assert [query.params for query in reports.executed] == [
+        {'p_limit': 5, 'p_country': None},
+        {'p_limit': 10, 'p_country': None},
+        {'p_limit': 5, 'p_country': 'PE'}
+    ]
+
+
+def test_report_limit_is_capped(client, auth_headers, admin_user, reports):
+    client.get('/api/admin/reports?type=providers&limit=100000', headers=auth_headers)
+
+    assert reports.executed[0].params['p_limit'] == MAX_PAGE_SIZE
+
+
+def test_unknown_report_type(client, auth_headers, admin_user, reports):
+    response = client.get('/api/admin/reports?type=everything', headers=auth_headers)
+
+    assert response.status_code == 400
+    assert reports.executed == []
@@ -0,0 +1,85 @@
+"""utils.cache counters and the reference data version bump"""
+
+import sys
+import threading
+
+import utils.reference_data as reference_data
+from utils.cache import LRUCache, RedisCache
+
+
+def test_memory_incr_is_atomic():
+    cache = LRUCache(maxsize=1)
+    barrier = threading.Barrier(8)
+
+    def bump():
+        barrier.wait()
+        for _ in range(500):
+            cache.incr('version')
+
+    threads = [threading.Thread(target=bump) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert cache.get('version') == 4000
+
+
+def test_memory_incr_restarts_expired_entry():
+    cache = LRUCache()
+    cache.set('n', 7, expires_at=1)
+
+    assert cache.incr('n') == 1
+
+
+class _FakeRedis:
+    def __init__(self):
+        self.commands = []
+        self.values = {}
+
+    def incrby(self, key, amount):
+        self.commands.append(('incrby', key, amount))
+        self.values[key] = self.values.get(key, 0) + amount
+        return self.values[key]
+
+    def get(self, key):
+        self.commands.append(('get', key))
+        value = self.values.get(key)
+        return None if value is None else str(value).encode()
+
+    def set(self, key, value, ex=None):
+        self.commands.append(('set', key, value))
+
+
+def test_redis_incr_is_one_incrby():
+    cache = RedisCache('reference_data:version')
+    cache._client = _FakeRedis()
+
+    assert cache.incr('version') == 1
+    assert cache.incr('version') == 2
+    assert cache.get('version') == 2
+    assert [command[0] for command in cache._client.commands] == ['incrby', 'incrby', 'get']
+
+
+def test_invalidate_reference_data_never_loses_a_bump(monkeypatch):
+    versions = LRUCache(maxsize=1)
+    monkeypatch.setattr(reference_data, '_versions', versions)
+    barrier = threading.Barrier(8)
+
+    def invalidate():
+        barrier.wait()
+        for _ in range(200):
+            reference_data.invalidate_reference_data()
+
+    threads = [threading.Thread(target=invalidate) for _ in range(8)]
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)  # Switch threads often enough to hit a get-then-set race
+    try:
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    finally:
+        sys.setswitchinterval(interval)
+
+    assert reference_data._shared_version() == 1600
@@ -0,0 +1,48 @@
+"""utils.concurrency.execute_all"""
+
+import threading
+import time
+
+import pytest
+
+from utils.concurrency import execute_all
+
+
+class _Query:
+    def __init__(self, result, delay=0):
+        self.result = result
+        self.delay = delay
+
+    def execute(self):
+        time.sleep(self.delay)
+        return self.result
+
+
+def test_results_keep_argument_order():
+    # The first query finishes last
+    results = execute_all(_Query('slow', 0.2), _Query('fast'), lambda: 'callable')
+    assert results == ['slow', 'fast', 'callable']
+
+
+def test_queries_run_concurrently():
+    # Each call waits for the other three, so this only passes if all four are in flight at once
+    barrier = threading.Barrier(4, timeout=2)
+
+    def call(i):
+        barrier.wait()
+        return i
+
+    assert execute_all(*[lambda i=i: call(i) for i in range(4)]) == [0, 1, 2, 3]
+
+
+def test_failure_is_reraised():
+    def fail():
+        raise ValueError('query failed')
+
+    with pytest.raises(ValueError, match='query failed'):
+        execute_all(_Query('ok'), fail)
+
+
+def test_single_query_runs_inline():
+    assert execute_all(lambda: threading.current_thread().name) == [threading.current_thread().name]
+    assert execute_all() == []
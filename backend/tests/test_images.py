@@ -0,0 +1,77 @@
+"""utils.images: variants are only generated for originals the BFF stored"""
+
+from types import SimpleNamespace
+
+import pytest
+
+import routes.pets as pets
+import utils.images as images
+from config import SUPABASE_URL
+from tests.fakes import FakeSupabase
+from utils.images import storage_location, generate_pet_photo_variants, generate_lost_pet_image_variants
+
+PUBLIC = f'{SUPABASE_URL}/storage/v1/object/public'
+
+
+@pytest.fixture
+def submitted(monkeypatch):
+    """Jobs handed to the variant thread pool"""
+    jobs = []
+    pool = SimpleNamespace(submit=lambda fn, *args: jobs.append(args))
+    monkeypatch.setattr(images, 'IMAGE_VARIANT_WORKERS', 1)
+    monkeypatch.setattr(images, '_get_pools', lambda: (pool, None))
+    return jobs
+
+
+def test_storage_location_of_own_public_url():
+    assert storage_location(f'{PUBLIC}/pet-photos/pets/p-1-a.jpg?v=1') == ('pet-photos', 'pets/p-1-a.jpg')
+
+
+@pytest.mark.parametrize('url', [
+    None,
+    'https://evil.example/storage/v1/object/public/pet-photos/pets/p-1-a.jpg',
+    f'https://evil.example/?{PUBLIC}/pet-photos/pets/p-1-a.jpg',
+    f'{PUBLIC}/pet-photos/pets/../p-1-a.jpg',
+    f'{PUBLIC}/pet-photos',
+])
+def test_storage_location_rejects_other_urls(url):
+    assert storage_location(url) is None
+
+
+def test_pet_photo_under_its_prefix_is_queued(submitted):
+    generate_pet_photo_variants('p-1', f'{PUBLIC}/pet-photos/pets/p-1-a.jpg')
+
+    assert [job[:2] for job in submitted] == [('pet-photos', 'pets/p-1-a.jpg')]
+
+
+@pytest.mark.parametrize('url', [
+    f'{PUBLIC}/pet-photos/pets/p-2-a.jpg',      # another pet
+    f'{PUBLIC}/medical-records/pets/p-1-a.jpg',  # not an image bucket
+    f'{PUBLIC}/pet-documents/pets/p-1-a.jpg',
+    'https://evil.example/storage/v1/object/public/pet-photos/pets/p-1-a.jpg',
+])
+def test_pet_photo_elsewhere_is_not_queued(submitted, url):
+    generate_pet_photo_variants('p-1', url)
+
+    assert submitted == []
+
+
+def test_lost_pet_image_must_be_under_its_report(submitted):
+    generate_lost_pet_image_variants('r-1', f'{PUBLIC}/pet-images/lost-pets/r-2/a.jpg')
+    generate_lost_pet_image_variants('r-1', f'{PUBLIC}/pet-images/lost-pets/r-1/a.jpg')
+
+    assert [job[:2] for job in submitted] == [('pet-images', 'lost-pets/r-1/a.jpg')]
+
+
+def test_client_photo_url_gets_no_variants(client, auth_headers, monkeypatch):
+    calls = []
+    # Ownership check and re-read are .single(), the update is not
+    fake = FakeSupabase({'pets': lambda query: {'owner_id': 'user-1'} if query.called('single') else []})
+    monkeypatch.setattr(pets, 'supabase', fake)
+    monkeypatch.setattr(pets, 'generate_pet_photo_variants', lambda *args: calls.append(args))
+
+    response = client.put('/api/pets/p-1', json={'photo_url': f'{PUBLIC}/pet-photos/pets/p-1-a.jpg'},
+                          headers=auth_headers)
+
+    assert response.status_code == 200
+    assert calls == []
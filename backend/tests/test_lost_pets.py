@@ -0,0 +1,125 @@
+"""routes.lost_pets: batched image loading per page, report creation errors"""
+
+import io
+from types import SimpleNamespace
+
+import pytest
+from postgrest.exceptions import APIError
+
+import middleware.rate_limit as rate_limit
+import routes.lost_pets as lost_pets
+import utils.lookups as lookups
+from tests.fakes import FakeSupabase
+from utils.uploads import StorageTarget, StoredFile
+
+
+def _reports(n):
+    return [{'id': f'report-{i}', 'created_at': f'2026-01-01T00:00:{i % 60:02d}', 'pet': None} for i in range(n)]
+
+
+def _images(query):
+    """Two images for every report id asked for in the in_ filter"""
+    (_, report_ids), = query.called('in_')
+    return [
+        {'report_id': report_id, 'image_url': f'https://img/{report_id}/{n}.jpg', 'variants': None}
+        for report_id in report_ids for n in range(2)
+    ]
+
+
+@pytest.fixture
+def fake(monkeypatch):
+    fake = FakeSupabase()
+    monkeypatch.setattr(lost_pets, 'supabase', fake)
+    monkeypatch.setattr(lookups, 'supabase', fake)
+    return fake
+
+
+@pytest.mark.parametrize('page_size', [1, 20, 100])
+def test_list_page_loads_images_in_one_query(client, fake, page_size):
+    fake.responses = {'lost_pet_reports': _reports(page_size + 1), 'lost_pet_images': _images}
+
+    response = client.get(f'/api/lost-pets/?page_size={page_size}')
+
+    assert response.status_code == 200
+    assert [query.name for query in fake.executed] == ['lost_pet_reports', 'lost_pet_images']
+    image_query, = fake.queries('lost_pet_images')
+    assert len(image_query.called('in_')[0][1]) == page_size
+    reports = response.json['data']['data']
+    assert len(reports) == page_size
+    assert all(report['images'] == [f'https://img/{report["id"]}/0.jpg', f'https://img/{report["id"]}/1.jpg']
+               for report in reports)
+
+
+@pytest.mark.parametrize('page_size', [1, 20, 100])
+def test_radius_page_loads_images_in_one_query(client, fake, page_size):
+    rows = [dict(report, report_id=report['id'], total_count=500) for report in _reports(page_size)]
+    fake.responses = {'search_lost_pets_nearby': rows, 'lost_pet_images': _images}
+
+    response = client.get(f'/api/lost-pets/?latitude=-12.05&longitude=-77.04&radius_km=5&page_size={page_size}')
+
+    assert response.status_code == 200
+    assert [query.name for query in fake.executed] == ['search_lost_pets_nearby', 'lost_pet_images']
+    assert response.json['data']['count'] == 500
+    assert all(len(report['images']) == 2 for report in response.json['data']['data'])
+
+
+def test_empty_page_makes_no_image_query(client, fake):
+    fake.responses = {'lost_pet_reports': []}
+
+    response = client.get('/api/lost-pets/')
+
+    assert response.status_code == 200
+    assert fake.queries('lost_pet_images') == []
+
+
+@pytest.fixture
+def create(client, auth_headers, monkeypatch):
+    """POST a report with two images; returns (response, rpc fake, removed files, variant calls)"""
+    monkeypatch.setattr(rate_limit, 'rate_limiter', SimpleNamespace(handles=lambda window: True,
+                                                                    hit=lambda *args: True))
+    monkeypatch.setattr(StorageTarget, 'store', lambda self, source: StoredFile(
+        self.bucket, f'{self.prefix}{source.filename}', f'https://img/{self.prefix}{source.filename}',
+        source.filename, 3
+    ))
+    removed = []
+    monkeypatch.setattr(StorageTarget, 'remove', lambda self, stored: removed.extend(stored))
+    variants = []
+    monkeypatch.setattr(lost_pets, 'generate_lost_pet_image_variants', lambda *args: variants.append(args))
+
+    def post(answer):
+        fake = FakeSupabase({'create_lost_pet_report': answer})
+        monkeypatch.setattr(lost_pets, 'supabase_admin', fake)
+        response = client.post('/api/lost-pets/', headers=auth_headers, content_type='multipart/form-data', data={
+            'report_type': 'lost',
+            'description': 'Perdido en el parque',
+            'pet_id': 'pet-1',
+            'images': [(io.BytesIO(b'\xff\xd8\xff'), 'a.jpg'), (io.BytesIO(b'\xff\xd8\xff'), 'b.jpg')]
+        })
+        return response, fake, removed, variants
+    return post
+
+
+def test_report_is_created_with_its_images(create):
+    response, fake, removed, variants = create({'id': 'report-1'})
+
+    assert response.status_code == 201
+    (rpc,) = fake.queries('create_lost_pet_report')
+    report_id = rpc.params['p_id']
+    assert rpc.params['p_pet_id'] == 'pet-1'
+    assert rpc.params['p_image_urls'] == [f'https://img/lost-pets/{report_id}/a.jpg',
+                                          f'https://img/lost-pets/{report_id}/b.jpg']
+    assert removed == []
+    assert [call[0] for call in variants] == [report_id, report_id]
+
+
+@pytest.mark.parametrize('code, status', [('42501', 403), ('P0002', 404), ('P0001', 409), ('XX000', 400)])
+def test_rpc_error_maps_to_status_and_removes_uploads(create, code, status):
+    error = APIError({'code': code, 'message': 'Esta mascota ya tiene un reporte activo de pérdida',
+                      'details': None, 'hint': None})
+
+    response, fake, removed, variants = create(error)
+
+    assert response.status_code == status
+    report_id = fake.queries('create_lost_pet_report')[0].params['p_id']
+    assert sorted(stored.path for stored in removed) == [f'lost-pets/{report_id}/a.jpg', f'lost-pets/{report_id}/b.jpg']
+    assert variants == []
@@ -0,0 +1,90 @@
+"""utils.pagination: one request per page, has_more and signed keyset cursors"""
+
+import pytest
+
+from tests.fakes import FakeSupabase
+from utils.pagination import paginate, encode_cursor, decode_cursor, InvalidCursor
+
+
+def _rows(n):
+    return [{'id': f'id-{i}', 'created_at': f'2026-01-{i + 1:02d}'} for i in range(n)]
+
+
+def _page(rows, count=None, **kwargs):
+    fake = FakeSupabase({'pets': rows}, counts={'pets': count} if count is not None else None)
+    result = paginate(fake.table('pets').select('*'), **kwargs)
+    return result, fake.executed
+
+
+def test_offset_page_fetches_one_extra_row_in_one_request():
+    (rows, pagination), executed = _page(_rows(21), count=45, page=2, page_size=20)
+
+    assert len(executed) == 1
+    assert executed[0].called('range') == [(20, 40)]
+    assert len(rows) == 20
+    assert pagination['has_more'] is True
+    assert pagination['total'] == 45
+    assert pagination['pages'] == 3
+
+
+def test_last_page_has_no_more():
+    (rows, pagination), _ = _page(_rows(5), page=3, page_size=20)
+
+    assert len(rows) == 5
+    assert pagination['has_more'] is False
+    assert pagination['next_cursor'] is None
+    assert 'total' not in pagination  # count=none: has_more only
+
+
+def test_keyset_page_limits_to_page_size_plus_one():
+    (rows, pagination), executed = _page(_rows(11), page_size=10, cursor='')
+
+    assert executed[0].called('limit') == [(11,)]
+    assert executed[0].called('range') == []
+    assert pagination['has_more'] is True
+    assert decode_cursor(pagination['next_cursor'], 'created_at') == ('2026-01-10', 'id-9')
+
+
+def test_cursor_bounds_the_sort_column():
+    cursor = encode_cursor('created_at', '2026-01-10', 'id-9')
+    _, executed = _page(_rows(0), page_size=10, cursor=cursor)
+
+    query = executed[0]
+    assert query.called('lte') == [('created_at', '2026-01-10')]
+    assert query.called('or_') == [('created_at.lt."2026-01-10",and(created_at.eq."2026-01-10",id.lt."id-9")',)]
+
+
+def test_ascending_cursor_bounds_from_below():
+    cursor = encode_cursor('scheduled_at', '2026-01-10', 'id-9')
+    _, executed = _page(_rows(0), page_size=10, cursor=cursor, sort_column='scheduled_at', desc=False)
+
+    assert executed[0].called('gte') == [('scheduled_at', '2026-01-10')]
+
+
+@pytest.mark.parametrize('cursor', ['garbage', encode_cursor('created_at', 'x', 'y')[:-2] + 'AA'])
+def test_tampered_cursor_is_rejected(cursor):
+    with pytest.raises(InvalidCursor):
+        _page(_rows(0), cursor=cursor)
+
+
+def test_cursor_for_another_sort_column_is_rejected():
+    with pytest.raises(InvalidCursor):
+        _page(_rows(0), cursor=encode_cursor('rating', 5, 'id-1'))
+
+
+@pytest.mark.parametrize('count, expected_mode', [(None, 'exact'), ('planned', 'planned'), ('none', None)])
+def test_list_endpoint_is_one_request_per_page(client, auth_headers, monkeypatch, count, expected_mode):
+    import routes.notifications as notifications
+
+    fake = FakeSupabase({'notifications': _rows(21)}, counts={'notifications': 300})
+    monkeypatch.setattr(notifications, 'supabase', fake)
+
+    query = f'?page_size=20&count={count}' if count else '?page_size=20'
+    response = client.get(f'/api/notifications{query}', headers=auth_headers)
+
+    assert response.status_code == 200
+    assert len(fake.executed) == 1
+    assert fake.executed[0].called('select') == [('*',)]
+    assert [kwargs for name, _, kwargs in fake.executed[0].calls if name == 'select'] == [{'count': expected_mode}]
+    assert len(response.json['data']) == 20
+    assert response.json['pagination']['has_more'] is True
@@ -0,0 +1,127 @@
+"""Real-time chat events: fan-out to subscribers and the Redis listener"""
+
+import json
+import queue
+
+import routes.conversations as conversations
+from tests.fakes import FakeSupabase
+from utils import pubsub
+from utils.pubsub import MessageBus, RedisMessageBus, OVERFLOW
+
+
+def test_publish_reaches_every_subscriber():
+    bus = MessageBus()
+    first, second = bus.subscribe('conversation:c1'), bus.subscribe('conversation:c1')
+    other = bus.subscribe('conversation:c2')
+
+    bus.publish('conversation:c1', 'read', {'reader_id': 'user-2'})
+
+    expected = {'type': 'read', 'data': {'reader_id': 'user-2'}}
+    assert first.get(timeout=1) == expected
+    assert second.get(timeout=1) == expected
+    assert other.get(timeout=0.05) is None
+
+
+def test_slow_subscriber_overflows():
+    bus = MessageBus(queue_size=2)
+    subscription = bus.subscribe('t')
+    for i in range(3):
+        bus.publish('t', 'message', i)
+    assert subscription.get(timeout=1) is OVERFLOW
+
+
+def test_reading_messages_sends_read_receipt_to_both_streams(client, auth_headers, monkeypatch):
+    bus = MessageBus()
+    fake = FakeSupabase({
+        'conversation_participants': {'hidden': False},
+        'messages': lambda query: [{'id': 'm1'}] if query.called('update') else [],
+    })
+    monkeypatch.setattr(conversations, 'supabase', fake)
+    monkeypatch.setattr(conversations, 'message_bus', bus)
+    streams = [bus.subscribe('conversation:c1'), bus.subscribe('conversation:c1')]
+
+    response = client.get('/api/conversations/c1/messages', headers=auth_headers)
+
+    assert response.status_code == 200
+    for stream in streams:
+        assert stream.get(timeout=1) == {'type': 'read', 'data': {'reader_id': 'user-1'}}
+
+
+def test_publish_failure_does_not_fail_send(client, auth_headers, monkeypatch):
+    class BrokenBus:
+        def publish(self, *args):
+            raise ConnectionError('redis down')
+
+    fake = FakeSupabase({
+        'conversation_participants': {'hidden': False},
+        'messages': [{'id': 'm1', 'content': 'hola'}],
+    })
+    monkeypatch.setattr(conversations, 'supabase', fake)
+    monkeypatch.setattr(conversations, 'message_bus', BrokenBus())
+
+    response = client.post('/api/conversations/c1/messages', headers=auth_headers, json={'content': 'hola'})
+
+    assert response.status_code == 201
+    assert len(fake.queries('messages')) == 1
+
+
+class _FakePubSub:
+    """One Redis connection: relays queued messages until it drops (None) or is closed"""
+
+    def __init__(self):
+        self.inbox = queue.Queue()
+        self.closed = False
+
+    def psubscribe(self, pattern):
+        pass
+
+    def listen(self):
+        while not self.closed:
+            try:
+                message = self.inbox.get(timeout=0.01)
+            except queue.Empty:
+                continue
+            if message is None:
+                raise ConnectionError('connection reset')
+            yield message
+
+    def close(self):
+        self.closed = True
+
+
+class _FakeRedis:
+    def __init__(self, connections):
+        self.connections = connections
+        self.opened = 0
+
+    def pubsub(self, **kwargs):
+        connection = self.connections[min(self.opened, len(self.connections) - 1)]
+        self.opened += 1
+        return connection
+
+
+def _message(topic, data):
+    return {'channel': f'bus:{topic}'.encode(), 'data': json.dumps({'type': 'read', 'data': data})}
+
+
+def test_redis_listener_reconnects_after_drop(monkeypatch):
+    monkeypatch.setattr(pubsub.time, 'sleep', lambda seconds: None)
+    bus = RedisMessageBus(url='redis://127.0.0.1:9/0')
+    first_connection, second_connection = _FakePubSub(), _FakePubSub()
+    bus._client = _FakeRedis([first_connection, second_connection])
+
+    before = bus.subscribe('t')
+    first_connection.inbox.put(_message('t', 1))
+    first_connection.inbox.put(None)
+    assert before.get(timeout=1) == {'type': 'read', 'data': 1}
+
+    # The drop marks existing streams overflowed (events may have been missed) ...
+    assert before.get(timeout=1) is OVERFLOW
+
+    # ... and the listener keeps relaying on a new connection
+    after = bus.subscribe('t')
+    second_connection.inbox.put(_message('t', 2))
+    assert after.get(timeout=1) == {'type': 'read', 'data': 2}
+    assert bus._client.opened == 2
+    assert bus._listener.is_alive()
+    second_connection.close()
@@ -0,0 +1,45 @@
+"""Provider details: independent lookups fanned out with execute_all"""
+
+import pytest
+
+import routes.services as services
+from tests.fakes import FakeSupabase
+
+
+@pytest.fixture
+def fake(monkeypatch):
+    def participants(query):
+        # The user's conversations, then the provider among them
+        return [{'conversation_id': 'conv-1'}]
+
+    fake = FakeSupabase({
+        'providers': {'id': 'prov-1', 'profiles': {'full_name': 'Vet'}},
+        'conversation_participants': participants,
+        'provider_ratings': [],
+    })
+    monkeypatch.setattr(services, 'supabase_admin', fake)
+    return fake
+
+
+def test_provider_details(client, auth_headers, fake):
+    response = client.get('/api/services/providers/prov-1', headers=auth_headers)
+
+    assert response.status_code == 200
+    assert response.json['provider']['id'] == 'prov-1'
+    assert response.json['has_contacted'] is True
+    assert response.json['can_rate'] is True
+
+    # Provider, conversations and last rating in the concurrent round, then the dependent check
+    assert [query.name for query in fake.executed[:3]].count('conversation_participants') == 1
+    assert {query.name for query in fake.executed[:3]} == {'providers', 'conversation_participants', 'provider_ratings'}
+    assert fake.executed[3].called('in_') == [('conversation_id', ['conv-1'])]
+
+
+def test_recent_rating_blocks_rating(client, auth_headers, fake):
+    from datetime import datetime, timezone
+
+    fake.responses['provider_ratings'] = [{'created_at': datetime.now(timezone.utc).isoformat()}]
+    response = client.get('/api/services/providers/prov-1', headers=auth_headers)
+
+    assert response.json['can_rate'] is False
+    assert response.json['last_rating_date'] is not None
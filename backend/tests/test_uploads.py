@@ -0,0 +1,40 @@
+"""utils.uploads: base64 payloads decoded a slice at a time"""
+
+import base64
+import os
+
+import pytest
+
+import utils.uploads as uploads
+from utils.uploads import Base64File
+
+
+@pytest.fixture(autouse=True)
+def small_chunks(monkeypatch):
+    # Many slices per payload, so a misaligned slice would corrupt the output
+    monkeypatch.setattr(uploads, 'UPLOAD_CHUNK_SIZE', 30)
+
+
+def _decoded(data):
+    return b''.join(Base64File(data, 'photo.jpg').chunks())
+
+
+def test_plain_payload():
+    payload = os.urandom(1000)
+
+    assert _decoded(base64.b64encode(payload).decode()) == payload
+
+
+@pytest.mark.parametrize('newline', ['\n', '\r\n'])
+def test_line_wrapped_payload(newline):
+    payload = os.urandom(1000)
+    wrapped = base64.encodebytes(payload).decode().replace('\n', newline)
+
+    assert _decoded(f'data:image/jpeg;base64,{wrapped}') == payload
+
+
+def test_whitespace_does_not_count_towards_the_size_limit(monkeypatch):
+    monkeypatch.setattr(uploads, 'MAX_FILE_BYTES', 1000)
+    padded = base64.b64encode(os.urandom(1000)).decode().replace('A', ' A ')
+
+    assert len(_decoded(padded)) == 1000
@@ -0,0 +1,170 @@
+"""
+In-process caches shared by middleware and routes
+Backends: in-process LRU (default) or any Redis-compatible server (CACHE_BACKEND=redis)
+"""
+
+import json
+import threading
+import time
+from collections import OrderedDict
+
+from config import CACHE_BACKEND, REDIS_URL
+
+# Named caches, exposed through get_cache_stats()
+_registry = {}
+
+
+class LRUCache:
+    """
+    Thread-safe LRU cache with optional per-entry expiry.
+    Expiry is an absolute epoch timestamp so callers can cap entries at
+    values such as a JWT 'exp' claim.
+    """
+
+    def __init__(self, maxsize=1024, ttl=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+
+            value, expires_at = entry
+            if expires_at is not None and expires_at <= time.time():
+                del self._data[key]
+                self.misses += 1
+                return default
+
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value, ttl=None, expires_at=None):
+        """Store value; entry expires at the earliest of ttl and expires_at"""
+        ttl = ttl if ttl is not None else self.ttl
+        deadline = time.time() + ttl if ttl is not None else None
+        if expires_at is not None:
+            deadline = expires_at if deadline is None else min(deadline, expires_at)
+
+        with self._lock:
+            self._data[key] = (value, deadline)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def incr(self, key, amount=1):
+        """Atomically add amount to an integer entry (missing or expired counts as 0); returns the new value"""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None or (entry[1] is not None and entry[1] <= time.time()):
+                entry = (0, time.time() + self.ttl if self.ttl is not None else None)
+            value = entry[0] + amount
+            self._data[key] = (value, entry[1])
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+            return value
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self):
+        return {
+            'backend': 'memory',
+            'size': len(self._data),
+            'maxsize': self.maxsize,
+            'hits': self.hits,
+            'misses': self.misses
+        }
+
+    def __len__(self):
+        return len(self._data)
+
+
+class RedisCache:
+    """
+    Cache backed by a Redis-compatible server, shared across worker processes.
+    Values must be JSON-serializable. Hit/miss counters are per process.
+    """
+
+    def __init__(self, namespace, ttl=None, url=REDIS_URL):
+        import redis  # Optional dependency, only needed with CACHE_BACKEND=redis
+
+        self.namespace = namespace
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._client = redis.Redis.from_url(url)
+
+    def _key(self, key):
+        return f"{self.namespace}:{key}"
+
+    def get(self, key, default=None):
+        raw = self._client.get(self._key(key))
+        if raw is None:
+            self.misses += 1
+            return default
+        self.hits += 1
+        return json.loads(raw)
+
+    def set(self, key, value, ttl=None, expires_at=None):
+        ttl = ttl if ttl is not None else self.ttl
+        if expires_at is not None:
+            remaining = int(expires_at - time.time())
+            ttl = remaining if ttl is None else min(ttl, remaining)
+        if ttl is not None and ttl <= 0:
+            return
+        self._client.set(self._key(key), json.dumps(value), ex=ttl)
+
+    def incr(self, key, amount=1):
+        """Atomic INCRBY; the entry gets the cache ttl when created"""
+        value = self._client.incrby(self._key(key), amount)
+        if value == amount and self.ttl is not None:
+            self._client.expire(self._key(key), self.ttl)
+        return value
+
+    def delete(self, key):
+        self._client.delete(self._key(key))
+
+    def clear(self):
+        for key in self._client.scan_iter(f"{self.namespace}:*"):
+            self._client.delete(key)
+
+    def stats(self):
+        return {
+            'backend': 'redis',
+            'hits': self.hits,
+            'misses': self.misses
+        }
+
+
+def make_cache(name, maxsize=1024, ttl=None, shared=True):
+    """
+    Create and register a named cache.
+    shared=False forces the in-process backend (for values that are not
+    JSON-serializable or must stay local to the worker).
+    """
+    if shared and CACHE_BACKEND == 'redis':
+        cache = RedisCache(name, ttl=ttl)
+    else:
+        cache = LRUCache(maxsize=maxsize, ttl=ttl)
+
+    _registry[name] = cache
+    return cache
+
+
+def get_cache_stats():
+    """Hit/miss counters for every registered cache"""
+    return {name: cache.stats() for name, cache in _registry.items()}
@@ -0,0 +1,40 @@
+"""
+Concurrent fan-out of independent Supabase queries inside one request
+Queries run on a per-process thread pool over the pooled HTTP/2 transport,
+so a handler waits for its slowest query instead of the sum of all of them.
+"""
+
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from config import QUERY_FANOUT_WORKERS
+
+_executor = None
+_executor_pid = None
+_lock = threading.Lock()
+
+
+def _get_executor():
+    # Worker threads do not survive fork: build one pool per process, lazily
+    global _executor, _executor_pid
+    if _executor is None or _executor_pid != os.getpid():
+        with _lock:
+            if _executor is None or _executor_pid != os.getpid():
+                _executor = ThreadPoolExecutor(max_workers=QUERY_FANOUT_WORKERS, thread_name_prefix='query-fanout')
+                _executor_pid = os.getpid()
+    return _executor
+
+
+def execute_all(*queries):
+    """
+    Execute query builders (or zero-argument callables) concurrently.
+    Returns the responses in argument order; the first failure is re-raised.
+    """
+    calls = [query.execute if hasattr(query, 'execute') else query for query in queries]
+    if len(calls) <= 1:
+        return [call() for call in calls]
+
+    executor = _get_executor()
+    futures = [executor.submit(call) for call in calls]
+    return [future.result() for future in futures]
@@ -0,0 +1,89 @@
+"""
+Geohash cells for "nearby" prefilters
+Rows carry a geohash column (db/migrations/geohash_cells.sql, precision
+GEOHASH_PRECISION). cell_cover() returns the geohash prefixes covering a
+search circle's bounding box, so the nearby RPCs only compute exact
+distances for rows in those cells.
+Must stay in sync with public.geohash_encode().
+"""
+
+import math
+
+from config import GEOHASH_PRECISION, GEO_COVER_MAX_CELLS
+
+BASE32 = '0123456789bcdefghjkmnpqrstuvwxyz'
+
+# km per degree of latitude (lower bound) and of longitude at the equator (upper bound),
+# with a small margin so the cover always contains the whole circle
+KM_PER_DEGREE_LAT = 110.574 / 1.01
+KM_PER_DEGREE_LON = 111.320 / 1.01
+
+
+def geohash_encode(latitude, longitude, precision=GEOHASH_PRECISION):
+    lat_range = [-90.0, 90.0]
+    lon_range = [-180.0, 180.0]
+    chars = []
+    bits = 0
+    value = 0
+    even = True
+
+    while len(chars) < precision:
+        interval, coordinate = (lon_range, longitude) if even else (lat_range, latitude)
+        mid = (interval[0] + interval[1]) / 2
+        if coordinate >= mid:
+            value = value * 2 + 1
+            interval[0] = mid
+        else:
+            value = value * 2
+            interval[1] = mid
+        even = not even
+        bits += 1
+        if bits == 5:
+            chars.append(BASE32[value])
+            bits = 0
+            value = 0
+
+    return ''.join(chars)
+
+
+def cell_size(precision):
+    """(height, width) in degrees of a geohash cell"""
+    lat_bits = 5 * precision // 2
+    lon_bits = 5 * precision - lat_bits
+    return 180.0 / 2 ** lat_bits, 360.0 / 2 ** lon_bits
+
+
+def cell_cover(latitude, longitude, radius_km, max_cells=GEO_COVER_MAX_CELLS):
+    """
+    Geohash prefixes (all the same length) covering the circle's bounding box,
+    using the finest precision that needs at most max_cells cells.
+    Returns None when no useful cover exists (huge radius or near the poles).
+    """
+    dlat = radius_km / KM_PER_DEGREE_LAT
+    cos_lat = math.cos(math.radians(latitude))
+    if cos_lat < 0.01:
+        return None
+    dlon = radius_km / (KM_PER_DEGREE_LON * cos_lat)
+    if dlon >= 180:
+        return None
+
+    south, north = max(latitude - dlat, -90.0), min(latitude + dlat, 90.0)
+    west, east = longitude - dlon, longitude + dlon
+
+    for precision in range(GEOHASH_PRECISION, 0, -1):
+        height, width = cell_size(precision)
+        first_row, last_row = math.floor((south + 90) / height), math.floor((north + 90) / height)
+        first_col, last_col = math.floor((west + 180) / width), math.floor((east + 180) / width)
+        if (last_row - first_row + 1) * (last_col - first_col + 1) <= max_cells:
+            break
+    else:
+        return None
+
+    cells = set()
+    for row in range(first_row, last_row + 1):
+        cell_lat = min((row + 0.5) * height - 90, 90 - height / 2)
+        for col in range(first_col, last_col + 1):
+            cell_lon = ((col + 0.5) * width) % 360 - 180  # Wraps across the antimeridian
+            cells.add(geohash_encode(cell_lat, cell_lon, precision))
+
+    return sorted(cells)
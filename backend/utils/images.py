@@ -0,0 +1,153 @@
+"""
+Image variants (thumb / medium) for pet photos and lost-pet images
+generate_*_variants() queue an original that was just stored; requests never
+wait on it. A thread downloads the original, a process pool decodes it, applies
+the EXIF orientation, resizes and re-encodes it without metadata (no EXIF/GPS),
+and the variants are uploaded next to the original ({stem}.{variant}.{ext}).
+Their URLs are then recorded on the row as jsonb {variant: url}, only if the row
+still points at that original. Only originals the BFF stored itself are accepted:
+a public URL of this project's Storage, in an image bucket, under the record's
+own prefix (never a client-supplied URL elsewhere). List endpoints fall back to the original until
+the variants exist (thumbnail_url).
+"""
+
+import io
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+
+from config import (
+    supabase_admin, SUPABASE_URL, IMAGE_VARIANT_WORKERS, IMAGE_VARIANT_FORMAT, IMAGE_VARIANT_QUALITY,
+    IMAGE_THUMB_SIZE, IMAGE_MEDIUM_SIZE
+)
+
+logger = logging.getLogger(__name__)
+
+# Variant name -> longest side in pixels
+VARIANTS = {'thumb': IMAGE_THUMB_SIZE, 'medium': IMAGE_MEDIUM_SIZE}
+
+# IMAGE_VARIANT_FORMAT -> (Pillow format, content type, extension)
+FORMATS = {
+    'webp': ('WEBP', 'image/webp', 'webp'),
+    'jpeg': ('JPEG', 'image/jpeg', 'jpg'),
+}
+
+_PUBLIC_PREFIX = f"{(SUPABASE_URL or '').rstrip('/')}/storage/v1/object/public/"
+
+# Buckets whose images get variants
+VARIANT_BUCKETS = {'pet-photos', 'pet-images'}
+
+_threads = None
+_processes = None
+_pools_pid = None
+_lock = threading.Lock()
+
+
+def render_variants(data, sizes, image_format, quality):
+    """
+    {name: encoded bytes} for each (name, longest side) in sizes.
+    Runs in the process pool: arguments and result must be picklable.
+    """
+    from PIL import Image, ImageOps  # Optional dependency, only needed when IMAGE_VARIANT_WORKERS > 0
+
+    with Image.open(io.BytesIO(data)) as image:
+        # JPEG: decode at a reduced scale that still covers the largest variant
+        image.draft('RGB', (max(sizes.values()),) * 2)
+        image = ImageOps.exif_transpose(image)
+
+        keep_alpha = image_format != 'JPEG' and (image.mode in ('RGBA', 'LA', 'PA') or 'transparency' in image.info)
+        image = image.convert('RGBA' if keep_alpha else 'RGB')
+
+        variants = {}
+        for name, size in sizes.items():
+            variant = image.copy()
+            variant.thumbnail((size, size), Image.LANCZOS)
+            out = io.BytesIO()
+            # No exif= / icc_profile= passed: the encoded variant carries no metadata
+            variant.save(out, image_format, quality=quality, optimize=image_format == 'JPEG')
+            variants[name] = out.getvalue()
+        return variants
+
+
+def _get_pools():
+    # Pools do not survive fork: build them per process, lazily
+    global _threads, _processes, _pools_pid
+    if _threads is None or _pools_pid != os.getpid():
+        with _lock:
+            if _threads is None or _pools_pid != os.getpid():
+                _threads = ThreadPoolExecutor(max_workers=IMAGE_VARIANT_WORKERS, thread_name_prefix='image-variants')
+                # spawn: children never inherit the worker's threads or sockets
+                _processes = ProcessPoolExecutor(
+                    max_workers=IMAGE_VARIANT_WORKERS, mp_context=multiprocessing.get_context('spawn')
+                )
+                _pools_pid = os.getpid()
+    return _threads, _processes
+
+
+def storage_location(url):
+    """(bucket, path) of a public URL of this project's Storage, None for any other URL"""
+    if not url or not url.startswith(_PUBLIC_PREFIX):
+        return None
+    bucket, _, path = url[len(_PUBLIC_PREFIX):].split('?', 1)[0].partition('/')
+    if not bucket or not path or '..' in path.split('/'):
+        return None
+    return bucket, path
+
+
+def thumbnail_url(url, variants):
+    """The thumb variant when it exists, else the original"""
+    return (variants or {}).get('thumb') or url
+
+
+def _generate(bucket_id, path, record):
+    pillow_format, content_type, extension = FORMATS[IMAGE_VARIANT_FORMAT]
+    try:
+        bucket = supabase_admin.storage.from_(bucket_id)
+        original = bucket.download(path)
+        rendered = _get_pools()[1].submit(
+            render_variants, original, VARIANTS, pillow_format, IMAGE_VARIANT_QUALITY
+        ).result()
+
+        stem = path.rsplit('.', 1)[0]
+        urls = {}
+        for name, data in rendered.items():
+            variant_path = f'{stem}.{name}.{extension}'
+            bucket.upload(variant_path, data, {'content-type': content_type, 'upsert': 'true'})
+            urls[name] = bucket.get_public_url(variant_path).rstrip('?')
+
+        record(urls)
+    except Exception as e:
+        logger.warning(f'Could not generate variants for {bucket_id}/{path}: {str(e)}')
+
+
+def _enqueue(url, bucket_id, prefix, record):
+    """Queue url, only if it is stored in bucket_id (one of VARIANT_BUCKETS) under prefix"""
+    location = storage_location(url)
+    if bucket_id not in VARIANT_BUCKETS or location is None \
+            or location[0] != bucket_id or not location[1].startswith(prefix):
+        if url:
+            logger.warning(f'Not generating variants for {url}: not stored under {bucket_id}/{prefix}')
+        return None
+    if IMAGE_VARIANT_WORKERS <= 0:
+        return None
+    return _get_pools()[0].submit(_generate, bucket_id, location[1], record)
+
+
+def generate_pet_photo_variants(pet_id, photo_url):
+    """Queue variants for a pet's photo_url (recorded in pets.photo_variants)"""
+    return _enqueue(photo_url, 'pet-photos', f'pets/{pet_id}-', lambda variants: supabase_admin.table('pets')
+                    .update({'photo_variants': variants})
+                    .eq('id', pet_id)
+                    .eq('photo_url', photo_url)
+                    .execute())
+
+
+def generate_lost_pet_image_variants(report_id, image_url):
+    """Queue variants for an image of report_id (recorded in lost_pet_images.variants)"""
+    return _enqueue(image_url, 'pet-images', f'lost-pets/{report_id}/', lambda variants: supabase_admin.table('lost_pet_images')
+                    .update({'variants': variants})
+                    .eq('report_id', report_id)
+                    .eq('image_url', image_url)
+                    .execute())
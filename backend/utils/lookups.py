@@ -0,0 +1,118 @@
+"""
+Batched row lookups by key (e.g. owner names for a list of records)
+One chunked `in_` query per LOOKUP_CHUNK_SIZE ids instead of one query per id.
+Rows are memoized for the current request (identity map on flask.g) and in a
+short-TTL cache shared across requests; missing rows are cached too.
+attach_children() does the same batching for one-to-many rows (not cached).
+"""
+
+from flask import g, has_app_context
+
+from config import supabase, LOOKUP_CACHE_SIZE, LOOKUP_CACHE_TTL, LOOKUP_CHUNK_SIZE
+from utils.cache import make_cache
+from utils.concurrency import execute_all
+
+_MISSING = object()
+
+# One cache per (table, columns, key) lookup shape
+_caches = {}
+
+
+def _cache_for(table, columns, key):
+    shape = (table, columns, key)
+    if shape not in _caches:
+        _caches[shape] = make_cache(f"lookup:{table}:{key}:{columns.replace(' ', '')}", LOOKUP_CACHE_SIZE, LOOKUP_CACHE_TTL)
+    return _caches[shape]
+
+
+def _identity_map(table, columns, key):
+    if not has_app_context():
+        return {}
+    maps = g.setdefault('lookup_identity_maps', {})
+    return maps.setdefault((table, columns, key), {})
+
+
+def batch_lookup(table, ids, columns, key='id', client=None):
+    """
+    Fetch rows of table whose key is in ids.
+    columns must include key. Returns {id: row}; ids with no row are omitted.
+    """
+    client = client or supabase
+    identity_map = _identity_map(table, columns, key)
+    cache = _cache_for(table, columns, key)
+
+    found = {}
+    pending = []
+    for value in {str(v) for v in ids if v}:
+        row = identity_map.get(value, _MISSING)
+        if row is _MISSING:
+            row = cache.get(value, _MISSING)
+            if row is not _MISSING:
+                identity_map[value] = row
+        if row is _MISSING:
+            pending.append(value)
+        elif row is not None:
+            found[value] = row
+
+    if not pending:
+        return found
+
+    chunks = [pending[i:i + LOOKUP_CHUNK_SIZE] for i in range(0, len(pending), LOOKUP_CHUNK_SIZE)]
+    queries = [client.table(table).select(columns).in_(key, chunk) for chunk in chunks]
+
+    try:
+        results = execute_all(*queries)
+    except Exception as e:
+        # Callers fall back to their placeholder for ids that could not be resolved
+        print(f'[LOOKUPS] Error fetching {table}: {str(e)}')
+        return found
+
+    rows = {str(row[key]): row for result in results for row in result.data}
+    for value in pending:
+        row = rows.get(value)
+        identity_map[value] = row
+        cache.set(value, row)
+        if row is not None:
+            found[value] = row
+
+    return found
+
+
+def attach_children(records, table, foreign_key, columns, attr, transform=None, parent_key='id', client=None):
+    """
+    Set records[i][attr] to the list of table rows whose foreign_key matches
+    records[i][parent_key], fetched in chunked `in_` queries.
+    columns must include foreign_key; transform maps each row (e.g. to a single field).
+    """
+    client = client or supabase
+    parent_ids = list({str(record[parent_key]) for record in records if record.get(parent_key)})
+    chunks = [parent_ids[i:i + LOOKUP_CHUNK_SIZE] for i in range(0, len(parent_ids), LOOKUP_CHUNK_SIZE)]
+    results = execute_all(*[client.table(table).select(columns).in_(foreign_key, chunk) for chunk in chunks])
+
+    children = {}
+    for result in results:
+        for row in result.data:
+            children.setdefault(str(row[foreign_key]), []).append(transform(row) if transform else row)
+
+    for record in records:
+        record[attr] = children.get(str(record.get(parent_key)), [])
+
+    return records
+
+
+def invalidate_lookup(table, value):
+    """Drop a row from every cached lookup on table (call after updating it)"""
+    value = str(value)
+    for (cached_table, _, _), cache in _caches.items():
+        if cached_table == table:
+            cache.delete(value)
+    if has_app_context():
+        for (cached_table, _, _), identity_map in g.get('lookup_identity_maps', {}).items():
+            if cached_table == table:
+                identity_map.pop(value, None)
+
+
+def get_profile_names(profile_ids):
+    """Map profile id -> full_name for the given ids"""
+    rows = batch_lookup('profiles', profile_ids, 'id, full_name')
+    return {profile_id: row.get('full_name') for profile_id, row in rows.items()}
@@ -0,0 +1,126 @@
+"""
+Pagination helpers for list endpoints
+Offset mode (?page=&page_size=) is kept for compatibility; keyset mode
+(?cursor=) filters on the endpoint's sort key plus id, so page N costs the
+same as page 1. Cursors are opaque and HMAC-signed so clients cannot forge
+arbitrary filters.
+
+The total comes back with the page itself (PostgREST Content-Range), so a
+page is a single request. ?count=planned|estimated trades accuracy for
+speed on large tables and ?count=none skips counting (has_more only).
+"""
+
+import base64
+import hashlib
+import hmac
+import json
+
+from flask import request
+
+from config import JWT_SECRET
+
+COUNT_MODES = ('exact', 'planned', 'estimated')
+
+
+class InvalidCursor(ValueError):
+    """Cursor is malformed, tampered with or belongs to another sort key"""
+
+
+def _b64encode(raw):
+    return base64.urlsafe_b64encode(raw).rstrip(b'=').decode()
+
+
+def _b64decode(text):
+    return base64.urlsafe_b64decode(text + '=' * (-len(text) % 4))
+
+
+def _sign(payload):
+    return _b64encode(hmac.new(JWT_SECRET.encode(), payload.encode(), hashlib.sha256).digest()[:16])
+
+
+def encode_cursor(sort_column, sort_value, row_id):
+    """Opaque cursor pointing just after the row (sort_value, row_id)"""
+    payload = _b64encode(json.dumps([sort_column, sort_value, row_id], separators=(',', ':')).encode())
+    return f"{payload}.{_sign(payload)}"
+
+
+def decode_cursor(cursor, sort_column):
+    """Return (sort_value, row_id) from a cursor issued for sort_column"""
+    try:
+        payload, signature = cursor.split('.')
+        if not hmac.compare_digest(signature, _sign(payload)):
+            raise InvalidCursor('Invalid cursor')
+        column, sort_value, row_id = json.loads(_b64decode(payload))
+    except InvalidCursor:
+        raise
+    except Exception:
+        raise InvalidCursor('Invalid cursor')
+
+    if column != sort_column:
+        raise InvalidCursor('Invalid cursor')
+    return sort_value, row_id
+
+
+def _quote(value):
+    return '"' + str(value).replace('"', '\\"') + '"'
+
+
+def apply_cursor(query, cursor, sort_column, desc=True, id_column='id'):
+    """
+    Restrict query to rows after the cursor in (sort_column, id_column) order.
+    Matches Postgres null ordering: NULLS FIRST when descending, NULLS LAST ascending.
+    The row comparison is an OR, which Postgres cannot turn into an index range,
+    so a redundant bound on sort_column is added to start the scan at the cursor.
+    That bound excludes NULLs, so ascending sorts need a NOT NULL sort_column.
+    """
+    sort_value, row_id = decode_cursor(cursor, sort_column)
+    op = 'lt' if desc else 'gt'
+
+    if sort_value is None:
+        if desc:
+            return query.or_(f"{sort_column}.not.is.null,and({sort_column}.is.null,{id_column}.{op}.{_quote(row_id)})")
+        return query.is_(sort_column, 'null').filter(id_column, op, row_id)
+
+    query = query.lte(sort_column, sort_value) if desc else query.gte(sort_column, sort_value)
+    row_id = _quote(row_id)
+    sort_value = _quote(sort_value)
+    return query.or_(f"{sort_column}.{op}.{sort_value},and({sort_column}.eq.{sort_value},{id_column}.{op}.{row_id})")
+
+
+def get_count_mode(default='exact'):
+    """Count mode requested with ?count= (None means has_more only), for select(..., count=...)"""
+    mode = request.args.get('count', default)
+    return mode if mode in COUNT_MODES else None
+
+
+def paginate(query, page=1, page_size=20, cursor=None, sort_column='created_at', desc=True, id_column='id'):
+    """
+    Execute query for one page and return (rows, pagination).
+    cursor=None uses page/page_size offsets; any other value (including '' for
+    the first page) switches to keyset mode. Both modes return has_more and
+    next_cursor, plus total/pages when the query was selected with a count.
+    One extra row is fetched to detect has_more.
+    """
+    query = query.order(sort_column, desc=desc).order(id_column, desc=desc)
+
+    if cursor is None:
+        offset = (page - 1) * page_size
+        response = query.range(offset, offset + page_size).execute()
+        pagination = {'page': page, 'page_size': page_size}
+    else:
+        if cursor:
+            query = apply_cursor(query, cursor, sort_column, desc=desc, id_column=id_column)
+        response = query.limit(page_size + 1).execute()
+        pagination = {'page_size': page_size}
+
+    rows = response.data[:page_size]
+    has_more = len(response.data) > page_size
+    pagination['has_more'] = has_more
+
+    if response.count is not None:
+        pagination['total'] = response.count
+        pagination['pages'] = (response.count + page_size - 1) // page_size
+
+    last = rows[-1] if rows and has_more else None
+    pagination['next_cursor'] = encode_cursor(sort_column, last.get(sort_column), last[id_column]) if last else None
+    return rows, pagination
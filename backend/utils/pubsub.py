@@ -0,0 +1,185 @@
+"""
+Publish/subscribe bus for real-time events (chat messages, read receipts)
+Backends: in-process (per worker) or Redis pub/sub (PUBSUB_BACKEND=redis),
+which relays events published by any worker to local subscribers.
+
+Each subscriber gets a bounded queue. A subscriber that falls behind is
+marked overflowed and must reconnect and refetch, so a slow client cannot
+grow the worker's memory.
+"""
+
+import json
+import logging
+import os
+import queue
+import threading
+import time
+
+from config import PUBSUB_BACKEND, REDIS_URL, SSE_QUEUE_SIZE, SSE_MAX_CONNECTIONS
+
+logger = logging.getLogger(__name__)
+
+# Sentinel delivered to a subscriber whose queue overflowed
+OVERFLOW = object()
+
+
+class TooManySubscribers(Exception):
+    """Raised when the worker already holds SSE_MAX_CONNECTIONS subscriptions"""
+
+
+class Subscription:
+    """Bounded event queue for one connected client"""
+
+    def __init__(self, bus, topic, maxsize):
+        self.bus = bus
+        self.topic = topic
+        self.overflowed = False
+        self._queue = queue.Queue(maxsize=maxsize)
+
+    def put(self, event):
+        if self.overflowed:
+            return
+        try:
+            self._queue.put_nowait(event)
+        except queue.Full:
+            self.overflowed = True
+
+    def get(self, timeout=None):
+        """Next event, OVERFLOW if the client fell behind, or None on timeout"""
+        if self.overflowed:
+            return OVERFLOW
+        try:
+            return self._queue.get(timeout=timeout)
+        except queue.Empty:
+            return OVERFLOW if self.overflowed else None
+
+    def close(self):
+        self.bus.unsubscribe(self)
+
+
+class MessageBus:
+    """In-process topic -> subscribers fan-out"""
+
+    def __init__(self, queue_size=SSE_QUEUE_SIZE, max_subscribers=SSE_MAX_CONNECTIONS):
+        self.queue_size = queue_size
+        self.max_subscribers = max_subscribers
+        self._topics = {}
+        self._count = 0
+        self._lock = threading.Lock()
+
+    def subscribe(self, topic):
+        with self._lock:
+            if self._count >= self.max_subscribers:
+                raise TooManySubscribers()
+            subscription = Subscription(self, topic, self.queue_size)
+            self._topics.setdefault(topic, set()).add(subscription)
+            self._count += 1
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscribers = self._topics.get(subscription.topic)
+            if subscribers and subscription in subscribers:
+                subscribers.discard(subscription)
+                self._count -= 1
+                if not subscribers:
+                    del self._topics[subscription.topic]
+
+    def publish(self, topic, event_type, data):
+        self._deliver(topic, {'type': event_type, 'data': data})
+
+    def _deliver(self, topic, event):
+        with self._lock:
+            subscribers = list(self._topics.get(topic, ()))
+        for subscription in subscribers:
+            subscription.put(event)
+
+    def _overflow_all(self):
+        """Make every subscriber reconnect and refetch (events may have been missed)"""
+        with self._lock:
+            subscribers = [s for topic in self._topics.values() for s in topic]
+        for subscription in subscribers:
+            subscription.overflowed = True
+
+    def stats(self):
+        with self._lock:
+            return {
+                'backend': 'memory',
+                'topics': len(self._topics),
+                'subscribers': self._count,
+                'max_subscribers': self.max_subscribers
+            }
+
+
+class RedisMessageBus(MessageBus):
+    """MessageBus whose publishes go through Redis so every worker sees them"""
+
+    CHANNEL_PREFIX = 'bus:'
+    MAX_BACKOFF_SECONDS = 30
+
+    def __init__(self, url=REDIS_URL, **kwargs):
+        import redis  # Optional dependency, only needed with PUBSUB_BACKEND=redis
+
+        super().__init__(**kwargs)
+        self._client = redis.Redis.from_url(url)
+        self._listener = None
+        self._listener_pid = None
+
+    def subscribe(self, topic):
+        self._ensure_listener()
+        return super().subscribe(topic)
+
+    def publish(self, topic, event_type, data):
+        payload = json.dumps({'type': event_type, 'data': data}, default=str)
+        self._client.publish(self.CHANNEL_PREFIX + topic, payload)
+
+    def _ensure_listener(self):
+        # Threads do not survive fork: one listener per worker process, lazily
+        if self._listener is not None and self._listener_pid == os.getpid():
+            return
+        with self._lock:
+            if self._listener is not None and self._listener_pid == os.getpid():
+                return
+            self._listener_pid = os.getpid()
+            self._listener = threading.Thread(target=self._listen, name='pubsub-listener', daemon=True)
+            self._listener.start()
+
+    def _listen(self):
+        # Runs for the life of the worker: a dropped connection is retried with backoff
+        backoff = 1
+        while True:
+            pubsub = self._client.pubsub(ignore_subscribe_messages=True)
+            try:
+                pubsub.psubscribe(self.CHANNEL_PREFIX + '*')
+                backoff = 1
+                for message in pubsub.listen():
+                    try:
+                        topic = message['channel'].decode()[len(self.CHANNEL_PREFIX):]
+                        self._deliver(topic, json.loads(message['data']))
+                    except Exception as e:
+                        logger.error(f"Pub/sub relay failed: {e}")
+            except Exception as e:
+                logger.error(f"Pub/sub listener disconnected, retrying in {backoff}s: {e}")
+            finally:
+                try:
+                    pubsub.close()
+                except Exception:
+                    pass
+
+            # Events published while disconnected are lost: streams reconnect and refetch
+            self._overflow_all()
+            time.sleep(backoff)
+            backoff = min(backoff * 2, self.MAX_BACKOFF_SECONDS)
+
+    def stats(self):
+        stats = super().stats()
+        stats['backend'] = 'redis'
+        return stats
+
+
+def create_message_bus():
+    """Build the bus configured by PUBSUB_BACKEND"""
+    return RedisMessageBus() if PUBSUB_BACKEND == 'redis' else MessageBus()
+
+
+message_bus = create_message_bus()
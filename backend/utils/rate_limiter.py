@@ -0,0 +1,228 @@
+"""
+Rate limiter engine (PRD Section 17)
+Algorithms: sliding log (exact "max N per window") or token bucket
+Backends: in-process (per worker) or Redis-compatible shared store.
+The in-process backend only takes windows up to a day: its counters are per
+worker and lost on restart, so longer windows (7days, 30days) stay on the
+check_rate_limit RPC (see RateLimiter.handles).
+Accepted actions are aggregated and flushed to public.rate_limits in the
+background for auditing, off the request path.
+"""
+
+import logging
+import os
+import threading
+import time
+from collections import defaultdict, deque
+from datetime import datetime, timezone
+
+from config import (
+    supabase_admin, REDIS_URL, RATE_LIMIT_BACKEND, RATE_LIMIT_ALGORITHM,
+    RATE_LIMIT_FLUSH_SECONDS
+)
+
+logger = logging.getLogger(__name__)
+
+# Window names used in RATE_LIMITS, in seconds
+WINDOW_SECONDS = {
+    'hour': 3600,
+    'day': 86400,
+    '7days': 7 * 86400,
+    '30days': 30 * 86400
+}
+
+
+class MemoryBackend:
+    """Per-process limiter state, guarded by a single lock"""
+
+    def __init__(self):
+        self._logs = {}
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def sliding_log(self, key, max_count, window, now):
+        with self._lock:
+            log = self._logs.get(key)
+            if log is None:
+                log = self._logs[key] = deque(maxlen=max_count)
+
+            while log and log[0] <= now - window:
+                log.popleft()
+
+            if len(log) >= max_count:
+                return False
+
+            log.append(now)
+            return True
+
+    def token_bucket(self, key, max_count, window, now):
+        rate = max_count / window
+        with self._lock:
+            tokens, updated_at = self._buckets.get(key, (float(max_count), now))
+            tokens = min(max_count, tokens + (now - updated_at) * rate)
+
+            if tokens < 1:
+                self._buckets[key] = (tokens, now)
+                return False
+
+            self._buckets[key] = (tokens - 1, now)
+            return True
+
+    def prune(self, now):
+        """Drop state for keys idle longer than their window"""
+        with self._lock:
+            for key in [k for k, log in self._logs.items() if not log or log[-1] <= now - WINDOW_SECONDS['30days']]:
+                del self._logs[key]
+            for key in [k for k, (_, updated_at) in self._buckets.items() if updated_at <= now - WINDOW_SECONDS['30days']]:
+                del self._buckets[key]
+
+
+# Atomic check-and-record scripts for the shared store
+_SLIDING_LOG_LUA = """
+local key, now, window, max_count = KEYS[1], tonumber(ARGV[1]), tonumber(ARGV[2]), tonumber(ARGV[3])
+redis.call('ZREMRANGEBYSCORE', key, '-inf', now - window)
+if redis.call('ZCARD', key) >= max_count then
+  return 0
+end
+redis.call('ZADD', key, now, ARGV[4])
+redis.call('EXPIRE', key, math.ceil(window))
+return 1
+"""
+
+_TOKEN_BUCKET_LUA = """
+local key, now, window, max_count = KEYS[1], tonumber(ARGV[1]), tonumber(ARGV[2]), tonumber(ARGV[3])
+local state = redis.call('HMGET', key, 'tokens', 'updated_at')
+local tokens = tonumber(state[1]) or max_count
+local updated_at = tonumber(state[2]) or now
+tokens = math.min(max_count, tokens + (now - updated_at) * max_count / window)
+local allowed = 0
+if tokens >= 1 then
+  tokens = tokens - 1
+  allowed = 1
+end
+redis.call('HSET', key, 'tokens', tokens, 'updated_at', now)
+redis.call('EXPIRE', key, math.ceil(window))
+return allowed
+"""
+
+
+class RedisBackend:
+    """Limiter state shared by all workers through a Redis-compatible server"""
+
+    def __init__(self, url=REDIS_URL):
+        import redis  # Optional dependency, only needed with RATE_LIMIT_BACKEND=redis
+
+        self._client = redis.Redis.from_url(url)
+        self._sliding_log = self._client.register_script(_SLIDING_LOG_LUA)
+        self._token_bucket = self._client.register_script(_TOKEN_BUCKET_LUA)
+
+    def sliding_log(self, key, max_count, window, now):
+        member = f"{now}:{os.getpid()}:{threading.get_ident()}"
+        return bool(self._sliding_log(keys=[f"rl:log:{key}"], args=[now, window, max_count, member]))
+
+    def token_bucket(self, key, max_count, window, now):
+        return bool(self._token_bucket(keys=[f"rl:bucket:{key}"], args=[now, window, max_count]))
+
+    def prune(self, now):
+        # Keys expire on their own
+        pass
+
+
+class AuditFlusher:
+    """
+    Aggregates accepted actions per (profile, action, hour) and writes them to
+    public.rate_limits every RATE_LIMIT_FLUSH_SECONDS from a daemon thread.
+    """
+
+    def __init__(self, interval):
+        self.interval = interval
+        self._counts = defaultdict(int)
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+
+    def record(self, profile_id, action_type):
+        window_start = datetime.now(timezone.utc).replace(minute=0, second=0, microsecond=0).isoformat()
+        with self._lock:
+            self._counts[(str(profile_id), action_type, window_start)] += 1
+        self._ensure_thread()
+
+    def _ensure_thread(self):
+        # Threads do not survive fork: start one per worker process, lazily
+        if self._thread is not None and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._thread is not None and self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name='rate-limit-audit', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            self.flush()
+
+    def flush(self):
+        with self._lock:
+            counts, self._counts = self._counts, defaultdict(int)
+
+        if not counts:
+            return
+
+        rows = [
+            {'profile_id': profile_id, 'action_type': action_type, 'window_start': window_start, 'action_count': count}
+            for (profile_id, action_type, window_start), count in counts.items()
+        ]
+
+        try:
+            supabase_admin.rpc('record_rate_limit_counts', {'p_rows': rows}).execute()
+        except Exception as e:
+            # Auditing is best effort; put counts back so the next flush retries
+            logger.error(f"Rate limit audit flush failed: {e}")
+            with self._lock:
+                for key, count in counts.items():
+                    self._counts[key] += count
+
+
+class RateLimiter:
+    """Check-and-record entry point used by rate_limit_middleware"""
+
+    def __init__(self, backend, algorithm='sliding_log', flusher=None, max_window=None):
+        self.backend = backend
+        self.algorithm = algorithm
+        self.flusher = flusher
+        self.max_window = max_window
+        self._last_prune = time.time()
+
+    def handles(self, window):
+        """False when the window is too long for this backend (checked in the database instead)"""
+        return self.max_window is None or WINDOW_SECONDS.get(window, WINDOW_SECONDS['hour']) <= self.max_window
+
+    def hit(self, profile_id, action_type, max_count, window):
+        """Return True if the action is allowed (and record it), False if over the limit"""
+        now = time.time()
+        window_seconds = WINDOW_SECONDS.get(window, WINDOW_SECONDS['hour'])
+        key = f"{profile_id}:{action_type}"
+
+        check = self.backend.token_bucket if self.algorithm == 'token_bucket' else self.backend.sliding_log
+        allowed = check(key, max_count, window_seconds, now)
+
+        if allowed and self.flusher:
+            self.flusher.record(profile_id, action_type)
+
+        if now - self._last_prune > 3600:
+            self._last_prune = now
+            self.backend.prune(now)
+
+        return allowed
+
+
+def create_rate_limiter():
+    """Build the limiter configured by RATE_LIMIT_BACKEND / RATE_LIMIT_ALGORITHM"""
+    if RATE_LIMIT_BACKEND == 'redis':
+        backend, max_window = RedisBackend(), None
+    else:
+        backend, max_window = MemoryBackend(), WINDOW_SECONDS['day']
+    flusher = AuditFlusher(RATE_LIMIT_FLUSH_SECONDS) if RATE_LIMIT_FLUSH_SECONDS > 0 else None
+    return RateLimiter(backend, algorithm=RATE_LIMIT_ALGORITHM, flusher=flusher, max_window=max_window)
@@ -0,0 +1,199 @@
+"""
+Reference data snapshot (species, breeds, vaccines, service types)
+These tables change rarely, so each worker keeps one copy in memory and serves
+responses serialized once per snapshot, with strong ETags (304 on match).
+Indexes (vaccines by id; breeds, vaccines and required vaccine ids by species)
+are built with the snapshot and replaced together with it, so lookups never see
+a half-built index.
+The snapshot is reloaded after REFERENCE_DATA_TTL or when the shared version is
+bumped (invalidate_reference_data, shared across workers with CACHE_BACKEND=redis).
+Rows are shared between requests: treat them as read-only.
+"""
+
+import hashlib
+import json
+import logging
+import sys
+import threading
+import time
+
+from flask import Response, request
+
+from config import supabase, REFERENCE_DATA_TTL, REFERENCE_DATA_VERSION_CHECK, REFERENCE_DATA_MAX_AGE
+from utils.cache import make_cache
+from utils.concurrency import execute_all
+
+logger = logging.getLogger(__name__)
+
+# Dataset name -> query for the whole table
+_QUERIES = {
+    'species': lambda: supabase.table('species')
+        .select('id, name, code')
+        .order('name'),
+    'breeds': lambda: supabase.table('breeds')
+        .select('id, name, code, species_id, species:species_id(name, code)')
+        .order('name'),
+    'vaccines': lambda: supabase.table('vaccines')
+        .select('*, species:species_id(name, code)')
+        .order('name'),
+    'service_types': lambda: supabase.table('service_types')
+        .select('*')
+        .order('category')
+        .order('name'),
+}
+
+# Serialized responses kept per snapshot (bounds keys built from URL parameters)
+MAX_RESPONSES = 256
+
+# PostgREST order 'required.desc' puts nulls first, then true, then false
+_REQUIRED_FIRST = {None: 0, True: 1, False: 2}
+
+_versions = make_cache('reference_data:version', maxsize=1)
+
+_snapshot = None
+_last_version_check = 0.0
+_load_lock = threading.Lock()
+
+
+def _group_by_species(rows):
+    index = {}
+    for row in rows:
+        index.setdefault(row.get('species_id'), []).append(row)
+    return {species_id: tuple(group) for species_id, group in index.items()}
+
+
+def _deep_size(obj, seen=None):
+    """Approximate bytes held by obj and everything it references"""
+    seen = seen if seen is not None else set()
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(_deep_size(key, seen) + _deep_size(value, seen) for key, value in obj.items())
+    elif isinstance(obj, (list, tuple, set)):
+        size += sum(_deep_size(item, seen) for item in obj)
+    return size
+
+
+class Snapshot:
+    """One load of every reference table, its indexes and the responses serialized from it"""
+
+    def __init__(self, version, datasets):
+        self.version = version
+        self.datasets = datasets
+        self.loaded_at = time.time()
+        self._responses = {}
+
+        # Rows come ordered by name; the stable sort keeps that order within each group
+        self.vaccines_required_first = tuple(
+            sorted(datasets['vaccines'], key=lambda vaccine: _REQUIRED_FIRST[vaccine.get('required')])
+        )
+        self.vaccines_by_id = {vaccine['id']: vaccine for vaccine in datasets['vaccines']}
+        self.breeds_by_species = _group_by_species(datasets['breeds'])
+        self.vaccines_by_species = _group_by_species(self.vaccines_required_first)
+        self.required_vaccine_ids_by_species = {
+            species_id: tuple(vaccine['id'] for vaccine in vaccines if vaccine.get('required'))
+            for species_id, vaccines in self.vaccines_by_species.items()
+        }
+
+    def response(self, key, build):
+        """(body, etag) for key; build(snapshot) is serialized once per snapshot"""
+        cached = self._responses.get(key)
+        if cached is None:
+            body = json.dumps(build(self), ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+            cached = (body, hashlib.sha256(body).hexdigest()[:32])
+            if len(self._responses) < MAX_RESPONSES:
+                self._responses[key] = cached
+        return cached
+
+    def stats(self):
+        return {
+            'version': self.version,
+            'age_seconds': round(time.time() - self.loaded_at, 1),
+            'rows': {name: len(rows) for name, rows in self.datasets.items()},
+            'responses': len(self._responses),
+            'response_bytes': sum(len(body) for body, _ in self._responses.values()),
+            'rows_bytes': _deep_size(self.datasets),
+            'index_bytes': _deep_size((
+                self.vaccines_required_first,
+                self.vaccines_by_id,
+                self.breeds_by_species,
+                self.vaccines_by_species,
+                self.required_vaccine_ids_by_species
+            ), seen={id(row) for rows in self.datasets.values() for row in rows})
+        }
+
+
+def _shared_version():
+    return _versions.get('version', 0)
+
+
+def _reload(current):
+    global _snapshot
+    with _load_lock:
+        if _snapshot is not current:
+            return _snapshot  # Another thread already reloaded
+
+        version = _shared_version()
+        names = list(_QUERIES)
+        try:
+            results = execute_all(*[_QUERIES[name]() for name in names])
+        except Exception as e:
+            if current is None:
+                raise
+            # Keep serving the previous snapshot and retry after another TTL
+            logger.warning(f'Reference data reload failed, serving version {current.version}: {str(e)}')
+            current.loaded_at = time.time()
+            return current
+
+        _snapshot = Snapshot(version, {name: result.data for name, result in zip(names, results)})
+        return _snapshot
+
+
+def get_snapshot():
+    """Current snapshot, reloading it first if expired or invalidated"""
+    global _last_version_check
+    snapshot = _snapshot
+    now = time.time()
+
+    stale = snapshot is None or now - snapshot.loaded_at >= REFERENCE_DATA_TTL
+    if not stale and now - _last_version_check >= REFERENCE_DATA_VERSION_CHECK:
+        _last_version_check = now
+        stale = _shared_version() != snapshot.version
+
+    return _reload(snapshot) if stale else snapshot
+
+
+def reference_response(key, build):
+    """
+    JSON response for build(snapshot) with a strong ETag and Cache-Control.
+    key identifies the view (include any filter values); 304 when If-None-Match matches.
+    """
+    body, etag = get_snapshot().response(key, build)
+
+    response = Response(body, mimetype='application/json')
+    response.set_etag(etag)
+    response.cache_control.public = True
+    response.cache_control.max_age = REFERENCE_DATA_MAX_AGE
+    return response.make_conditional(request)
+
+
+def invalidate_reference_data():
+    """Bump the shared version so every worker reloads (call after writing a reference table)"""
+    global _last_version_check
+    _versions.incr('version')
+    _last_version_check = 0.0
+
+
+def warm_reference_data():
+    """Load the snapshot before the first request; failures are retried on first use"""
+    try:
+        get_snapshot()
+    except Exception as e:
+        logger.warning(f'Could not preload reference data: {str(e)}')
+
+
+def get_reference_data_stats():
+    snapshot = _snapshot
+    return snapshot.stats() if snapshot else {'version': None}
@@ -0,0 +1,56 @@
+"""
+Admin reports (GET /api/admin/reports?type=...)
+Grouping, ordering and limits run in the database over small materialized
+views (db/migrations/admin_reports.sql), so a report costs the same whatever
+the size of pets / pet_vaccinations. Results are cached for
+ADMIN_REPORT_CACHE_TTL seconds per report type and parameters.
+"""
+
+import json
+
+from config import supabase_admin, ADMIN_REPORT_CACHE_SIZE, ADMIN_REPORT_CACHE_TTL
+from utils.cache import make_cache
+
+_cache = make_cache('admin_reports', ADMIN_REPORT_CACHE_SIZE, ADMIN_REPORT_CACHE_TTL)
+
+
+def _popular_breeds(limit, country):
+    rows = supabase_admin.rpc('report_popular_breeds', {'p_limit': limit, 'p_country': country}).execute().data
+    return {
+        'data': [
+            {
+                'breed': f"{row['species_name']} - {row['breed_name']}",
+                'breed_id': row['breed_id'],
+                'count': row['pet_count']
+            }
+            for row in rows
+        ],
+        'refreshed_at': max((row['refreshed_at'] for row in rows), default=None)
+    }
+
+
+def _vaccinations(limit, country):
+    return supabase_admin.rpc('report_vaccinations', {'p_limit': limit, 'p_country': country}).execute().data
+
+
+def _providers(limit, country):
+    rows = supabase_admin.rpc('report_top_providers', {'p_limit': limit, 'p_country': country}).execute().data
+    return {'data': rows}
+
+
+# Report type -> builder(limit, country)
+REPORTS = {
+    'popular_breeds': _popular_breeds,
+    'vaccinations': _vaccinations,
+    'providers': _providers,
+}
+
+
+def run_report(report_type, limit, country=None):
+    """Result of a report type from REPORTS, served from the cache when fresh"""
+    key = json.dumps([report_type, limit, country])
+    result = _cache.get(key)
+    if result is None:
+        result = REPORTS[report_type](limit, country)
+        _cache.set(key, result)
+    return result
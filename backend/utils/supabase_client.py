@@ -0,0 +1,238 @@
+"""
+Supabase client factory
+Every client gets one pooled keep-alive HTTP/2 transport shared by its
+PostgREST, Storage and Auth sub-clients. Clients are created lazily per
+worker process, so pre-forked workers (gunicorn --preload) never share
+sockets inherited from the master.
+
+This module does not import config (config builds its clients from here).
+"""
+
+import os
+import random
+import threading
+import time
+
+import httpx
+from gotrue.http_clients import SyncClient as AuthHttpClient
+from postgrest import SyncPostgrestClient
+from postgrest.utils import SyncClient as PostgrestHttpClient
+from storage3 import SyncStorageClient
+from storage3.utils import SyncClient as StorageHttpClient
+from supabase import Client, ClientOptions
+from supabase._sync.auth_client import SyncSupabaseAuthClient
+
+# Reads that are safe to send again after a transport error or gateway failure
+IDEMPOTENT_METHODS = frozenset({'GET', 'HEAD', 'OPTIONS'})
+RETRY_STATUS_CODES = frozenset({502, 503, 504})
+
+# Pool metrics per client name, exposed through get_pool_stats()
+_registry = {}
+
+
+class PoolMetrics:
+    """Request counters for one transport; 'saturated' counts requests that found every connection busy"""
+
+    def __init__(self, max_connections):
+        self.max_connections = max_connections
+        self.requests = 0
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.saturated = 0
+        self.retries = 0
+        self.errors = 0
+        self._lock = threading.Lock()
+
+    def start(self):
+        with self._lock:
+            self.requests += 1
+            if self.in_flight >= self.max_connections:
+                self.saturated += 1
+            self.in_flight += 1
+            self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+
+    def finish(self, failed=False):
+        with self._lock:
+            self.in_flight -= 1
+            if failed:
+                self.errors += 1
+
+    def retry(self):
+        with self._lock:
+            self.retries += 1
+
+
+class PooledTransport(httpx.HTTPTransport):
+    """HTTP/2 keep-alive transport with bounded pool, metrics and retry/backoff on idempotent reads"""
+
+    def __init__(self, metrics, pool_size, keepalive, keepalive_expiry, retries=2, backoff=0.2, http2=True):
+        super().__init__(
+            http2=http2,
+            limits=httpx.Limits(
+                max_connections=pool_size,
+                max_keepalive_connections=keepalive,
+                keepalive_expiry=keepalive_expiry
+            ),
+            retries=retries  # Connect failures: nothing was sent, safe for any method
+        )
+        self.metrics = metrics
+        self.read_retries = retries
+        self.backoff = backoff
+
+    def handle_request(self, request):
+        attempts = self.read_retries + 1 if request.method in IDEMPOTENT_METHODS else 1
+        self.metrics.start()
+        failed = True
+        try:
+            for attempt in range(attempts):
+                last = attempt == attempts - 1
+                try:
+                    response = super().handle_request(request)
+                except httpx.TransportError:
+                    if last:
+                        raise
+                else:
+                    if last or response.status_code not in RETRY_STATUS_CODES:
+                        failed = False
+                        return response
+                    response.close()
+
+                self.metrics.retry()
+                # Exponential backoff with jitter
+                time.sleep(self.backoff * (2 ** attempt) * (0.5 + random.random() / 2))
+        finally:
+            self.metrics.finish(failed=failed)
+
+    def stats(self):
+        connections = self._pool.connections
+        idle = sum(1 for conn in connections if conn.is_idle())
+        metrics = self.metrics
+        return {
+            'pool_size': metrics.max_connections,
+            'connections': len(connections),
+            'idle_connections': idle,
+            'active_connections': len(connections) - idle,
+            'in_flight': metrics.in_flight,
+            'peak_in_flight': metrics.peak_in_flight,
+            'requests': metrics.requests,
+            'saturated': metrics.saturated,
+            'retries': metrics.retries,
+            'errors': metrics.errors
+        }
+
+
+class _PooledPostgrestClient(SyncPostgrestClient):
+    def __init__(self, *args, transport, **kwargs):
+        self._transport = transport
+        super().__init__(*args, **kwargs)
+
+    def create_session(self, base_url, headers, timeout, verify=True, proxy=None):
+        return PostgrestHttpClient(
+            base_url=base_url,
+            headers=headers,
+            timeout=timeout,
+            follow_redirects=True,
+            transport=self._transport
+        )
+
+
+class _PooledStorageClient(SyncStorageClient):
+    def __init__(self, *args, transport, **kwargs):
+        self._transport = transport
+        super().__init__(*args, **kwargs)
+
+    def _create_session(self, base_url, headers, timeout, verify=True, proxy=None):
+        return StorageHttpClient(
+            base_url=base_url,
+            headers=headers,
+            timeout=timeout,
+            follow_redirects=True,
+            transport=self._transport
+        )
+
+
+class PooledClient(Client):
+    """Supabase client whose sub-clients all go through one PooledTransport"""
+
+    def __init__(self, supabase_url, supabase_key, transport, options=None):
+        self._transport = transport
+        super().__init__(supabase_url, supabase_key, options)
+
+    def _init_postgrest_client(self, rest_url, headers, schema, timeout=None, verify=True, proxy=None):
+        return _PooledPostgrestClient(
+            rest_url, headers=headers, schema=schema, timeout=timeout, transport=self._transport
+        )
+
+    def _init_storage_client(self, storage_url, headers, storage_client_timeout=None, verify=True, proxy=None):
+        return _PooledStorageClient(
+            storage_url, headers, storage_client_timeout, transport=self._transport
+        )
+
+    def _init_supabase_auth_client(self, auth_url, client_options, verify=True, proxy=None):
+        http_client = AuthHttpClient(
+            timeout=client_options.postgrest_client_timeout,
+            follow_redirects=True,
+            transport=self._transport
+        )
+        return SyncSupabaseAuthClient(
+            url=auth_url,
+            auto_refresh_token=client_options.auto_refresh_token,
+            persist_session=client_options.persist_session,
+            storage=client_options.storage,
+            headers=client_options.headers,
+            flow_type=client_options.flow_type,
+            http_client=http_client
+        )
+
+
+def create_pooled_client(name, url, key, pool_size=20, keepalive=10, keepalive_expiry=30,
+                         connect_timeout=5, read_timeout=30, retries=2, backoff=0.2, http2=True):
+    """Build a Supabase client with its own pooled transport, registered under name"""
+    metrics = PoolMetrics(pool_size)
+    transport = PooledTransport(
+        metrics, pool_size, keepalive, keepalive_expiry, retries=retries, backoff=backoff, http2=http2
+    )
+    timeout = httpx.Timeout(read_timeout, connect=connect_timeout)
+    options = ClientOptions(postgrest_client_timeout=timeout, storage_client_timeout=read_timeout)
+
+    client = PooledClient(url, key, transport, options)
+    _registry[name] = transport
+    return client
+
+
+class LazyClient:
+    """
+    Proxy that builds its client on first use in each process.
+    Drop-in for a module-level client: attribute access is forwarded.
+    """
+
+    def __init__(self, factory):
+        self._factory = factory
+        self._client = None
+        self._pid = None
+        self._lock = threading.Lock()
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(after_in_child=self._reset)
+
+    def _reset(self):
+        # The parent's sockets and lock state must not leak into the child
+        self._client = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def get(self):
+        pid = os.getpid()
+        if self._client is None or self._pid != pid:
+            with self._lock:
+                if self._client is None or self._pid != pid:
+                    self._client = self._factory()
+                    self._pid = pid
+        return self._client
+
+    def __getattr__(self, name):
+        return getattr(self.get(), name)
+
+
+def get_pool_stats():
+    """Connection pool counters for every client created in this process"""
+    return {name: transport.stats() for name, transport in _registry.items()}
@@ -0,0 +1,379 @@
+"""
+Streaming file uploads to Supabase Storage
+Files arrive as multipart/form-data parts, as a raw request body or (legacy
+JSON clients) as base64 strings, and are forwarded to Storage chunk by chunk
+while they are read, so an upload holds about UPLOAD_CHUNK_SIZE bytes in memory
+whatever the file size. MAX_FILE_SIZE_MB, the extension and the file signature
+are checked as the bytes go through; a rejected file aborts the Storage request
+before it completes, so nothing partial is stored.
+
+Clients can also upload straight to Storage (two-phase, see routes/uploads.py):
+StorageTarget.sign() issues a signed upload URL plus a ticket bound to the user
+and path, valid UPLOAD_URL_TTL seconds; StorageTarget.verify() then checks the
+stored object's size, content type and signature before it is attached.
+"""
+
+import base64
+import time
+import uuid
+from collections import namedtuple
+
+import jwt
+from flask import request
+from storage3.utils import StorageException
+from werkzeug.sansio.multipart import MultipartDecoder, Field, File, Data, Epilogue, NeedData
+
+from config import supabase_admin, JWT_SECRET, MAX_FILE_SIZE_MB, ALLOWED_EXTENSIONS, UPLOAD_CHUNK_SIZE, UPLOAD_URL_TTL
+
+MAX_FILE_BYTES = MAX_FILE_SIZE_MB * 1024 * 1024
+
+# Text form fields are small; anything bigger is not a field we read
+MAX_FIELD_BYTES = 64 * 1024
+
+IMAGE_EXTENSIONS = ALLOWED_EXTENSIONS & {'png', 'jpg', 'jpeg'}
+
+CONTENT_TYPES = {
+    'png': 'image/png',
+    'jpg': 'image/jpeg',
+    'jpeg': 'image/jpeg',
+    'pdf': 'application/pdf',
+}
+
+# Leading bytes every file of the extension starts with
+SIGNATURES = {
+    'png': b'\x89PNG\r\n\x1a\n',
+    'jpg': b'\xff\xd8\xff',
+    'jpeg': b'\xff\xd8\xff',
+    'pdf': b'%PDF-',
+}
+_SIGNATURE_BYTES = max(len(signature) for signature in SIGNATURES.values())
+
+# Audience of upload tickets (never valid as an auth token)
+_TICKET_AUDIENCE = 'upload'
+
+StoredFile = namedtuple('StoredFile', 'bucket path url name size')
+
+
+class UploadRejected(Exception):
+    """The request or one of its files is not acceptable; status_code is the HTTP status to answer"""
+
+    def __init__(self, message, status_code=400):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+def _extension(filename, default):
+    return filename.rsplit('.', 1)[-1].lower() if filename and '.' in filename else default
+
+
+class _Part:
+    """One multipart part; its data is read from the request as chunks() is iterated"""
+
+    def __init__(self, reader, name, filename):
+        self._reader = reader
+        self.name = name
+        self.filename = filename
+        self._done = False
+
+    def chunks(self):
+        while not self._done:
+            event = self._reader.next_event()
+            if not isinstance(event, Data):
+                raise UploadRejected('Malformed multipart body')
+            self._done = not event.more_data
+            if event.data:
+                yield event.data
+
+    def read_text(self):
+        value = bytearray()
+        for chunk in self.chunks():
+            value.extend(chunk)
+            if len(value) > MAX_FIELD_BYTES:
+                raise UploadRejected(f'Form field {self.name} is too large', 413)
+        return value.decode('utf-8')
+
+    def drain(self):
+        for _ in self.chunks():
+            pass
+
+
+class _MultipartReader:
+    """Incremental multipart/form-data parser over request.stream"""
+
+    def __init__(self, stream, boundary):
+        self._stream = stream
+        self._decoder = MultipartDecoder(boundary.encode('latin-1'))
+        self._ended = False
+
+    def next_event(self):
+        event = self._decoder.next_event()
+        while isinstance(event, NeedData):
+            if self._ended:
+                raise UploadRejected('Incomplete multipart body')
+            data = self._stream.read(UPLOAD_CHUNK_SIZE)
+            self._ended = not data
+            self._decoder.receive_data(data or None)
+            event = self._decoder.next_event()
+        return event
+
+    def parts(self):
+        while True:
+            event = self.next_event()
+            if isinstance(event, Epilogue):
+                return
+            if isinstance(event, (Field, File)):
+                part = _Part(self, event.name, getattr(event, 'filename', None))
+                yield part
+                part.drain()  # Whatever the caller did not read
+
+
+class _Body:
+    """The raw request body as a single file (file name from ?file_name)"""
+
+    def __init__(self, filename):
+        self.filename = filename
+
+    def chunks(self):
+        while True:
+            chunk = request.stream.read(UPLOAD_CHUNK_SIZE)
+            if not chunk:
+                return
+            yield chunk
+
+
+class UploadedFile:
+    """A werkzeug FileStorage (request.files) as an upload source"""
+
+    def __init__(self, file):
+        self.file = file
+        self.filename = file.filename
+
+    def chunks(self):
+        while True:
+            chunk = self.file.stream.read(UPLOAD_CHUNK_SIZE)
+            if not chunk:
+                return
+            yield chunk
+
+
+class Base64File:
+    """A base64 (or data URL) string from a JSON body, decoded a slice at a time"""
+
+    def __init__(self, data, filename):
+        data = data.split(',', 1)[1] if ',' in data else data
+        # Line-wrapped (MIME) base64 would shift the 4-character slices out of alignment
+        self.data = ''.join(data.split())
+        self.filename = filename
+
+    def chunks(self):
+        if len(self.data) * 3 // 4 > MAX_FILE_BYTES + 2:
+            raise UploadRejected(f'File exceeds {MAX_FILE_SIZE_MB} MB', 413)
+        step = UPLOAD_CHUNK_SIZE // 3 * 4
+        for start in range(0, len(self.data), step):
+            yield base64.b64decode(self.data[start:start + step])
+
+
+def is_multipart():
+    return request.mimetype == 'multipart/form-data'
+
+
+def request_body_file(default_name):
+    """Upload source for a raw (non multipart, non JSON) request body"""
+    return _Body(request.args.get('file_name') or default_name)
+
+
+def _checked(chunks, extension):
+    """chunks, validating the signature up front and the size as they pass"""
+    head = b''
+    size = 0
+    for chunk in chunks:
+        size += len(chunk)
+        if size > MAX_FILE_BYTES:
+            raise UploadRejected(f'File exceeds {MAX_FILE_SIZE_MB} MB', 413)
+        if head is not None:
+            head += chunk
+            if len(head) < _SIGNATURE_BYTES:
+                continue
+            chunk, head = head, None
+            if not chunk.startswith(SIGNATURES[extension]):
+                raise UploadRejected(f'File content is not a valid {extension} file', 415)
+        yield chunk
+
+    if head is not None:  # Files shorter than the longest signature
+        if not head.startswith(SIGNATURES[extension]):
+            raise UploadRejected(f'File content is not a valid {extension} file', 415)
+        yield head
+
+
+class StorageTarget:
+    """
+    Where uploaded files go: objects are stored at {prefix}{uuid}.{ext} in bucket.
+    extensions limits accepted files; default_ext is used when the name has none.
+    """
+
+    def __init__(self, bucket, prefix, extensions=ALLOWED_EXTENSIONS, default_ext='jpg', client=None):
+        self.bucket = bucket
+        self.prefix = prefix
+        self.extensions = extensions
+        self.default_ext = default_ext
+        self.client = client or supabase_admin
+
+    def _accepted_extension(self, filename):
+        extension = _extension(filename, self.default_ext)
+        if extension not in self.extensions:
+            raise UploadRejected(
+                f"File type .{extension} not allowed (allowed: {', '.join(sorted(self.extensions))})", 415
+            )
+        return extension
+
+    def store(self, source):
+        """Stream source (filename + chunks()) into the bucket and return a StoredFile"""
+        extension = self._accepted_extension(source.filename)
+
+        path = f'{self.prefix}{uuid.uuid4()}.{extension}'
+        bucket = self.client.storage.from_(self.bucket)
+        size = 0
+
+        def body():
+            nonlocal size
+            for chunk in _checked(source.chunks(), extension):
+                size += len(chunk)
+                yield chunk
+
+        # Same pooled session (and auth headers) storage3 uses, with a streamed body
+        response = bucket._client.post(
+            f'/object/{self.bucket}/{path}',
+            content=body(),
+            headers={'content-type': CONTENT_TYPES[extension], 'x-upsert': 'false', 'cache-control': 'max-age=3600'}
+        )
+        if response.is_error:
+            try:
+                details = response.json()
+            except ValueError:
+                details = {}
+            raise StorageException({**details, 'statusCode': response.status_code})
+
+        url = bucket.get_public_url(path).rstrip('?')
+        return StoredFile(self.bucket, path, url, source.filename or f'file.{extension}', size)
+
+    def sign(self, filename, claims):
+        """
+        Signed URL to upload one file straight to Storage, and a ticket for
+        finalizing it: a token carrying claims (user, record...) and the object path
+        """
+        extension = self._accepted_extension(filename)
+
+        path = f'{self.prefix}{uuid.uuid4()}.{extension}'
+        signed = self.client.storage.from_(self.bucket).create_signed_upload_url(path)
+        expires_at = int(time.time()) + UPLOAD_URL_TTL
+        ticket = jwt.encode(
+            {**claims, 'path': path, 'name': filename, 'aud': _TICKET_AUDIENCE, 'exp': expires_at},
+            JWT_SECRET,
+            algorithm='HS256'
+        )
+        return {
+            'upload_url': signed['signed_url'],
+            'token': signed['token'],
+            'bucket': self.bucket,
+            'path': path,
+            'content_type': CONTENT_TYPES[extension],
+            'max_bytes': MAX_FILE_BYTES,
+            'ticket': ticket,
+            'expires_at': expires_at
+        }
+
+    def verify(self, path, name):
+        """
+        StoredFile for an object uploaded through sign(); an object that is too
+        big or whose content type or signature does not match its extension is
+        deleted and rejected
+        """
+        extension = _extension(path, None)
+        if not path.startswith(self.prefix) or extension not in self.extensions:
+            raise UploadRejected('Upload path does not belong to this record', 403)
+
+        bucket = self.client.storage.from_(self.bucket)
+        folder, _, filename = path.rpartition('/')
+        found = [item for item in bucket.list(folder, {'search': filename}) if item.get('name') == filename]
+        if not found:
+            raise UploadRejected('Uploaded file not found', 404)
+        metadata = found[0].get('metadata') or {}
+        size = int(metadata.get('size') or 0)
+
+        problem = None
+        if size > MAX_FILE_BYTES:
+            problem = (f'File exceeds {MAX_FILE_SIZE_MB} MB', 413)
+        elif metadata.get('mimetype') != CONTENT_TYPES[extension]:
+            problem = (f'File must be uploaded as {CONTENT_TYPES[extension]}', 415)
+        else:
+            head = bucket._client.get(
+                f'/object/{self.bucket}/{path}',
+                headers={'range': f'bytes=0-{_SIGNATURE_BYTES - 1}'}
+            )
+            if head.is_error or not head.content.startswith(SIGNATURES[extension]):
+                problem = (f'File content is not a valid {extension} file', 415)
+
+        stored = StoredFile(self.bucket, path, bucket.get_public_url(path).rstrip('?'), name, size)
+        if problem:
+            self.remove([stored])
+            raise UploadRejected(*problem)
+        return stored
+
+    def remove(self, stored_files):
+        """Best-effort delete of files stored through this target"""
+        paths = [stored.path for stored in stored_files if stored.bucket == self.bucket]
+        if paths:
+            try:
+                self.client.storage.from_(self.bucket).remove(paths)
+            except Exception as e:
+                print(f'Error removing uploaded files: {e}')
+
+
+def remove_stored(files, targets):
+    """Delete files stored through any of targets (after a failure that voids them)"""
+    for target in targets:
+        target.remove(files)
+
+
+def stream_form(resolve_target):
+    """
+    Read a multipart/form-data request part by part.
+    resolve_target(part_name, fields) returns the StorageTarget for a file part, or
+    None to skip it; fields holds the text fields sent before that part.
+    Returns (fields, files) with files as {part name: StoredFile}. If a part fails,
+    files already stored are deleted before the error propagates.
+    """
+    boundary = request.mimetype_params.get('boundary')
+    if not boundary:
+        raise UploadRejected('Missing multipart boundary')
+
+    fields = {}
+    files = {}
+    used = []
+    try:
+        for part in _MultipartReader(request.stream, boundary).parts():
+            if part.filename is None:
+                fields[part.name] = part.read_text()
+                continue
+            target = resolve_target(part.name, fields)
+            if target is None or not part.filename or part.name in files:
+                continue
+            used.append(target)
+            files[part.name] = target.store(part)
+    except Exception:
+        remove_stored(files.values(), used)
+        raise
+    return fields, files
+
+
+def read_upload_ticket(ticket, user_id):
+    """Claims of a ticket issued by StorageTarget.sign() for user_id"""
+    try:
+        claims = jwt.decode(ticket or '', JWT_SECRET, algorithms=['HS256'], audience=_TICKET_AUDIENCE)
+    except jwt.ExpiredSignatureError:
+        raise UploadRejected('Upload ticket expired, request a new upload URL', 410)
+    except jwt.InvalidTokenError:
+        raise UploadRejected('Invalid upload ticket')
+    if claims.get('sub') != str(user_id):
+        raise UploadRejected('Upload ticket belongs to another user', 403)
+    return claims
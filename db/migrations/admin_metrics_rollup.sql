@@ -0,0 +1,319 @@
+-- ==========================================================
+-- MIGRACIÓN: Métricas del panel admin consolidadas
+-- Descripción:
+--   - admin_metrics_daily: altas por día (UTC) y país (usuarios,
+--     conversaciones, turnos, paseos), consolidada por
+--     refresh_admin_metrics_daily() solo para días cerrados
+--   - admin_metrics_totals: totales vigentes (usuarios, mascotas,
+--     proveedores activos, reportes de mascotas perdidas abiertos)
+--     mantenidos por triggers; reconcile_admin_metrics_totals() los
+--     recalcula desde cero (carga inicial y corrección nocturna)
+--   - get_admin_metrics: todas las métricas en una llamada; los días
+--     aún no consolidados y los extremos parciales del rango se cuentan
+--     en vivo (rangos chicos sobre created_at)
+--   - Con pg_cron se programan ambos jobs; sin pg_cron hay que llamarlos
+--     desde un job externo (las métricas siguen siendo exactas, pero el
+--     tramo en vivo crece hasta la próxima consolidación)
+-- ==========================================================
+
+-- 1. Tablas
+CREATE TABLE IF NOT EXISTS public.admin_metrics_daily (
+  day date NOT NULL,
+  country text NOT NULL DEFAULT '',  -- '' = métricas sin país (conversaciones, turnos, paseos)
+  new_users int NOT NULL DEFAULT 0,
+  new_conversations int NOT NULL DEFAULT 0,
+  new_appointments int NOT NULL DEFAULT 0,
+  new_walks int NOT NULL DEFAULT 0,
+  PRIMARY KEY (day, country)
+);
+
+CREATE TABLE IF NOT EXISTS public.admin_metrics_totals (
+  metric text NOT NULL,
+  country text NOT NULL DEFAULT '',
+  value bigint NOT NULL DEFAULT 0,
+  PRIMARY KEY (metric, country)
+);
+
+-- Días anteriores a refreshed_through ya están consolidados
+CREATE TABLE IF NOT EXISTS public.admin_metrics_state (
+  id boolean PRIMARY KEY DEFAULT true CHECK (id),
+  refreshed_through date NOT NULL DEFAULT '1970-01-01'
+);
+
+INSERT INTO public.admin_metrics_state DEFAULT VALUES ON CONFLICT DO NOTHING;
+
+-- Solo accesibles a través de las funciones SECURITY DEFINER
+ALTER TABLE public.admin_metrics_daily ENABLE ROW LEVEL SECURITY;
+ALTER TABLE public.admin_metrics_totals ENABLE ROW LEVEL SECURITY;
+ALTER TABLE public.admin_metrics_state ENABLE ROW LEVEL SECURITY;
+
+-- 2. Totales mantenidos por triggers
+CREATE OR REPLACE FUNCTION public.bump_admin_metric(p_metric text, p_country text, p_delta bigint)
+RETURNS void AS $$
+  INSERT INTO public.admin_metrics_totals (metric, country, value)
+  VALUES (p_metric, coalesce(p_country, ''), p_delta)
+  ON CONFLICT (metric, country)
+  DO UPDATE SET value = public.admin_metrics_totals.value + excluded.value;
+$$ LANGUAGE sql SECURITY DEFINER;
+
+CREATE OR REPLACE FUNCTION track_profile_metrics()
+RETURNS trigger AS $$
+DECLARE
+  v_pets bigint;
+  v_providers bigint;
+BEGIN
+  IF tg_op IN ('UPDATE', 'DELETE') AND NOT old.is_deleted THEN
+    PERFORM public.bump_admin_metric('total_users', old.country, -1);
+  END IF;
+  IF tg_op IN ('INSERT', 'UPDATE') AND NOT new.is_deleted THEN
+    PERFORM public.bump_admin_metric('total_users', new.country, 1);
+  END IF;
+
+  -- Mascotas y proveedores se cuentan en el país de su dueño
+  IF tg_op = 'UPDATE' AND new.country IS DISTINCT FROM old.country THEN
+    SELECT count(*) INTO v_pets FROM public.pets WHERE owner_id = new.id AND NOT is_deleted;
+    SELECT count(*) INTO v_providers FROM public.providers WHERE profile_id = new.id AND active;
+
+    IF v_pets > 0 THEN
+      PERFORM public.bump_admin_metric('total_pets', old.country, -v_pets);
+      PERFORM public.bump_admin_metric('total_pets', new.country, v_pets);
+    END IF;
+    IF v_providers > 0 THEN
+      PERFORM public.bump_admin_metric('active_providers', old.country, -v_providers);
+      PERFORM public.bump_admin_metric('active_providers', new.country, v_providers);
+    END IF;
+  END IF;
+
+  RETURN NULL;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER;
+
+CREATE OR REPLACE FUNCTION track_pet_metrics()
+RETURNS trigger AS $$
+BEGIN
+  IF tg_op IN ('UPDATE', 'DELETE') AND NOT old.is_deleted THEN
+    PERFORM public.bump_admin_metric('total_pets', (SELECT country FROM public.profiles WHERE id = old.owner_id), -1);
+  END IF;
+  IF tg_op IN ('INSERT', 'UPDATE') AND NOT new.is_deleted THEN
+    PERFORM public.bump_admin_metric('total_pets', (SELECT country FROM public.profiles WHERE id = new.owner_id), 1);
+  END IF;
+  RETURN NULL;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER;
+
+CREATE OR REPLACE FUNCTION track_provider_metrics()
+RETURNS trigger AS $$
+BEGIN
+  IF tg_op IN ('UPDATE', 'DELETE') AND old.active THEN
+    PERFORM public.bump_admin_metric('active_providers', (SELECT country FROM public.profiles WHERE id = old.profile_id), -1);
+  END IF;
+  IF tg_op IN ('INSERT', 'UPDATE') AND new.active THEN
+    PERFORM public.bump_admin_metric('active_providers', (SELECT country FROM public.profiles WHERE id = new.profile_id), 1);
+  END IF;
+  RETURN NULL;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER;
+
+CREATE OR REPLACE FUNCTION track_lost_pet_report_metrics()
+RETURNS trigger AS $$
+BEGIN
+  IF tg_op IN ('UPDATE', 'DELETE') AND NOT old.found THEN
+    PERFORM public.bump_admin_metric('active_lost_pets', '', -1);
+  END IF;
+  IF tg_op IN ('INSERT', 'UPDATE') AND NOT new.found THEN
+    PERFORM public.bump_admin_metric('active_lost_pets', '', 1);
+  END IF;
+  RETURN NULL;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER;
+
+DROP TRIGGER IF EXISTS trg_profile_metrics ON public.profiles;
+CREATE TRIGGER trg_profile_metrics
+  AFTER INSERT OR DELETE OR UPDATE OF is_deleted, country ON public.profiles
+  FOR EACH ROW EXECUTE FUNCTION track_profile_metrics();
+
+DROP TRIGGER IF EXISTS trg_pet_metrics ON public.pets;
+CREATE TRIGGER trg_pet_metrics
+  AFTER INSERT OR DELETE OR UPDATE OF is_deleted, owner_id ON public.pets
+  FOR EACH ROW EXECUTE FUNCTION track_pet_metrics();
+
+DROP TRIGGER IF EXISTS trg_provider_metrics ON public.providers;
+CREATE TRIGGER trg_provider_metrics
+  AFTER INSERT OR DELETE OR UPDATE OF active, profile_id ON public.providers
+  FOR EACH ROW EXECUTE FUNCTION track_provider_metrics();
+
+DROP TRIGGER IF EXISTS trg_lost_pet_report_metrics ON public.lost_pet_reports;
+CREATE TRIGGER trg_lost_pet_report_metrics
+  AFTER INSERT OR DELETE OR UPDATE OF found ON public.lost_pet_reports
+  FOR EACH ROW EXECUTE FUNCTION track_lost_pet_report_metrics();
+
+-- 3. Recalcular totales desde cero
+-- Bloquea los triggers (y por lo tanto las escrituras sobre esas tablas)
+-- mientras cuenta: programar en horario de poco tráfico
+CREATE OR REPLACE FUNCTION public.reconcile_admin_metrics_totals()
+RETURNS void AS $$
+BEGIN
+  LOCK TABLE public.admin_metrics_totals IN EXCLUSIVE MODE;
+
+  DELETE FROM public.admin_metrics_totals;
+
+  INSERT INTO public.admin_metrics_totals (metric, country, value)
+  SELECT 'total_users', country, count(*)
+  FROM public.profiles
+  WHERE NOT is_deleted
+  GROUP BY country
+  UNION ALL
+  SELECT 'total_pets', coalesce(prof.country, ''), count(*)
+  FROM public.pets p
+  LEFT JOIN public.profiles prof ON prof.id = p.owner_id
+  WHERE NOT p.is_deleted
+  GROUP BY 2
+  UNION ALL
+  SELECT 'active_providers', coalesce(prof.country, ''), count(*)
+  FROM public.providers prov
+  LEFT JOIN public.profiles prof ON prof.id = prov.profile_id
+  WHERE prov.active
+  GROUP BY 2
+  UNION ALL
+  SELECT 'active_lost_pets', '', count(*)
+  FROM public.lost_pet_reports
+  WHERE NOT found;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER;
+
+-- 4. Consolidar días cerrados (UTC) desde refreshed_through (o p_from) hasta ayer
+CREATE OR REPLACE FUNCTION public.refresh_admin_metrics_daily(p_from date DEFAULT NULL)
+RETURNS date AS $$
+DECLARE
+  v_from date := coalesce(p_from, (SELECT refreshed_through FROM public.admin_metrics_state));
+  v_to date := (now() AT TIME ZONE 'UTC')::date;
+  v_from_ts timestamptz := v_from::timestamp AT TIME ZONE 'UTC';
+  v_to_ts timestamptz := v_to::timestamp AT TIME ZONE 'UTC';
+BEGIN
+  IF v_from >= v_to THEN
+    RETURN v_to;
+  END IF;
+
+  DELETE FROM public.admin_metrics_daily
+  WHERE day >= v_from AND day < v_to;
+
+  INSERT INTO public.admin_metrics_daily (day, country, new_users, new_conversations, new_appointments, new_walks)
+  SELECT day, country, sum(new_users), sum(new_conversations), sum(new_appointments), sum(new_walks)
+  FROM (
+    SELECT (created_at AT TIME ZONE 'UTC')::date AS day, country, 1 AS new_users, 0 AS new_conversations, 0 AS new_appointments, 0 AS new_walks
+    FROM public.profiles
+    WHERE created_at >= v_from_ts AND created_at < v_to_ts
+    UNION ALL
+    SELECT (created_at AT TIME ZONE 'UTC')::date, '', 0, 1, 0, 0
+    FROM public.conversations
+    WHERE created_at >= v_from_ts AND created_at < v_to_ts
+    UNION ALL
+    SELECT (created_at AT TIME ZONE 'UTC')::date, '', 0, 0, 1, 0
+    FROM public.appointments
+    WHERE created_at >= v_from_ts AND created_at < v_to_ts
+    UNION ALL
+    SELECT (created_at AT TIME ZONE 'UTC')::date, '', 0, 0, 0, 1
+    FROM public.walks
+    WHERE created_at >= v_from_ts AND created_at < v_to_ts
+  ) AS created
+  GROUP BY day, country;
+
+  UPDATE public.admin_metrics_state
+  SET refreshed_through = greatest(refreshed_through, v_to);
+
+  RETURN v_to;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER;
+
+-- 5. Altas en vivo para un tramo [p_from, p_to)
+CREATE OR REPLACE FUNCTION public.admin_metrics_live(p_from timestamptz, p_to timestamptz, p_country text DEFAULT NULL)
+RETURNS TABLE(new_users bigint, new_conversations bigint, new_appointments bigint, new_walks bigint) AS $$
+  SELECT
+    (SELECT count(*) FROM public.profiles
+     WHERE created_at >= p_from AND created_at < p_to AND (p_country IS NULL OR country = p_country)),
+    (SELECT count(*) FROM public.conversations WHERE created_at >= p_from AND created_at < p_to),
+    (SELECT count(*) FROM public.appointments WHERE created_at >= p_from AND created_at < p_to),
+    (SELECT count(*) FROM public.walks WHERE created_at >= p_from AND created_at < p_to);
+$$ LANGUAGE sql STABLE SECURITY DEFINER;
+
+-- 6. Métricas del panel (mismas claves que GET /api/admin/metrics)
+-- p_end es inclusivo, como el filtro lte() anterior.
+-- Conversaciones, turnos, paseos y reportes perdidos no se filtran por país.
+CREATE OR REPLACE FUNCTION public.get_admin_metrics(
+  p_start timestamptz,
+  p_end timestamptz,
+  p_country text DEFAULT NULL
+)
+RETURNS jsonb AS $$
+DECLARE
+  v_end timestamptz := p_end + interval '1 microsecond';
+  v_refreshed date := (SELECT refreshed_through FROM public.admin_metrics_state);
+  -- Días completos dentro del rango y ya consolidados: [v_first_day, v_last_day)
+  v_first_day date := ((p_start AT TIME ZONE 'UTC') + interval '1 day' - interval '1 microsecond')::date;
+  v_last_day date := least((v_end AT TIME ZONE 'UTC')::date, v_refreshed);
+  v_rolled record;
+  v_head record;
+  v_tail record;
+  v_totals record;
+BEGIN
+  IF v_first_day >= v_last_day THEN
+    -- Nada consolidado en el rango: todo en vivo
+    SELECT 0 AS new_users, 0 AS new_conversations, 0 AS new_appointments, 0 AS new_walks INTO v_rolled;
+    SELECT * INTO v_head FROM public.admin_metrics_live(p_start, v_end, p_country);
+    SELECT 0 AS new_users, 0 AS new_conversations, 0 AS new_appointments, 0 AS new_walks INTO v_tail;
+  ELSE
+    SELECT
+      coalesce(sum(new_users) FILTER (WHERE p_country IS NULL OR country = p_country), 0) AS new_users,
+      coalesce(sum(new_conversations), 0) AS new_conversations,
+      coalesce(sum(new_appointments), 0) AS new_appointments,
+      coalesce(sum(new_walks), 0) AS new_walks
+    INTO v_rolled
+    FROM public.admin_metrics_daily
+    WHERE day >= v_first_day AND day < v_last_day;
+
+    SELECT * INTO v_head FROM public.admin_metrics_live(p_start, v_first_day::timestamp AT TIME ZONE 'UTC', p_country);
+    SELECT * INTO v_tail FROM public.admin_metrics_live(v_last_day::timestamp AT TIME ZONE 'UTC', v_end, p_country);
+  END IF;
+
+  SELECT
+    coalesce(sum(value) FILTER (WHERE metric = 'total_users' AND (p_country IS NULL OR country = p_country)), 0) AS total_users,
+    coalesce(sum(value) FILTER (WHERE metric = 'total_pets' AND (p_country IS NULL OR country = p_country)), 0) AS total_pets,
+    coalesce(sum(value) FILTER (WHERE metric = 'active_providers' AND (p_country IS NULL OR country = p_country)), 0) AS active_providers,
+    coalesce(sum(value) FILTER (WHERE metric = 'active_lost_pets'), 0) AS active_lost_pets
+  INTO v_totals
+  FROM public.admin_metrics_totals;
+
+  RETURN jsonb_build_object(
+    'new_users', v_rolled.new_users + v_head.new_users + v_tail.new_users,
+    'total_users', v_totals.total_users,
+    'total_pets', v_totals.total_pets,
+    'new_conversations', v_rolled.new_conversations + v_head.new_conversations + v_tail.new_conversations,
+    'new_appointments', v_rolled.new_appointments + v_head.new_appointments + v_tail.new_appointments,
+    'active_providers', v_totals.active_providers,
+    'active_lost_pets', v_totals.active_lost_pets,
+    'total_walks', v_rolled.new_walks + v_head.new_walks + v_tail.new_walks,
+    'refreshed_through', v_refreshed
+  );
+END;
+$$ LANGUAGE plpgsql STABLE SECURITY DEFINER;
+
+-- Solo el BFF (service role) consulta o recalcula métricas
+REVOKE EXECUTE ON FUNCTION public.get_admin_metrics(timestamptz, timestamptz, text) FROM public, anon, authenticated;
+REVOKE EXECUTE ON FUNCTION public.admin_metrics_live(timestamptz, timestamptz, text) FROM public, anon, authenticated;
+REVOKE EXECUTE ON FUNCTION public.refresh_admin_metrics_daily(date) FROM public, anon, authenticated;
+REVOKE EXECUTE ON FUNCTION public.reconcile_admin_metrics_totals() FROM public, anon, authenticated;
+REVOKE EXECUTE ON FUNCTION public.bump_admin_metric(text, text, bigint) FROM public, anon, authenticated;
+
+-- 7. Carga inicial
+SELECT public.reconcile_admin_metrics_totals();
+SELECT public.refresh_admin_metrics_daily();
+
+-- 8. Jobs programados (si pg_cron está instalado)
+DO $$
+BEGIN
+  IF EXISTS (SELECT 1 FROM pg_extension WHERE extname = 'pg_cron') THEN
+    PERFORM cron.schedule('refresh-admin-metrics-daily', '10 * * * *', 'SELECT public.refresh_admin_metrics_daily()');
+    PERFORM cron.schedule('reconcile-admin-metrics-totals', '30 4 * * *', 'SELECT public.reconcile_admin_metrics_totals()');
+  END IF;
+END;
+$$;
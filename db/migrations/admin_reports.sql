@@ -0,0 +1,156 @@
+-- ==========================================================
+-- MIGRACIÓN: Reportes admin agregados en la base
+-- Descripción:
+--   - Vistas materializadas por (raza, país) y (vacuna, país): su tamaño
+--     depende de la cantidad de razas / vacunas / países, no de mascotas
+--   - refresh_admin_reports(): REFRESH CONCURRENTLY (pg_cron cada 15 min)
+--   - report_popular_breeds / report_vaccinations: GROUP BY, ORDER BY y
+--     LIMIT sobre las vistas; cada fila indica refreshed_at
+--   - report_top_providers: proveedores activos por rating (índice parcial)
+-- ==========================================================
+
+-- 1. Mascotas por raza y país del dueño
+CREATE MATERIALIZED VIEW IF NOT EXISTS public.admin_report_breeds AS
+SELECT
+  p.breed_id,
+  coalesce(prof.country, '') AS country,
+  b.name AS breed_name,
+  s.name AS species_name,
+  count(*) AS pet_count,
+  now() AS refreshed_at
+FROM public.pets p
+JOIN public.breeds b ON b.id = p.breed_id
+JOIN public.species s ON s.id = b.species_id
+LEFT JOIN public.profiles prof ON prof.id = p.owner_id
+WHERE NOT p.is_deleted
+GROUP BY p.breed_id, coalesce(prof.country, ''), b.name, s.name;
+
+CREATE UNIQUE INDEX IF NOT EXISTS idx_admin_report_breeds_key
+  ON public.admin_report_breeds(breed_id, country);
+
+-- 2. Vacunaciones por vacuna y país del dueño
+CREATE MATERIALIZED VIEW IF NOT EXISTS public.admin_report_vaccinations AS
+SELECT
+  pv.vaccine_id,
+  coalesce(prof.country, '') AS country,
+  v.name AS vaccine_name,
+  s.name AS species_name,
+  count(*) AS vaccination_count,
+  count(DISTINCT pv.pet_id) AS pet_count,
+  now() AS refreshed_at
+FROM public.pet_vaccinations pv
+JOIN public.vaccines v ON v.id = pv.vaccine_id
+LEFT JOIN public.species s ON s.id = v.species_id
+JOIN public.pets p ON p.id = pv.pet_id
+LEFT JOIN public.profiles prof ON prof.id = p.owner_id
+GROUP BY pv.vaccine_id, coalesce(prof.country, ''), v.name, s.name;
+
+CREATE UNIQUE INDEX IF NOT EXISTS idx_admin_report_vaccinations_key
+  ON public.admin_report_vaccinations(vaccine_id, country);
+
+-- Solo el BFF (service role) lee las vistas, a través de las funciones
+REVOKE ALL ON public.admin_report_breeds FROM anon, authenticated;
+REVOKE ALL ON public.admin_report_vaccinations FROM anon, authenticated;
+
+-- 3. Refresco sin bloquear lecturas
+CREATE OR REPLACE FUNCTION public.refresh_admin_reports()
+RETURNS void AS $$
+BEGIN
+  REFRESH MATERIALIZED VIEW CONCURRENTLY public.admin_report_breeds;
+  REFRESH MATERIALIZED VIEW CONCURRENTLY public.admin_report_vaccinations;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER;
+
+-- 4. Razas más populares (p_country NULL = todos los países)
+CREATE OR REPLACE FUNCTION public.report_popular_breeds(
+  p_limit int DEFAULT 20,
+  p_country text DEFAULT NULL
+)
+RETURNS TABLE(
+  breed_id uuid,
+  breed_name text,
+  species_name text,
+  pet_count bigint,
+  refreshed_at timestamptz
+) AS $$
+  SELECT r.breed_id, r.breed_name, r.species_name, sum(r.pet_count)::bigint, max(r.refreshed_at)
+  FROM public.admin_report_breeds r
+  WHERE p_country IS NULL OR r.country = p_country
+  GROUP BY r.breed_id, r.breed_name, r.species_name
+  ORDER BY 4 DESC, r.breed_id
+  LIMIT p_limit;
+$$ LANGUAGE sql STABLE SECURITY DEFINER;
+
+-- 5. Vacunaciones: total y vacunas más aplicadas
+CREATE OR REPLACE FUNCTION public.report_vaccinations(
+  p_limit int DEFAULT 20,
+  p_country text DEFAULT NULL
+)
+RETURNS jsonb AS $$
+  WITH per_vaccine AS (
+    SELECT
+      r.vaccine_id,
+      r.vaccine_name,
+      r.species_name,
+      sum(r.vaccination_count)::bigint AS vaccination_count,
+      sum(r.pet_count)::bigint AS pet_count,
+      max(r.refreshed_at) AS refreshed_at
+    FROM public.admin_report_vaccinations r
+    WHERE p_country IS NULL OR r.country = p_country
+    GROUP BY r.vaccine_id, r.vaccine_name, r.species_name
+  ),
+  top AS (
+    SELECT *
+    FROM per_vaccine
+    ORDER BY vaccination_count DESC, vaccine_id
+    LIMIT p_limit
+  )
+  SELECT jsonb_build_object(
+    'total_vaccinations', (SELECT coalesce(sum(vaccination_count), 0) FROM per_vaccine),
+    'refreshed_at', (SELECT max(refreshed_at) FROM per_vaccine),
+    'data', coalesce((
+      SELECT jsonb_agg(jsonb_build_object(
+        'vaccine_id', t.vaccine_id,
+        'vaccine', t.vaccine_name,
+        'species', t.species_name,
+        'count', t.vaccination_count,
+        'pets', t.pet_count
+      ) ORDER BY t.vaccination_count DESC, t.vaccine_id)
+      FROM top t
+    ), '[]'::jsonb)
+  );
+$$ LANGUAGE sql STABLE SECURITY DEFINER;
+
+-- 6. Proveedores activos mejor calificados (misma forma que antes: fila + profiles)
+CREATE INDEX IF NOT EXISTS idx_providers_active_rating
+  ON public.providers(rating DESC NULLS LAST, id)
+  WHERE active = true;
+
+CREATE OR REPLACE FUNCTION public.report_top_providers(
+  p_limit int DEFAULT 20,
+  p_country text DEFAULT NULL
+)
+RETURNS SETOF jsonb AS $$
+  SELECT (to_jsonb(prov) - 'earth_location' - 'geohash')
+    || jsonb_build_object('profiles', jsonb_build_object('full_name', prof.full_name, 'country', prof.country))
+  FROM public.providers prov
+  JOIN public.profiles prof ON prof.id = prov.profile_id
+  WHERE prov.active = true
+    AND (p_country IS NULL OR prof.country = p_country)
+  ORDER BY prov.rating DESC NULLS LAST, prov.id
+  LIMIT p_limit;
+$$ LANGUAGE sql STABLE SECURITY DEFINER;
+
+REVOKE EXECUTE ON FUNCTION public.refresh_admin_reports() FROM public, anon, authenticated;
+REVOKE EXECUTE ON FUNCTION public.report_popular_breeds(int, text) FROM public, anon, authenticated;
+REVOKE EXECUTE ON FUNCTION public.report_vaccinations(int, text) FROM public, anon, authenticated;
+REVOKE EXECUTE ON FUNCTION public.report_top_providers(int, text) FROM public, anon, authenticated;
+
+-- 7. Refresco programado (si pg_cron está instalado)
+DO $$
+BEGIN
+  IF EXISTS (SELECT 1 FROM pg_extension WHERE extname = 'pg_cron') THEN
+    PERFORM cron.schedule('refresh-admin-reports', '*/15 * * * *', 'SELECT public.refresh_admin_reports()');
+  END IF;
+END;
+$$;
@@ -0,0 +1,119 @@
+-- ==========================================================
+-- MIGRACIÓN: Bandeja de conversaciones en una sola consulta
+-- Descripción:
+--   - conversations.last_message_id / last_message_at desnormalizados
+--   - conversation_participants.unread_count por participante
+--   - Ambos mantenidos por triggers sobre messages (junto con updated_at).
+--     Los triggers son SECURITY DEFINER: actualizan filas de los otros
+--     participantes, que la RLS oculta al usuario que envía / lee
+--   - RPC get_inbox: sidebar completo (participantes, último mensaje,
+--     no leídos) en una llamada, con paginación keyset (updated_at, id)
+-- ==========================================================
+
+-- 1. Columnas desnormalizadas
+ALTER TABLE public.conversations
+  ADD COLUMN IF NOT EXISTS last_message_id uuid REFERENCES public.messages(id) ON DELETE SET NULL,
+  ADD COLUMN IF NOT EXISTS last_message_at timestamptz;
+
+ALTER TABLE public.conversation_participants
+  ADD COLUMN IF NOT EXISTS unread_count int NOT NULL DEFAULT 0;
+
+CREATE INDEX IF NOT EXISTS idx_conversations_updated_keyset
+  ON public.conversations(updated_at DESC, id DESC);
+
+-- 2. Nuevo mensaje: timestamp, último mensaje y no leídos de los demás participantes
+CREATE OR REPLACE FUNCTION update_conversation_timestamp()
+RETURNS trigger AS $$
+BEGIN
+  UPDATE public.conversations
+  SET updated_at = now(),
+      last_message_id = new.id,
+      last_message_at = new.created_at
+  WHERE id = new.conversation_id;
+
+  IF NOT new.is_read THEN
+    UPDATE public.conversation_participants
+    SET unread_count = unread_count + 1
+    WHERE conversation_id = new.conversation_id
+      AND profile_id <> new.sender_id;
+  END IF;
+
+  RETURN new;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER SET search_path = public;
+
+-- 3. Mensaje marcado como leído: descontar de los demás participantes
+CREATE OR REPLACE FUNCTION update_conversation_unread_count()
+RETURNS trigger AS $$
+BEGIN
+  UPDATE public.conversation_participants
+  SET unread_count = greatest(unread_count - 1, 0)
+  WHERE conversation_id = new.conversation_id
+    AND profile_id <> new.sender_id;
+
+  RETURN new;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER SET search_path = public;
+
+REVOKE EXECUTE ON FUNCTION update_conversation_timestamp() FROM public, anon, authenticated;
+REVOKE EXECUTE ON FUNCTION update_conversation_unread_count() FROM public, anon, authenticated;
+
+DROP TRIGGER IF EXISTS trg_update_conversation_unread ON public.messages;
+CREATE TRIGGER trg_update_conversation_unread
+  AFTER UPDATE OF is_read ON public.messages
+  FOR EACH ROW
+  WHEN (old.is_read = false AND new.is_read = true)
+  EXECUTE FUNCTION update_conversation_unread_count();
+
+-- 4. Backfill de datos existentes
+UPDATE public.conversations c
+SET last_message_id = m.id,
+    last_message_at = m.created_at
+FROM (
+  SELECT DISTINCT ON (conversation_id) id, conversation_id, created_at
+  FROM public.messages
+  ORDER BY conversation_id, created_at DESC
+) m
+WHERE m.conversation_id = c.id;
+
+UPDATE public.conversation_participants cp
+SET unread_count = coalesce((
+  SELECT count(*)
+  FROM public.messages m
+  WHERE m.conversation_id = cp.conversation_id
+    AND m.is_read = false
+    AND m.sender_id <> cp.profile_id
+), 0);
+
+-- 5. Sidebar de un usuario
+-- p_limit NULL devuelve todas las conversaciones; el cursor es el
+-- (updated_at, id) de la última fila de la página anterior
+CREATE OR REPLACE FUNCTION public.get_inbox(
+  p_profile_id uuid,
+  p_limit int DEFAULT NULL,
+  p_before_updated_at timestamptz DEFAULT NULL,
+  p_before_id uuid DEFAULT NULL
+)
+RETURNS SETOF jsonb AS $$
+  SELECT to_jsonb(c)
+    || jsonb_build_object(
+      'participants', (
+        SELECT coalesce(jsonb_agg(jsonb_build_object(
+          'profile_id', p.profile_id,
+          'profiles', jsonb_build_object('full_name', pr.full_name, 'photo_url', pr.photo_url)
+        )), '[]'::jsonb)
+        FROM public.conversation_participants p
+        JOIN public.profiles pr ON pr.id = p.profile_id
+        WHERE p.conversation_id = c.id
+      ),
+      'last_message', (SELECT to_jsonb(m) FROM public.messages m WHERE m.id = c.last_message_id),
+      'unread_count', me.unread_count
+    )
+  FROM public.conversation_participants me
+  JOIN public.conversations c ON c.id = me.conversation_id
+  WHERE me.profile_id = p_profile_id
+    AND me.hidden = false
+    AND (p_before_updated_at IS NULL OR (c.updated_at, c.id) < (p_before_updated_at, p_before_id))
+  ORDER BY c.updated_at DESC, c.id DESC
+  LIMIT p_limit;
+$$ LANGUAGE sql STABLE;
@@ -0,0 +1,89 @@
+-- ==========================================================
+-- MIGRACIÓN: Creación transaccional de reportes de mascotas perdidas
+-- Descripción:
+--   - create_lost_pet_report(): valida dueño, detecta reporte activo
+--     duplicado, inserta el reporte y sus imágenes en una sola llamada
+--   - La fila de la mascota se bloquea (FOR UPDATE): dos reportes
+--     simultáneos de la misma mascota se serializan y el segundo ve al
+--     primero, sin carrera entre el chequeo y el INSERT
+--   - Imágenes: URLs ya subidas por el BFF + copia de pet_images (si la
+--     tabla existe) cuando el dueño reporta su mascota como perdida
+--   - Errores: 42501 (no es tu mascota), P0002 (mascota no encontrada),
+--     P0001 (reporte activo duplicado)
+--   - Solo el BFF (service role) la ejecuta: confía en p_reporter_id
+-- ==========================================================
+
+-- 1. Función
+CREATE OR REPLACE FUNCTION public.create_lost_pet_report(
+  p_id uuid,
+  p_reporter_id uuid,
+  p_report_type text,
+  p_description text,
+  p_pet_id uuid DEFAULT NULL,
+  p_species_id uuid DEFAULT NULL,
+  p_breed_id uuid DEFAULT NULL,
+  p_contact_phone text DEFAULT NULL,
+  p_last_seen_at timestamptz DEFAULT NULL,
+  p_latitude numeric DEFAULT NULL,
+  p_longitude numeric DEFAULT NULL,
+  p_image_urls text[] DEFAULT '{}'
+)
+RETURNS jsonb AS $$
+DECLARE
+  v_owner_id uuid;
+  v_report public.lost_pet_reports;
+  v_copied text[] := '{}';
+BEGIN
+  IF p_pet_id IS NOT NULL THEN
+    -- Bloquea la mascota hasta el fin de la transacción
+    SELECT owner_id INTO v_owner_id
+    FROM public.pets
+    WHERE id = p_pet_id
+    FOR UPDATE;
+
+    IF NOT FOUND THEN
+      RAISE EXCEPTION 'Mascota no encontrada' USING ERRCODE = 'P0002';
+    END IF;
+
+    IF v_owner_id IS DISTINCT FROM p_reporter_id THEN
+      RAISE EXCEPTION 'Not your pet' USING ERRCODE = '42501';
+    END IF;
+
+    IF EXISTS (
+      SELECT 1 FROM public.lost_pet_reports
+      WHERE pet_id = p_pet_id
+        AND found = false
+    ) THEN
+      RAISE EXCEPTION 'Esta mascota ya tiene un reporte activo de pérdida';
+    END IF;
+  END IF;
+
+  INSERT INTO public.lost_pet_reports (
+    id, reporter_id, report_type, description, pet_id, species_id, breed_id,
+    contact_phone, last_seen_at, latitude, longitude, found
+  )
+  VALUES (
+    p_id, p_reporter_id, p_report_type, p_description, p_pet_id, p_species_id, p_breed_id,
+    p_contact_phone, p_last_seen_at, p_latitude, p_longitude, false
+  )
+  RETURNING * INTO v_report;
+
+  -- Reporte de la propia mascota perdida: copiar sus imágenes
+  IF p_pet_id IS NOT NULL AND p_report_type = 'lost' AND to_regclass('public.pet_images') IS NOT NULL THEN
+    EXECUTE 'SELECT coalesce(array_agg(image_url), ''{}'') FROM public.pet_images WHERE pet_id = $1'
+      INTO v_copied
+      USING p_pet_id;
+  END IF;
+
+  INSERT INTO public.lost_pet_images (report_id, image_url)
+  SELECT p_id, url
+  FROM unnest(coalesce(p_image_urls, '{}') || v_copied) AS url;
+
+  RETURN (to_jsonb(v_report) - 'earth_location' - 'geohash')
+    || jsonb_build_object('images', to_jsonb(coalesce(p_image_urls, '{}') || v_copied));
+END;
+$$ LANGUAGE plpgsql;
+
+REVOKE EXECUTE ON FUNCTION public.create_lost_pet_report(
+  uuid, uuid, text, text, uuid, uuid, uuid, text, timestamptz, numeric, numeric, text[]
+) FROM public, anon, authenticated;
@@ -0,0 +1,298 @@
+-- ==========================================================
+-- MIGRACIÓN: Celdas geohash para búsquedas "cercanos"
+-- Requiere: lost_pets_geo_search.sql, provider_services_search.sql
+-- Descripción:
+--   - geohash_encode(): mismo algoritmo que backend/utils/geo.py
+--   - Columna geohash (precisión 8) en providers y lost_pet_reports,
+--     mantenida por trigger e indexada (text_pattern_ops)
+--   - find_nearby_providers / find_nearby_lost_pets reciben p_cells:
+--     prefijos geohash que cubren el radio (calculados en el BFF); solo
+--     se calcula la distancia exacta para filas dentro de esas celdas
+--   - Prefijo con ~>=~ / ~<~ (operadores de text_pattern_ops): el índice
+--     sirve con cualquier collation y sin depender del orden de '~';
+--     las celdas se deduplican (repetidas o prefijo de otra) para que
+--     una fila no aparezca dos veces
+--   - El prefiltro earth_box (índice GiST) se mantiene siempre; p_cells
+--     NULL usa solo earth_box (comportamiento anterior)
+-- ==========================================================
+
+-- 1. Codificación geohash
+CREATE OR REPLACE FUNCTION public.geohash_encode(
+  p_latitude numeric,
+  p_longitude numeric,
+  p_precision int DEFAULT 8
+)
+RETURNS text AS $$
+DECLARE
+  v_base32 constant text := '0123456789bcdefghjkmnpqrstuvwxyz';
+  v_lat_min float8 := -90;
+  v_lat_max float8 := 90;
+  v_lon_min float8 := -180;
+  v_lon_max float8 := 180;
+  v_mid float8;
+  v_result text := '';
+  v_bits int := 0;
+  v_value int := 0;
+  v_even boolean := true;
+BEGIN
+  IF p_latitude IS NULL OR p_longitude IS NULL THEN
+    RETURN NULL;
+  END IF;
+
+  WHILE length(v_result) < p_precision LOOP
+    IF v_even THEN
+      v_mid := (v_lon_min + v_lon_max) / 2;
+      IF p_longitude >= v_mid THEN
+        v_value := v_value * 2 + 1;
+        v_lon_min := v_mid;
+      ELSE
+        v_value := v_value * 2;
+        v_lon_max := v_mid;
+      END IF;
+    ELSE
+      v_mid := (v_lat_min + v_lat_max) / 2;
+      IF p_latitude >= v_mid THEN
+        v_value := v_value * 2 + 1;
+        v_lat_min := v_mid;
+      ELSE
+        v_value := v_value * 2;
+        v_lat_max := v_mid;
+      END IF;
+    END IF;
+
+    v_even := NOT v_even;
+    v_bits := v_bits + 1;
+    IF v_bits = 5 THEN
+      v_result := v_result || substr(v_base32, v_value + 1, 1);
+      v_bits := 0;
+      v_value := 0;
+    END IF;
+  END LOOP;
+
+  RETURN v_result;
+END;
+$$ LANGUAGE plpgsql IMMUTABLE;
+
+-- 2. Columna geohash mantenida por trigger
+ALTER TABLE public.providers ADD COLUMN IF NOT EXISTS geohash text;
+ALTER TABLE public.lost_pet_reports ADD COLUMN IF NOT EXISTS geohash text;
+
+CREATE OR REPLACE FUNCTION set_geohash()
+RETURNS trigger AS $$
+BEGIN
+  new.geohash := public.geohash_encode(new.latitude, new.longitude, 8);
+  RETURN new;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_provider_geohash ON public.providers;
+CREATE TRIGGER trg_provider_geohash
+  BEFORE INSERT OR UPDATE OF latitude, longitude ON public.providers
+  FOR EACH ROW EXECUTE FUNCTION set_geohash();
+
+DROP TRIGGER IF EXISTS trg_lost_pet_report_geohash ON public.lost_pet_reports;
+CREATE TRIGGER trg_lost_pet_report_geohash
+  BEFORE INSERT OR UPDATE OF latitude, longitude ON public.lost_pet_reports
+  FOR EACH ROW EXECUTE FUNCTION set_geohash();
+
+UPDATE public.providers
+SET geohash = public.geohash_encode(latitude, longitude, 8)
+WHERE latitude IS NOT NULL AND longitude IS NOT NULL;
+
+UPDATE public.lost_pet_reports
+SET geohash = public.geohash_encode(latitude, longitude, 8)
+WHERE latitude IS NOT NULL AND longitude IS NOT NULL;
+
+-- 3. Índices por prefijo (rango geohash ~>=~ celda AND geohash ~<~ celda || '~')
+-- En text_pattern_ops la comparación es byte a byte: '~' (0x7E) es mayor que
+-- todos los caracteres base32, así que el rango cubre exactamente el prefijo
+CREATE INDEX IF NOT EXISTS idx_providers_geohash
+  ON public.providers(geohash text_pattern_ops)
+  WHERE active = true;
+
+CREATE INDEX IF NOT EXISTS idx_lost_pet_reports_geohash
+  ON public.lost_pet_reports(geohash text_pattern_ops)
+  WHERE found = false;
+
+-- 4. Celdas sin repetir ni solapar: quita duplicados y celdas contenidas en otra
+CREATE OR REPLACE FUNCTION public.geohash_leaf_cells(p_cells text[])
+RETURNS SETOF text AS $$
+  SELECT DISTINCT c.cell
+  FROM unnest(p_cells) AS c(cell)
+  WHERE NOT EXISTS (
+    SELECT 1
+    FROM unnest(p_cells) AS o(cell)
+    WHERE o.cell <> c.cell
+      AND c.cell ~>=~ o.cell
+      AND c.cell ~<~ o.cell || '~'
+  );
+$$ LANGUAGE sql IMMUTABLE;
+
+-- 5. Proveedores cercanos con prefiltro por celdas
+DROP FUNCTION IF EXISTS public.find_nearby_providers(numeric, numeric, numeric, text);
+
+CREATE OR REPLACE FUNCTION public.find_nearby_providers(
+  p_latitude numeric,
+  p_longitude numeric,
+  p_radius_km numeric DEFAULT 10,
+  p_service_type text DEFAULT NULL,
+  p_cells text[] DEFAULT NULL
+)
+RETURNS TABLE(
+  provider_id uuid,
+  profile_id uuid,
+  full_name text,
+  service_type text,
+  description text,
+  address text,
+  rating numeric,
+  rating_count int,
+  distance_km numeric,
+  latitude numeric,
+  longitude numeric
+) AS $$
+BEGIN
+  IF p_cells IS NULL THEN
+    RETURN QUERY
+    SELECT
+      prov.id,
+      prov.profile_id,
+      prof.full_name,
+      prov.service_type,
+      prov.description,
+      prov.address,
+      prov.rating,
+      prov.rating_count,
+      round((earth_distance(ll_to_earth(p_latitude, p_longitude), prov.earth_location) / 1000.0)::numeric, 2) AS distance_km,
+      prov.latitude,
+      prov.longitude
+    FROM public.providers prov
+    INNER JOIN public.profiles prof ON prof.id = prov.profile_id
+    WHERE prov.active = true
+      AND (p_service_type IS NULL OR prov.service_type = p_service_type)
+      AND earth_box(ll_to_earth(p_latitude, p_longitude), p_radius_km * 1000) @> prov.earth_location
+      AND earth_distance(ll_to_earth(p_latitude, p_longitude), prov.earth_location) <= p_radius_km * 1000
+    ORDER BY 9;
+    RETURN;
+  END IF;
+
+  -- Una fila cae en una sola celda hoja: el join no duplica
+  RETURN QUERY
+  SELECT
+    prov.id,
+    prov.profile_id,
+    prof.full_name,
+    prov.service_type,
+    prov.description,
+    prov.address,
+    prov.rating,
+    prov.rating_count,
+    round((earth_distance(ll_to_earth(p_latitude, p_longitude), prov.earth_location) / 1000.0)::numeric, 2) AS distance_km,
+    prov.latitude,
+    prov.longitude
+  FROM public.geohash_leaf_cells(p_cells) AS cell
+  JOIN public.providers prov
+    ON prov.geohash ~>=~ cell AND prov.geohash ~<~ cell || '~'
+  INNER JOIN public.profiles prof ON prof.id = prov.profile_id
+  WHERE prov.active = true
+    AND (p_service_type IS NULL OR prov.service_type = p_service_type)
+    AND earth_box(ll_to_earth(p_latitude, p_longitude), p_radius_km * 1000) @> prov.earth_location
+    AND earth_distance(ll_to_earth(p_latitude, p_longitude), prov.earth_location) <= p_radius_km * 1000
+  ORDER BY 9;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER;
+
+-- 6. Mascotas perdidas cercanas con prefiltro por celdas
+DROP FUNCTION IF EXISTS public.find_nearby_lost_pets(numeric, numeric, numeric, uuid, int, int);
+
+CREATE OR REPLACE FUNCTION public.find_nearby_lost_pets(
+  p_latitude numeric,
+  p_longitude numeric,
+  p_radius_km numeric DEFAULT 10,
+  p_species_id uuid DEFAULT NULL,
+  p_limit int DEFAULT NULL,
+  p_offset int DEFAULT 0,
+  p_cells text[] DEFAULT NULL
+)
+RETURNS TABLE(
+  report_id uuid,
+  pet_id uuid,
+  pet_name text,
+  species_name text,
+  breed_name text,
+  description text,
+  contact_phone text,
+  last_seen_at timestamptz,
+  distance_km numeric,
+  latitude numeric,
+  longitude numeric,
+  images jsonb
+) AS $$
+BEGIN
+  IF p_cells IS NULL THEN
+    RETURN QUERY
+    SELECT
+      lpr.id,
+      lpr.pet_id,
+      p.name,
+      s.name,
+      b.name,
+      lpr.description,
+      lpr.contact_phone,
+      lpr.last_seen_at,
+      round((earth_distance(ll_to_earth(p_latitude, p_longitude), lpr.earth_location) / 1000.0)::numeric, 2) AS distance_km,
+      lpr.latitude,
+      lpr.longitude,
+      (
+        SELECT jsonb_agg(jsonb_build_object('url', image_url))
+        FROM public.lost_pet_images
+        WHERE lost_pet_images.report_id = lpr.id
+      ) AS images
+    FROM public.lost_pet_reports lpr
+    LEFT JOIN public.pets p ON p.id = lpr.pet_id
+    LEFT JOIN public.species s ON s.id = coalesce(lpr.species_id, p.species_id)
+    LEFT JOIN public.breeds b ON b.id = coalesce(lpr.breed_id, p.breed_id)
+    WHERE lpr.found = false
+      AND earth_box(ll_to_earth(p_latitude, p_longitude), p_radius_km * 1000) @> lpr.earth_location
+      AND earth_distance(ll_to_earth(p_latitude, p_longitude), lpr.earth_location) <= p_radius_km * 1000
+      AND (p_species_id IS NULL OR coalesce(lpr.species_id, p.species_id) = p_species_id)
+    ORDER BY 9
+    LIMIT p_limit
+    OFFSET p_offset;
+    RETURN;
+  END IF;
+
+  -- Una fila cae en una sola celda hoja: el join no duplica
+  RETURN QUERY
+  SELECT
+    lpr.id,
+    lpr.pet_id,
+    p.name,
+    s.name,
+    b.name,
+    lpr.description,
+    lpr.contact_phone,
+    lpr.last_seen_at,
+    round((earth_distance(ll_to_earth(p_latitude, p_longitude), lpr.earth_location) / 1000.0)::numeric, 2) AS distance_km,
+    lpr.latitude,
+    lpr.longitude,
+    (
+      SELECT jsonb_agg(jsonb_build_object('url', image_url))
+      FROM public.lost_pet_images
+      WHERE lost_pet_images.report_id = lpr.id
+    ) AS images
+  FROM public.geohash_leaf_cells(p_cells) AS cell
+  JOIN public.lost_pet_reports lpr
+    ON lpr.geohash ~>=~ cell AND lpr.geohash ~<~ cell || '~'
+  LEFT JOIN public.pets p ON p.id = lpr.pet_id
+  LEFT JOIN public.species s ON s.id = coalesce(lpr.species_id, p.species_id)
+  LEFT JOIN public.breeds b ON b.id = coalesce(lpr.breed_id, p.breed_id)
+  WHERE lpr.found = false
+    AND earth_box(ll_to_earth(p_latitude, p_longitude), p_radius_km * 1000) @> lpr.earth_location
+    AND earth_distance(ll_to_earth(p_latitude, p_longitude), lpr.earth_location) <= p_radius_km * 1000
+    AND (p_species_id IS NULL OR coalesce(lpr.species_id, p.species_id) = p_species_id)
+  ORDER BY 9
+  LIMIT p_limit
+  OFFSET p_offset;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER;
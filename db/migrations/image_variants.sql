@@ -0,0 +1,103 @@
+-- ==========================================================
+-- MIGRACIÓN: Variantes de imagen (thumb / medium)
+-- Requiere: lost_pets_geo_search.sql
+-- Descripción:
+--   - pets.photo_variants y lost_pet_images.variants: jsonb
+--     {"thumb": url, "medium": url}, escritas por el BFF en segundo plano
+--     (backend/utils/images.py) cuando termina de generar las variantes
+--   - NULL mientras no existan: los listados usan la imagen original
+--   - breeding_public expone photo_variants y photo_thumb_url
+--   - search_lost_pets_nearby incluye pet.photo_variants
+-- ==========================================================
+
+-- 1. Columnas de variantes
+ALTER TABLE public.pets
+  ADD COLUMN IF NOT EXISTS photo_variants jsonb;
+
+ALTER TABLE public.lost_pet_images
+  ADD COLUMN IF NOT EXISTS variants jsonb;
+
+-- Las variantes se registran por URL de la imagen original
+CREATE INDEX IF NOT EXISTS idx_lost_pet_images_image_url
+  ON public.lost_pet_images(image_url);
+
+-- 2. Vista pública de cruces con miniatura (columnas nuevas al final)
+CREATE OR REPLACE VIEW public.breeding_public AS
+SELECT
+  p.id AS pet_id,
+  p.name,
+  p.photo_url,
+  p.species_id,
+  s.name AS species_name,
+  p.breed_id,
+  b.name AS breed_name,
+  p.has_pedigree,
+  p.sex,
+  p.dnia,
+  date_part('year', age(p.birth_date)) AS age_years,
+  p.owner_id,
+  prof.city,
+  prof.country,
+  p.photo_variants,
+  coalesce(p.photo_variants->>'thumb', p.photo_url) AS photo_thumb_url
+FROM public.pets p
+INNER JOIN public.species s ON s.id = p.species_id
+INNER JOIN public.breeds b ON b.id = p.breed_id
+INNER JOIN public.profiles prof ON prof.id = p.owner_id
+WHERE p.crossable = true
+  AND p.is_deleted = false
+  AND prof.is_deleted = false
+  AND p.birth_date < current_date - interval '1 year'; -- Min 1 año
+
+-- 3. Búsqueda por radio: misma función, con pet.photo_variants
+CREATE OR REPLACE FUNCTION public.search_lost_pets_nearby(
+  p_latitude numeric,
+  p_longitude numeric,
+  p_radius_km numeric,
+  p_species_id uuid DEFAULT NULL,
+  p_breed_id uuid DEFAULT NULL,
+  p_order text DEFAULT 'recent',
+  p_limit int DEFAULT 20,
+  p_offset int DEFAULT 0
+)
+RETURNS SETOF jsonb AS $$
+  WITH origin AS (
+    SELECT ll_to_earth(p_latitude, p_longitude) AS point
+  ),
+  matches AS (
+    SELECT
+      lpr.*,
+      round((earth_distance(o.point, lpr.earth_location) / 1000.0)::numeric, 2) AS distance_km
+    FROM public.lost_pet_reports lpr, origin o
+    WHERE lpr.found = false
+      AND earth_box(o.point, p_radius_km * 1000) @> lpr.earth_location
+      AND earth_distance(o.point, lpr.earth_location) <= p_radius_km * 1000
+      AND (p_species_id IS NULL OR lpr.species_id = p_species_id)
+      AND (p_breed_id IS NULL OR lpr.breed_id = p_breed_id)
+  )
+  SELECT (to_jsonb(m) - 'earth_location' - 'geohash')
+    || jsonb_build_object(
+      'species', (SELECT jsonb_build_object('name', s.name) FROM public.species s WHERE s.id = m.species_id),
+      'breeds', (SELECT jsonb_build_object('name', b.name) FROM public.breeds b WHERE b.id = m.breed_id),
+      'pet', (
+        SELECT jsonb_build_object(
+          'name', p.name,
+          'dnia', p.dnia,
+          'photo_url', p.photo_url,
+          'photo_variants', p.photo_variants,
+          'species', (SELECT jsonb_build_object('name', ps.name) FROM public.species ps WHERE ps.id = p.species_id),
+          'breed', (SELECT jsonb_build_object('name', pb.name) FROM public.breeds pb WHERE pb.id = p.breed_id)
+        )
+        FROM public.pets p
+        WHERE p.id = m.pet_id
+      ),
+      'total_count', count(*) OVER ()
+    )
+  FROM matches m
+  ORDER BY
+    CASE WHEN p_order = 'distance' THEN m.distance_km END,
+    m.created_at DESC,
+    m.id DESC
+  LIMIT p_limit
+  OFFSET p_offset;
+$$ LANGUAGE sql STABLE;
@@ -0,0 +1,36 @@
+-- ==========================================================
+-- MIGRACIÓN: Índices para paginación keyset (?cursor=)
+-- Descripción:
+--   - Los listados ordenan por (clave de orden, id) y filtran por cursor
+--   - Cada índice cubre el filtro del endpoint + el orden, para que la
+--     página N cueste lo mismo que la página 1
+--   - breeding_public ordena por una edad calculada (vista): sin índice
+-- ==========================================================
+
+-- pets.get_my_pets
+CREATE INDEX IF NOT EXISTS idx_pets_owner_keyset
+  ON public.pets(owner_id, created_at DESC, id DESC)
+  WHERE is_deleted = false;
+
+-- notifications.get_notifications
+CREATE INDEX IF NOT EXISTS idx_notifications_profile_keyset
+  ON public.notifications(profile_id, created_at DESC, id DESC);
+
+-- appointments.get_appointments
+CREATE INDEX IF NOT EXISTS idx_appointments_user_keyset
+  ON public.appointments(user_id, scheduled_at, id);
+
+-- admin.get_users
+CREATE INDEX IF NOT EXISTS idx_profiles_keyset
+  ON public.profiles(created_at DESC, id DESC)
+  WHERE is_deleted = false;
+
+-- conversations.get_messages
+CREATE INDEX IF NOT EXISTS idx_messages_conversation_keyset
+  ON public.messages(conversation_id, created_at DESC, id DESC);
+
+-- walks.get_walks (paseador / dueño)
+CREATE INDEX IF NOT EXISTS idx_walks_walker_keyset
+  ON public.walks(walker_id, created_at DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_walks_pet_keyset
+  ON public.walks(pet_id, created_at DESC, id DESC);
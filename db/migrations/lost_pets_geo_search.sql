@@ -0,0 +1,153 @@
+-- ==========================================================
+-- MIGRACIÓN: Búsqueda por radio de mascotas perdidas en la base
+-- Descripción:
+--   - lost_pet_reports.earth_location (earthdistance) mantenida por trigger
+--     (ll_to_earth no es IMMUTABLE, así que no se indexa la expresión)
+--   - Índice GiST sobre los reportes activos
+--   - Prefiltro earth_box (usa el índice) + distancia exacta
+--   - search_lost_pets_nearby: misma forma que GET /api/lost-pets, con
+--     paginación y orden por fecha o distancia en la base
+--   - find_nearby_lost_pets: mismo prefiltro, p_limit / p_offset opcionales
+-- ==========================================================
+
+-- 1. Ubicación como punto earthdistance
+ALTER TABLE public.lost_pet_reports
+  ADD COLUMN IF NOT EXISTS earth_location earth;
+
+CREATE OR REPLACE FUNCTION set_lost_pet_report_earth_location()
+RETURNS trigger AS $$
+BEGIN
+  IF new.latitude IS NOT NULL AND new.longitude IS NOT NULL THEN
+    new.earth_location := ll_to_earth(new.latitude, new.longitude);
+  ELSE
+    new.earth_location := NULL;
+  END IF;
+  RETURN new;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_lost_pet_report_earth_location ON public.lost_pet_reports;
+CREATE TRIGGER trg_lost_pet_report_earth_location
+  BEFORE INSERT OR UPDATE OF latitude, longitude ON public.lost_pet_reports
+  FOR EACH ROW EXECUTE FUNCTION set_lost_pet_report_earth_location();
+
+UPDATE public.lost_pet_reports
+SET earth_location = ll_to_earth(latitude, longitude)
+WHERE latitude IS NOT NULL AND longitude IS NOT NULL;
+
+-- 2. Índice espacial (solo reportes activos)
+CREATE INDEX IF NOT EXISTS idx_lost_pet_reports_earth
+  ON public.lost_pet_reports USING gist (earth_location)
+  WHERE found = false;
+
+-- 3. Búsqueda paginada para GET /api/lost-pets?latitude=&longitude=&radius_km=
+-- p_order: 'recent' (más nuevos primero) o 'distance'
+-- Cada fila incluye total_count (total de coincidencias, antes de paginar)
+CREATE OR REPLACE FUNCTION public.search_lost_pets_nearby(
+  p_latitude numeric,
+  p_longitude numeric,
+  p_radius_km numeric,
+  p_species_id uuid DEFAULT NULL,
+  p_breed_id uuid DEFAULT NULL,
+  p_order text DEFAULT 'recent',
+  p_limit int DEFAULT 20,
+  p_offset int DEFAULT 0
+)
+RETURNS SETOF jsonb AS $$
+  WITH origin AS (
+    SELECT ll_to_earth(p_latitude, p_longitude) AS point
+  ),
+  matches AS (
+    SELECT
+      lpr.*,
+      round((earth_distance(o.point, lpr.earth_location) / 1000.0)::numeric, 2) AS distance_km
+    FROM public.lost_pet_reports lpr, origin o
+    WHERE lpr.found = false
+      AND earth_box(o.point, p_radius_km * 1000) @> lpr.earth_location
+      AND earth_distance(o.point, lpr.earth_location) <= p_radius_km * 1000
+      AND (p_species_id IS NULL OR lpr.species_id = p_species_id)
+      AND (p_breed_id IS NULL OR lpr.breed_id = p_breed_id)
+  )
+  SELECT (to_jsonb(m) - 'earth_location')
+    || jsonb_build_object(
+      'species', (SELECT jsonb_build_object('name', s.name) FROM public.species s WHERE s.id = m.species_id),
+      'breeds', (SELECT jsonb_build_object('name', b.name) FROM public.breeds b WHERE b.id = m.breed_id),
+      'pet', (
+        SELECT jsonb_build_object(
+          'name', p.name,
+          'dnia', p.dnia,
+          'photo_url', p.photo_url,
+          'species', (SELECT jsonb_build_object('name', ps.name) FROM public.species ps WHERE ps.id = p.species_id),
+          'breed', (SELECT jsonb_build_object('name', pb.name) FROM public.breeds pb WHERE pb.id = p.breed_id)
+        )
+        FROM public.pets p
+        WHERE p.id = m.pet_id
+      ),
+      'total_count', count(*) OVER ()
+    )
+  FROM matches m
+  ORDER BY
+    CASE WHEN p_order = 'distance' THEN m.distance_km END,
+    m.created_at DESC,
+    m.id DESC
+  LIMIT p_limit
+  OFFSET p_offset;
+$$ LANGUAGE sql STABLE;
+
+-- 4. find_nearby_lost_pets con prefiltro espacial y paginación opcional
+DROP FUNCTION IF EXISTS public.find_nearby_lost_pets(numeric, numeric, numeric, uuid);
+
+CREATE OR REPLACE FUNCTION public.find_nearby_lost_pets(
+  p_latitude numeric,
+  p_longitude numeric,
+  p_radius_km numeric DEFAULT 10,
+  p_species_id uuid DEFAULT NULL,
+  p_limit int DEFAULT NULL,
+  p_offset int DEFAULT 0
+)
+RETURNS TABLE(
+  report_id uuid,
+  pet_id uuid,
+  pet_name text,
+  species_name text,
+  breed_name text,
+  description text,
+  contact_phone text,
+  last_seen_at timestamptz,
+  distance_km numeric,
+  latitude numeric,
+  longitude numeric,
+  images jsonb
+) AS $$
+BEGIN
+  RETURN QUERY
+  SELECT
+    lpr.id,
+    lpr.pet_id,
+    p.name,
+    s.name,
+    b.name,
+    lpr.description,
+    lpr.contact_phone,
+    lpr.last_seen_at,
+    round((earth_distance(ll_to_earth(p_latitude, p_longitude), lpr.earth_location) / 1000.0)::numeric, 2) AS distance_km,
+    lpr.latitude,
+    lpr.longitude,
+    (
+      SELECT jsonb_agg(jsonb_build_object('url', image_url))
+      FROM public.lost_pet_images
+      WHERE lost_pet_images.report_id = lpr.id
+    ) AS images
+  FROM public.lost_pet_reports lpr
+  LEFT JOIN public.pets p ON p.id = lpr.pet_id
+  LEFT JOIN public.species s ON s.id = coalesce(lpr.species_id, p.species_id)
+  LEFT JOIN public.breeds b ON b.id = coalesce(lpr.breed_id, p.breed_id)
+  WHERE lpr.found = false
+    AND earth_box(ll_to_earth(p_latitude, p_longitude), p_radius_km * 1000) @> lpr.earth_location
+    AND earth_distance(ll_to_earth(p_latitude, p_longitude), lpr.earth_location) <= p_radius_km * 1000
+    AND (p_species_id IS NULL OR coalesce(lpr.species_id, p.species_id) = p_species_id)
+  ORDER BY 9
+  LIMIT p_limit
+  OFFSET p_offset;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER;
@@ -0,0 +1,120 @@
+-- ==========================================================
+-- MIGRACIÓN: Búsqueda de servicios con filtros y distancia en la base
+-- Descripción:
+--   - providers.earth_location (earthdistance) mantenida por trigger + GiST
+--   - search_provider_services: categoría, tipo de servicio, texto y radio
+--     en una sola consulta, ordenada por distancia, con paginación opcional
+--   - Devuelve la misma forma que GET /api/services/search
+-- ==========================================================
+
+-- 1. Ubicación de proveedores como punto earthdistance
+ALTER TABLE public.providers
+  ADD COLUMN IF NOT EXISTS earth_location earth;
+
+CREATE OR REPLACE FUNCTION set_provider_earth_location()
+RETURNS trigger AS $$
+BEGIN
+  IF new.latitude IS NOT NULL AND new.longitude IS NOT NULL THEN
+    new.earth_location := ll_to_earth(new.latitude, new.longitude);
+  ELSE
+    new.earth_location := NULL;
+  END IF;
+  RETURN new;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_provider_earth_location ON public.providers;
+CREATE TRIGGER trg_provider_earth_location
+  BEFORE INSERT OR UPDATE OF latitude, longitude ON public.providers
+  FOR EACH ROW EXECUTE FUNCTION set_provider_earth_location();
+
+UPDATE public.providers
+SET earth_location = ll_to_earth(latitude, longitude)
+WHERE latitude IS NOT NULL AND longitude IS NOT NULL;
+
+CREATE INDEX IF NOT EXISTS idx_providers_earth
+  ON public.providers USING gist (earth_location)
+  WHERE active = true;
+
+-- 2. Búsqueda de servicios
+-- Sin coordenadas del usuario no se filtra ni ordena por distancia.
+-- Con coordenadas, los proveedores sin ubicación se incluyen al final (distance null).
+-- Cada fila incluye total_count (total de coincidencias, antes de paginar)
+CREATE OR REPLACE FUNCTION public.search_provider_services(
+  p_latitude numeric DEFAULT NULL,
+  p_longitude numeric DEFAULT NULL,
+  p_max_distance_km numeric DEFAULT 50,
+  p_categories text[] DEFAULT NULL,
+  p_service_type_ids uuid[] DEFAULT NULL,
+  p_query text DEFAULT NULL,
+  p_limit int DEFAULT NULL,
+  p_offset int DEFAULT 0
+)
+RETURNS SETOF jsonb AS $$
+  WITH origin AS (
+    SELECT CASE
+      WHEN p_latitude IS NOT NULL AND p_longitude IS NOT NULL THEN ll_to_earth(p_latitude, p_longitude)
+    END AS point
+  ),
+  matches AS (
+    SELECT
+      ps,
+      st,
+      prov,
+      prof,
+      CASE
+        WHEN o.point IS NOT NULL AND prov.earth_location IS NOT NULL
+          THEN round((earth_distance(o.point, prov.earth_location) / 1000.0)::numeric, 1)
+      END AS distance
+    FROM public.provider_services ps
+    JOIN public.providers prov ON prov.id = ps.provider_id
+    LEFT JOIN public.service_types st ON st.id = ps.service_type_id
+    LEFT JOIN public.profiles prof ON prof.id = prov.profile_id
+    CROSS JOIN origin o
+    WHERE ps.active = true
+      AND (p_service_type_ids IS NULL OR ps.service_type_id = ANY(p_service_type_ids))
+      AND (p_categories IS NULL OR st.category = ANY(p_categories))
+      AND (
+        p_query IS NULL
+        OR position(lower(p_query) IN lower(coalesce(prof.full_name, ''))) > 0
+        OR position(lower(p_query) IN lower(coalesce(to_jsonb(ps)->>'description', ''))) > 0
+      )
+      AND (
+        o.point IS NULL
+        OR prov.earth_location IS NULL
+        OR (
+          earth_box(o.point, p_max_distance_km * 1000) @> prov.earth_location
+          AND earth_distance(o.point, prov.earth_location) <= p_max_distance_km * 1000
+        )
+      )
+  )
+  SELECT to_jsonb(m.ps)
+    || jsonb_build_object(
+      'service_type', to_jsonb(m.st),
+      'providers', jsonb_build_object(
+        'id', (m.prov).id,
+        'address', (m.prov).address,
+        'latitude', (m.prov).latitude,
+        'longitude', (m.prov).longitude,
+        'rating', (m.prov).rating,
+        'rating_count', (m.prov).rating_count,
+        'profiles', CASE WHEN (m.prof).id IS NOT NULL THEN jsonb_build_object(
+          'full_name', (m.prof).full_name,
+          'city', (m.prof).city,
+          'phone', (m.prof).phone,
+          'email', (m.prof).email
+        ) END,
+        'business_name', (m.prof).full_name,
+        'city', (m.prof).city,
+        'phone', (m.prof).phone,
+        'email', (m.prof).email
+      ) || CASE WHEN p_latitude IS NOT NULL AND p_longitude IS NOT NULL
+             THEN jsonb_build_object('distance', m.distance)
+             ELSE '{}'::jsonb END,
+      'total_count', count(*) OVER ()
+    )
+  FROM matches m
+  ORDER BY m.distance NULLS LAST, (m.ps).id
+  LIMIT p_limit
+  OFFSET p_offset;
+$$ LANGUAGE sql STABLE;
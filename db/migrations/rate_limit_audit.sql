@@ -0,0 +1,35 @@
+-- ==========================================================
+-- MIGRACIÓN: Auditoría agregada de rate limits
+-- Descripción:
+--   - El BFF aplica los límites en memoria / Redis (RATE_LIMIT_BACKEND)
+--   - Cada worker acumula contadores por (perfil, acción, hora) y los
+--     envía en lote cada RATE_LIMIT_FLUSH_SECONDS
+--   - Una sola llamada por lote en lugar de un RPC por POST
+--   - Límites de más de un día con el backend en memoria siguen en
+--     check_rate_limit (contadores globales y persistentes)
+--   - Solo el BFF (service role) ejecuta record_rate_limit_counts
+-- ==========================================================
+
+-- 1. Registrar contadores agregados
+-- p_rows: [{"profile_id": uuid, "action_type": text, "window_start": timestamptz, "action_count": int}, ...]
+CREATE OR REPLACE FUNCTION public.record_rate_limit_counts(p_rows jsonb)
+RETURNS integer AS $$
+DECLARE
+  v_count integer;
+BEGIN
+  INSERT INTO public.rate_limits (profile_id, action_type, window_start, action_count)
+  SELECT
+    (r->>'profile_id')::uuid,
+    r->>'action_type',
+    (r->>'window_start')::timestamptz,
+    (r->>'action_count')::int
+  FROM jsonb_array_elements(p_rows) AS r
+  ON CONFLICT (profile_id, action_type, window_start)
+  DO UPDATE SET action_count = public.rate_limits.action_count + excluded.action_count;
+
+  GET DIAGNOSTICS v_count = ROW_COUNT;
+  RETURN v_count;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER SET search_path = public;
+
+REVOKE EXECUTE ON FUNCTION public.record_rate_limit_counts(jsonb) FROM public, anon, authenticated;
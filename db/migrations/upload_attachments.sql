@@ -0,0 +1,33 @@
+-- ==========================================================
+-- MIGRACIÓN: Adjuntos de historial médico sin pérdidas
+-- Descripción:
+--   - append_medical_record_attachment(): agrega un adjunto a
+--     medical_records.attachments en una sola sentencia, sin leer y
+--     reescribir el arreglo (dos finalize simultáneos no se pisan)
+--   - Idempotente: si ya hay un adjunto con la misma url no lo repite
+--     (reintentos de POST /api/uploads/finalize con el mismo ticket)
+--   - Solo el BFF (service role) la ejecuta
+-- ==========================================================
+
+-- 1. Función
+CREATE OR REPLACE FUNCTION public.append_medical_record_attachment(
+  p_record_id uuid,
+  p_attachment jsonb
+)
+RETURNS SETOF public.medical_records AS $$
+  WITH updated AS (
+    UPDATE public.medical_records
+    SET attachments = coalesce(attachments, '[]'::jsonb) || jsonb_build_array(p_attachment)
+    WHERE id = p_record_id
+      AND NOT coalesce(attachments, '[]'::jsonb) @> jsonb_build_array(jsonb_build_object('url', p_attachment->>'url'))
+    RETURNING *
+  )
+  SELECT * FROM updated
+  UNION ALL
+  -- Ya adjuntado: devolver la fila tal cual
+  SELECT * FROM public.medical_records
+  WHERE id = p_record_id
+    AND NOT EXISTS (SELECT 1 FROM updated);
+$$ LANGUAGE sql;
+
+REVOKE EXECUTE ON FUNCTION public.append_medical_record_attachment(uuid, jsonb) FROM public, anon, authenticated;
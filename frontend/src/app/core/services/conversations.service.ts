@@ -1,6 +1,6 @@
 import { Injectable, inject } from '@angular/core';
 import { HttpClient } from '@angular/common/http';
-import { Observable } from 'rxjs';
+import { Observable, map } from 'rxjs';
 import { environment } from '../../../environments/environment';
 
 export interface Message {
@@ -60,6 +60,18 @@ export class ConversationsService {
     });
   }
 
+  // Live 'message' / 'read' / 'overflow' events. EventSource cannot send the
+  // Authorization header, so every connection opens with a fresh short-lived ticket.
+  openMessageStream(conversationId: string): Observable<EventSource> {
+    return this.http.post<{ data: { ticket: string; expires_at: number } }>(
+      `${this.apiUrl}/${conversationId}/stream-ticket`, {}
+    ).pipe(
+      map(response => new EventSource(
+        `${this.apiUrl}/${conversationId}/stream?ticket=${encodeURIComponent(response.data.ticket)}`
+      ))
+    );
+  }
+
   hideConversation(conversationId: string): Observable<{ message: string }> {
     return this.http.delete<{ message: string }>(`${this.apiUrl}/${conversationId}`);
   }
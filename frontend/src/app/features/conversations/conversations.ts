@@ -1,4 +1,4 @@
-import { Component, OnInit, inject, signal } from '@angular/core';
+import { Component, OnDestroy, OnInit, inject, signal } from '@angular/core';
 import { CommonModule } from '@angular/common';
 import { FormsModule } from '@angular/forms';
 import { ActivatedRoute } from '@angular/router';
@@ -11,7 +11,7 @@ import { AuthService } from '../../core/services/auth.service';
   templateUrl: './conversations.html',
   styleUrl: './conversations.scss'
 })
-export class Conversations implements OnInit {
+export class Conversations implements OnInit, OnDestroy {
   private conversationsService = inject(ConversationsService);
   private route = inject(ActivatedRoute);
   authService = inject(AuthService);
@@ -25,6 +25,9 @@ export class Conversations implements OnInit {
   showDeleteModal = signal(false);
   conversationToDelete = signal<string | null>(null);
 
+  private messageStream: EventSource | null = null;
+  private reconnectTimer: ReturnType<typeof setTimeout> | null = null;
+
   ngOnInit() {
     // Check if there's a conversationId in query params first
     this.route.queryParams.subscribe(params => {
@@ -33,6 +36,10 @@ export class Conversations implements OnInit {
     });
   }
 
+  ngOnDestroy() {
+    this.closeMessageStream();
+  }
+
   loadConversations(conversationIdToOpen?: string) {
     this.loading.set(true);
     this.conversationsService.getConversations().subscribe({
@@ -60,6 +67,57 @@ export class Conversations implements OnInit {
   selectConversation(conversation: Conversation) {
     this.selectedConversation.set(conversation);
     this.loadMessages(conversation.id);
+    this.openMessageStream(conversation.id);
+  }
+
+  private openMessageStream(conversationId: string) {
+    this.closeMessageStream();
+    this.conversationsService.openMessageStream(conversationId).subscribe({
+      next: (stream) => {
+        // The conversation may have changed while the ticket was requested
+        if (this.selectedConversation()?.id !== conversationId) {
+          stream.close();
+          return;
+        }
+        this.messageStream = stream;
+
+        stream.addEventListener('message', (event) => {
+          const message: Message = JSON.parse((event as MessageEvent).data);
+          if (!this.messages().some(m => m.id === message.id)) {
+            this.messages.update(msgs => [...msgs, message]);
+            setTimeout(() => this.scrollToBottom(), 0);
+          }
+        });
+        stream.addEventListener('read', () => {
+          this.messages.update(msgs => msgs.map(m => this.isMyMessage(m) ? { ...m, is_read: true } : m));
+        });
+        // Fell behind, or the server ended the stream: refetch and reconnect with a new ticket
+        stream.addEventListener('overflow', () => this.reconnectMessageStream(conversationId));
+        stream.onerror = () => this.reconnectMessageStream(conversationId);
+      },
+      error: (err) => {
+        console.error('Error opening message stream:', err);
+      }
+    });
+  }
+
+  private reconnectMessageStream(conversationId: string) {
+    this.closeMessageStream();
+    this.reconnectTimer = setTimeout(() => {
+      if (this.selectedConversation()?.id === conversationId) {
+        this.loadMessages(conversationId);
+        this.openMessageStream(conversationId);
+      }
+    }, 3000);
+  }
+
+  private closeMessageStream() {
+    if (this.reconnectTimer) {
+      clearTimeout(this.reconnectTimer);
+      this.reconnectTimer = null;
+    }
+    this.messageStream?.close();
+    this.messageStream = null;
   }
 
   loadMessages(conversationId: string) {
@@ -81,7 +139,8 @@ export class Conversations implements OnInit {
 
     this.conversationsService.sendMessage(this.selectedConversation()!.id, content).subscribe({
       next: (message) => {
-        this.messages.update(msgs => [...msgs, message]);
+        // The stream may have delivered it already
+        this.messages.update(msgs => msgs.some(m => m.id === message.id) ? msgs : [...msgs, message]);
         this.newMessage.set('');
         this.scrollToBottom();
         // Update conversation list (without reopening)
@@ -111,6 +170,7 @@ export class Conversations implements OnInit {
     this.conversationsService.hideConversation(conversationId).subscribe({
       next: () => {
         if (this.selectedConversation()?.id === conversationId) {
+          this.closeMessageStream();
           this.selectedConversation.set(null);
           this.messages.set([]);
         }